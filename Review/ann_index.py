@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Sequence
+
+import numpy as np
+from scipy import sparse
+
+if TYPE_CHECKING:
+    from vector_store import StandardsVectorStore
+
+
+@dataclass
+class RecallReport:
+    queries: int
+    k: int
+    recall_at_k: float
+    exact_ms_per_query: float
+    ann_ms_per_query: float
+    avg_candidates: float
+
+
+def concat_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """
+    `np.concatenate([np.arange(s, s + n) for s, n in zip(starts, lengths)])`
+    without the Python loop.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    # Offset of each range's first element in the output, repeated over the range.
+    shift = np.repeat(np.asarray(starts, dtype=np.int64) - (np.cumsum(lengths) - lengths), lengths)
+    return shift + np.arange(total, dtype=np.int64)
+
+
+class RandomProjectionLSH:
+    """
+    Random-hyperplane LSH for cosine similarity over sparse TF-IDF rows.
+
+    Vectors are projected onto `n_tables * n_bits` sparse random hyperplanes;
+    the sign pattern of each group of `n_bits` is one hash table key. A query
+    collects the documents sharing a bucket in any table, optionally probing
+    the `n_probes` neighbouring buckets whose bits were closest to flipping.
+
+    Knobs: more tables or probes raise recall and candidate count; more bits
+    per table make buckets smaller (faster, lower recall). `density` is the
+    share of features each hyperplane looks at; TF-IDF rows only have a few
+    dozen terms, so planes much sparser than that project most rows to zero
+    and put them all in one bucket.
+    """
+
+    def __init__(
+        self,
+        n_features: int,
+        n_tables: int = 16,
+        n_bits: int = 12,
+        n_probes: int = 2,
+        seed: int = 0,
+        density: float = 1.0 / 3.0,
+    ) -> None:
+        if not 1 <= n_bits <= 63:
+            raise ValueError("n_bits must be between 1 and 63.")
+        if not 0.0 < density <= 1.0:
+            raise ValueError("density must be in (0, 1].")
+        self.n_features = n_features
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.n_probes = n_probes
+        self.seed = seed
+        self.density = density
+        self._planes = self._make_planes()
+        self._keys = np.zeros((0, n_tables), dtype=np.uint64)
+        self._sorted_keys: List[np.ndarray] = []
+        self._sorted_ids: List[np.ndarray] = []
+
+    def _make_planes(self) -> sparse.csr_matrix:
+        # Sparse {-1, +1} projection (Achlioptas); only the sign of each
+        # projection is used, so the usual sqrt(1 / density) scale is omitted.
+        total_bits = self.n_tables * self.n_bits
+        rng = np.random.default_rng(self.seed)
+        planes = sparse.random(
+            self.n_features,
+            total_bits,
+            density=self.density,
+            format="csr",
+            random_state=rng,
+            data_rvs=lambda n: rng.choice(np.array([-1.0, 1.0], dtype=np.float32), size=n),
+            dtype=np.float32,
+        )
+        return planes
+
+    def __len__(self) -> int:
+        return int(self._keys.shape[0])
+
+    def _project(self, vectors: sparse.spmatrix, block_rows: int = 1024) -> np.ndarray:
+        """
+        Projections of the rows onto every hyperplane, shape (n, n_tables, n_bits).
+        Each row sums the plane rows of its own terms, gathered from the CSR
+        arrays; a sparse product against the whole plane matrix costs far
+        more for the one-row queries that dominate.
+        """
+        vectors = sparse.csr_matrix(vectors)
+        planes = self._planes
+        total_bits = self.n_tables * self.n_bits
+        out = np.empty((vectors.shape[0], total_bits), dtype=np.float32)
+        for start in range(0, vectors.shape[0], block_rows):
+            block = vectors[start : start + block_rows]
+            n_rows = block.shape[0]
+            plane_starts = planes.indptr[block.indices]
+            plane_lengths = planes.indptr[block.indices + 1] - plane_starts
+            entries = concat_ranges(plane_starts, plane_lengths)
+            rows = np.repeat(np.repeat(np.arange(n_rows), np.diff(block.indptr)), plane_lengths)
+            weights = np.repeat(block.data, plane_lengths) * planes.data[entries]
+            flat = np.bincount(rows * total_bits + planes.indices[entries], weights=weights, minlength=n_rows * total_bits)
+            out[start : start + n_rows] = flat.reshape(n_rows, total_bits)
+        return out.reshape(vectors.shape[0], self.n_tables, self.n_bits)
+
+    def _bits_to_keys(self, bits: np.ndarray) -> np.ndarray:
+        weights = np.left_shift(np.uint64(1), np.arange(self.n_bits, dtype=np.uint64))
+        return (bits.astype(np.uint64) * weights).sum(axis=-1, dtype=np.uint64)
+
+    def _rebuild_tables(self) -> None:
+        self._sorted_keys = []
+        self._sorted_ids = []
+        for t in range(self.n_tables):
+            order = np.argsort(self._keys[:, t], kind="stable")
+            self._sorted_ids.append(order.astype(np.int64))
+            self._sorted_keys.append(self._keys[order, t])
+
+    def add(self, vectors: sparse.spmatrix) -> None:
+        """
+        Insert vectors (rows) after the ones already indexed; their ids continue
+        from `len(self)`. Only the new keys are sorted; they are merged into
+        each table with one `searchsorted` and `insert` (a linear copy), so
+        the tables end up exactly as a full rebuild would leave them.
+        """
+        if vectors.shape[1] != self.n_features:
+            raise ValueError("Vector dimensionality does not match the index.")
+        new_keys = self._bits_to_keys(self._project(vectors) > 0)
+        first_id = len(self)
+        self._keys = np.vstack([self._keys, new_keys])
+        if not self._sorted_keys:
+            self._rebuild_tables()
+            return
+        for t in range(self.n_tables):
+            order = np.argsort(new_keys[:, t], kind="stable")
+            keys = new_keys[order, t]
+            # side="right" puts new ids after existing ones with the same key, as a stable sort would.
+            at = np.searchsorted(self._sorted_keys[t], keys, side="right")
+            self._sorted_keys[t] = np.insert(self._sorted_keys[t], at, keys)
+            self._sorted_ids[t] = np.insert(self._sorted_ids[t], at, order.astype(np.int64) + first_id)
+
+    def _probe_keys(self, queries: sparse.spmatrix) -> np.ndarray:
+        """
+        Bucket keys to look up, shape (n_queries, n_tables, 1 + n_probes): the
+        query's own key, then the keys with one near-zero bit flipped.
+        """
+        proj = self._project(queries)
+        keys = self._bits_to_keys(proj > 0)[..., None]
+        if self.n_probes <= 0:
+            return keys
+        nearest = np.argsort(np.abs(proj), axis=-1)[..., : self.n_probes].astype(np.uint64)
+        return np.concatenate([keys, keys ^ np.left_shift(np.uint64(1), nearest)], axis=-1)
+
+    def candidates_batch(self, queries: sparse.spmatrix) -> List[np.ndarray]:
+        """
+        Sorted candidate ids for every query row. Looks up all queries and
+        probes of a table with one `searchsorted`, so the only Python loop is
+        over tables.
+        """
+        n_queries = queries.shape[0]
+        probe_keys = self._probe_keys(queries)
+        keys_per_query = probe_keys.shape[2]
+        owners: List[np.ndarray] = []
+        ids: List[np.ndarray] = []
+        for t in range(self.n_tables):
+            keys = probe_keys[:, t, :].ravel()
+            lo = np.searchsorted(self._sorted_keys[t], keys, side="left")
+            hi = np.searchsorted(self._sorted_keys[t], keys, side="right")
+            counts = hi - lo
+            ids.append(self._sorted_ids[t][concat_ranges(lo, counts)])
+            owners.append(np.repeat(np.repeat(np.arange(n_queries, dtype=np.int64), keys_per_query), counts))
+
+        # Deduplicate (query, id) pairs in one pass, then split per query.
+        pairs = np.unique(np.concatenate(owners) * max(len(self), 1) + np.concatenate(ids))
+        owner = pairs // max(len(self), 1)
+        bounds = np.searchsorted(owner, np.arange(n_queries + 1))
+        found = pairs - owner * max(len(self), 1)
+        return [found[bounds[i] : bounds[i + 1]] for i in range(n_queries)]
+
+    def candidates(self, query: sparse.spmatrix) -> np.ndarray:
+        """
+        Candidate ids for a single query row.
+        """
+        return self.candidates_batch(query)[0]
+
+    def save(self, path: Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        params = {
+            "n_features": self.n_features,
+            "n_tables": self.n_tables,
+            "n_bits": self.n_bits,
+            "n_probes": self.n_probes,
+            "seed": self.seed,
+            "density": self.density,
+        }
+        (path / "params.json").write_text(json.dumps(params), encoding="utf-8")
+        np.save(path / "keys.npy", self._keys)
+
+    @classmethod
+    def load(cls, path: Path) -> "RandomProjectionLSH":
+        params = json.loads((path / "params.json").read_text(encoding="utf-8"))
+        index = cls(**params)
+        # Planes are regenerated from the seed; only the bucket keys are stored.
+        index._keys = np.load(path / "keys.npy")
+        index._rebuild_tables()
+        return index
+
+
+def measure_recall(store: "StandardsVectorStore", queries: Sequence[str], k: int = 5) -> RecallReport:
+    """
+    Compare a store's ANN results with its exact TF-IDF results on `queries`,
+    so recall/latency knobs can be chosen from measurements.
+    """
+    ann = store.ann_index
+    if ann is None:
+        raise RuntimeError("Store has no ANN index; call enable_ann() first.")
+    exact_ms = 0.0
+    ann_ms = 0.0
+    hits = 0
+    expected = 0
+    candidates = 0
+    for text in queries:
+        start = time.perf_counter()
+        exact = store.query(text, top_k=k, exact=True)
+        exact_ms += (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        approx = store.query(text, top_k=k)
+        ann_ms += (time.perf_counter() - start) * 1000
+        candidates += len(ann.candidates(store.encode(text)))
+
+        exact_ids = {r.chunk.rule_id for r in exact}
+        hits += len(exact_ids & {r.chunk.rule_id for r in approx})
+        expected += len(exact_ids)
+
+    n = max(len(queries), 1)
+    return RecallReport(
+        queries=len(queries),
+        k=k,
+        recall_at_k=hits / expected if expected else 1.0,
+        exact_ms_per_query=exact_ms / n,
+        ann_ms_per_query=ann_ms / n,
+        avg_candidates=candidates / n,
+    )
@@ -1,28 +1,138 @@
 from __future__ import annotations
 
+import asyncio
+import os
 from functools import lru_cache
 from pathlib import Path
+from typing import Iterator
 
-from models import ReviewRequest, ReviewResponse, StandardsChunk
-from rag_pipeline import run_rag_review
-from standards_loader import load_standards_corpus
+from corpus_reloader import ReloadReport, StandardsCorpusReloader
+from diff_review import arun_diff_review, run_diff_review
+from index_artifact import load_or_build_index
+from index_registry import StandardsIndexRegistry
+from models import DiffReviewRequest, ReviewRequest, ReviewResponse, StandardsChunk
+from rag_pipeline import arun_rag_review, run_rag_review, stream_rag_review
+from review_cache import ReviewCache
+from review_stream import ReviewStreamEvent
+from tenant_indexes import TenantIndexCache
+
+
+_BASE_DIR = Path(__file__).parent
+_STANDARDS_DIR = _BASE_DIR / "standards"
+_INDEX_DIR = _BASE_DIR / ".standards_index"
+_REVIEW_CACHE_DIR = Path(os.environ.get("CODESENSEI_CACHE_DIR", _BASE_DIR / ".review_cache"))
+_TENANTS_DIR = Path(os.environ.get("CODESENSEI_TENANTS_DIR", _BASE_DIR / "tenants"))
 
 
 @lru_cache(maxsize=1)
+def get_corpus_reloader() -> StandardsCorpusReloader:
+    """
+    Load the per-language retrieval indexes once per process, from the on-disk
+    artifact when it matches the standards files, otherwise by rebuilding it.
+    """
+    registry = load_or_build_index(standards_dir=_STANDARDS_DIR, index_dir=_INDEX_DIR)
+    return StandardsCorpusReloader(_STANDARDS_DIR, registry, index_dir=_INDEX_DIR)
+
+
+def get_index_registry() -> StandardsIndexRegistry:
+    """
+    Current snapshot of the live standards index.
+    """
+    return get_corpus_reloader().registry
+
+
 def get_all_standards_chunks() -> tuple[StandardsChunk, ...]:
     """
     Load and cache the standards corpus once per process.
     """
-    base_dir = Path(__file__).parent
-    standards_dir = base_dir / "standards"
-    chunks = load_standards_corpus(standards_dir)
-    return tuple(chunks)
+    return get_index_registry().chunks
+
+
+@lru_cache(maxsize=1)
+def get_tenant_indexes() -> TenantIndexCache:
+    """
+    Process-wide cache of tenant indexes layered over the live standards index.
+    """
+    return TenantIndexCache(
+        _TENANTS_DIR,
+        get_index_registry,
+        max_bytes=int(os.environ.get("CODESENSEI_TENANT_CACHE_MB", "256")) * 1024 * 1024,
+    )
+
+
+def registry_for(request: ReviewRequest | DiffReviewRequest) -> StandardsIndexRegistry:
+    """
+    Index snapshot to review `request` against: the tenant's when it names one.
+    """
+    if request.tenant:
+        return get_tenant_indexes().get(request.tenant)
+    return get_index_registry()
+
+
+@lru_cache(maxsize=1)
+def get_review_cache() -> ReviewCache:
+    """
+    Process-wide review result cache (memory LRU backed by a size-capped disk store).
+    """
+    return ReviewCache(
+        max_entries=int(os.environ.get("CODESENSEI_CACHE_ENTRIES", "512")),
+        disk_dir=_REVIEW_CACHE_DIR,
+        max_disk_bytes=int(os.environ.get("CODESENSEI_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    )
+
+
+def reload_standards() -> ReloadReport:
+    """
+    Re-parse changed files in `standards/` and apply them to the live index.
+    """
+    return get_corpus_reloader().reload()
+
+
+def start_standards_watcher(interval_seconds: float = 2.0) -> None:
+    """
+    Hot-reload `standards/` in the background whenever a file changes.
+    """
+    get_corpus_reloader().start_watching(interval_seconds)
 
 
 def run_review(request: ReviewRequest) -> ReviewResponse:
     """
     Public entry point for running a CodeSensei review.
     """
-    all_chunks = get_all_standards_chunks()
-    return run_rag_review(request, all_chunks=all_chunks)
+    # Grab one snapshot so a concurrent reload cannot change the index mid-review.
+    registry = registry_for(request)
+    return run_rag_review(request, all_chunks=registry.chunks, registry=registry, cache=get_review_cache())
+
+
+def review_diff(request: DiffReviewRequest) -> ReviewResponse:
+    """
+    Review only the changed hunks of a unified diff.
+    """
+    registry = registry_for(request)
+    return run_diff_review(request, all_chunks=registry.chunks, registry=registry, cache=get_review_cache())
 
+
+async def arun_review(request: ReviewRequest) -> ReviewResponse:
+    """
+    Async entry point (used by the HTTP service): LLM calls do not block the event loop.
+    """
+    # Loading a tenant index parses and encodes its rules; keep that off the event loop.
+    registry = await asyncio.to_thread(registry_for, request) if request.tenant else get_index_registry()
+    return await arun_rag_review(request, all_chunks=registry.chunks, registry=registry, cache=get_review_cache())
+
+
+async def areview_diff(request: DiffReviewRequest) -> ReviewResponse:
+    """
+    Async variant of `review_diff` (used by the HTTP service).
+    """
+    registry = await asyncio.to_thread(registry_for, request) if request.tenant else get_index_registry()
+    return await arun_diff_review(request, all_chunks=registry.chunks, registry=registry, cache=get_review_cache())
+
+
+def stream_review(request: ReviewRequest) -> Iterator[ReviewStreamEvent]:
+    """
+    Streaming entry point: yields verdict, summary, positives and issues as the
+    model produces them, ending with a `complete` event holding the full response.
+    """
+    registry = registry_for(request)
+    yield from stream_rag_review(request, all_chunks=registry.chunks, registry=registry, cache=get_review_cache())
@@ -0,0 +1,310 @@
+"""
+Review every source file under a directory (or git tree) with CodeSensei.
+
+    python batch_review.py path/to/repo --output reviews.jsonl --sarif reviews.sarif
+
+Results are streamed to a JSONL file as each review finishes. Re-running the
+same command resumes: files already recorded with an unchanged content hash
+are skipped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, TextIO
+
+from app_core import arun_review, get_index_registry
+from code_segmenter import split_segment_label
+from languages import infer_language_from_path
+from llm_client import get_llm_usage
+from models import ReviewRequest, ReviewResponse
+
+
+SKIP_DIRS = {".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", "dist", "build"}
+SARIF_LEVELS = {"major": "error", "minor": "warning", "nit": "note"}
+# First "line 12" / "lines 40-80" reference in an issue's affected_code.
+_LINE_REF_RE = re.compile(r"\blines?\s+(\d+)(?:\s*-\s*(\d+))?", re.IGNORECASE)
+
+
+@dataclass
+class BatchFile:
+    path: Path
+    relpath: str
+    language: str
+
+
+def _iter_walk(root: Path) -> Iterator[Path]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.startswith("."))
+        for name in sorted(filenames):
+            yield Path(dirpath) / name
+
+
+def _iter_git(root: Path) -> Iterator[Path]:
+    out = subprocess.run(
+        ["git", "ls-files", "-z"],
+        cwd=root,
+        check=True,
+        capture_output=True,
+    ).stdout.decode("utf-8")
+    for rel in out.split("\0"):
+        if rel:
+            yield root / rel
+
+
+def discover_files(root: Path, use_git: bool, max_bytes: int) -> Iterator[BatchFile]:
+    """
+    Yield reviewable files under `root` with a language inferred from the extension.
+    """
+    paths = _iter_git(root) if use_git else _iter_walk(root)
+    for path in paths:
+        language = infer_language_from_path(path)
+        if language is None or not path.is_file():
+            continue
+        try:
+            if path.stat().st_size > max_bytes:
+                continue
+        except OSError:
+            continue
+        yield BatchFile(path=path, relpath=path.relative_to(root).as_posix(), language=language)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_completed(output_path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Records from a previous (possibly interrupted) run, keyed by relative path.
+    Only successful reviews count as done; errors are retried.
+    """
+    done: Dict[str, Dict[str, Any]] = {}
+    if not output_path.exists():
+        return done
+    with output_path.open(encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line of an interrupted run may be truncated.
+                continue
+            if record.get("status") == "ok":
+                done[record["path"]] = record
+    return done
+
+
+def issue_region(affected_code: str | None, code: str | None = None) -> Dict[str, int] | None:
+    """
+    SARIF region for an issue: the first line reference in `affected_code`,
+    or else the first line of `code` containing its first quoted line, or
+    else the whole segment a large-file issue was found in.
+    """
+    if not affected_code:
+        return None
+    segment, affected_code = split_segment_label(affected_code)
+    match = _LINE_REF_RE.search(affected_code)
+    if match:
+        region = {"startLine": int(match.group(1))}
+        if match.group(2) and int(match.group(2)) >= region["startLine"]:
+            region["endLine"] = int(match.group(2))
+        return region
+    first = next((line.strip() for line in affected_code.splitlines() if line.strip()), "")
+    if code is not None and first:
+        for lineno, line in enumerate(code.splitlines(), start=1):
+            if first in line:
+                return {"startLine": lineno}
+    if segment is not None:
+        return {"startLine": segment[0], "endLine": segment[1]}
+    return None
+
+
+class SarifWriter:
+    """
+    Writes a SARIF 2.1.0 log incrementally, one result at a time.
+    """
+
+    def __init__(self, fh: TextIO) -> None:
+        self._fh = fh
+        self._first = True
+        fh.write(
+            '{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", "version": "2.1.0", '
+            '"runs": [{"tool": {"driver": {"name": "CodeSensei", "informationUri": '
+            '"https://github.com/Strangeabhi/AgenticAI"}}, "results": [\n'
+        )
+
+    def write_review(self, relpath: str, response: ReviewResponse, code: str | None = None) -> None:
+        """
+        One result per issue. With the reviewed `code`, issues that quote a
+        snippet instead of naming a line are located by text.
+        """
+        for issue in response.issues:
+            location: Dict[str, Any] = {"artifactLocation": {"uri": relpath}}
+            region = issue_region(issue.affected_code, code)
+            if region is not None:
+                location["region"] = region
+            result = {
+                "ruleId": issue.rule_ids[0] if issue.rule_ids else "CODESENSEI",
+                "level": SARIF_LEVELS.get(issue.severity, "warning"),
+                "message": {"text": issue.description},
+                "locations": [{"physicalLocation": location}],
+                "properties": {"issueId": issue.id, "ruleIds": issue.rule_ids, "affectedCode": issue.affected_code},
+            }
+            self._fh.write(("" if self._first else ",\n") + json.dumps(result))
+            self._first = False
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.write("\n]}]}\n")
+        self._fh.close()
+
+
+class Throughput:
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.usage_start = get_llm_usage()
+        self.files = 0
+        self.errors = 0
+
+    def line(self, pending: int) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        usage = get_llm_usage()
+        tokens = usage.total_tokens - self.usage_start.total_tokens
+        prompt = usage.prompt_tokens - self.usage_start.prompt_tokens
+        cached = usage.cached_prompt_tokens - self.usage_start.cached_prompt_tokens
+        return (
+            f"{self.files} reviewed, {self.errors} failed, {pending} queued | "
+            f"{self.files / elapsed:.2f} files/s, {tokens / elapsed:.0f} tokens/s, "
+            f"{cached / max(prompt, 1):.0%} of prompt tokens cached"
+        )
+
+
+async def run_batch(
+    files: Iterable[BatchFile],
+    output_path: Path,
+    sarif_path: Path | None,
+    concurrency: int,
+    context: str | None,
+    progress_interval: float = 5.0,
+) -> Throughput:
+    """
+    Review `files` with at most `concurrency` reviews in flight. Files are
+    read as workers free up, through a queue of at most 2 x `concurrency`
+    entries, so memory does not grow with the size of the tree.
+    """
+    done = load_completed(output_path)
+    sarif = SarifWriter(sarif_path.open("w", encoding="utf-8")) if sarif_path else None
+
+    # Thread work (file reads, retrieval, cache) runs on a pool sized to the requested concurrency.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    # Build the retrieval indexes once, before any worker needs them.
+    await asyncio.to_thread(get_index_registry)
+
+    stats = Throughput()
+    queue: asyncio.Queue[tuple[BatchFile, str, str] | None] = asyncio.Queue(maxsize=2 * concurrency)
+
+    async def produce() -> None:
+        for f in files:
+            try:
+                code = await asyncio.to_thread(f.path.read_text, encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            digest = _sha256(code)
+            previous = done.get(f.relpath)
+            if previous is not None and previous.get("sha256") == digest:
+                if sarif is not None:
+                    sarif.write_review(f.relpath, ReviewResponse.model_validate(previous["review"]), code)
+                continue
+            await queue.put((f, code, digest))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    with output_path.open("a", encoding="utf-8") as out:
+
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                f, code, digest = item
+                request = ReviewRequest(language=f.language, code=code, context=context)
+                record: Dict[str, Any] = {"path": f.relpath, "language": f.language, "sha256": digest}
+                started = time.perf_counter()
+                try:
+                    response = await arun_review(request)
+                except Exception as exc:  # noqa: BLE001
+                    record.update(status="error", error=str(exc))
+                    stats.errors += 1
+                else:
+                    record.update(status="ok", review=response.model_dump())
+                    if sarif is not None:
+                        sarif.write_review(f.relpath, response, code)
+                    stats.files += 1
+                record["elapsed_s"] = round(time.perf_counter() - started, 3)
+                # Single event loop thread: writes never interleave.
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+
+        async def report() -> None:
+            while True:
+                await asyncio.sleep(progress_interval)
+                print(stats.line(queue.qsize()), file=sys.stderr)
+
+        reporter = asyncio.create_task(report())
+        try:
+            await asyncio.gather(produce(), *(worker() for _ in range(concurrency)))
+        finally:
+            reporter.cancel()
+            if sarif is not None:
+                sarif.close()
+
+    return stats
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run CodeSensei over every source file in a directory.")
+    parser.add_argument("root", type=Path, help="Directory or git checkout to review.")
+    parser.add_argument("--output", type=Path, default=Path("codesensei-results.jsonl"), help="JSONL results (also the resume log).")
+    parser.add_argument("--sarif", type=Path, default=None, help="Optional SARIF 2.1.0 output path.")
+    parser.add_argument("--git", action="store_true", help="Only review files tracked by git.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum reviews in flight.")
+    parser.add_argument("--max-bytes", type=int, default=200_000, help="Skip files larger than this.")
+    parser.add_argument("--context", default=None, help="Context string passed with every review.")
+    parser.add_argument("--fresh", action="store_true", help="Ignore previous results instead of resuming.")
+    args = parser.parse_args(argv)
+
+    if args.fresh and args.output.exists():
+        args.output.unlink()
+
+    files = list(discover_files(args.root.resolve(), use_git=args.git, max_bytes=args.max_bytes))
+    print(f"Found {len(files)} reviewable files under {args.root}", file=sys.stderr)
+
+    try:
+        stats = asyncio.run(
+            run_batch(
+                files,
+                output_path=args.output,
+                sarif_path=args.sarif,
+                concurrency=max(1, args.concurrency),
+                context=args.context,
+            )
+        )
+    except KeyboardInterrupt:
+        print("Interrupted; re-run the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+
+    print(stats.line(0), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
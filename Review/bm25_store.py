@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+import numpy as np
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from models import StandardsChunk
+from vector_store import RetrievedRule
+
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_MAX_PREFIX_COUNTS = 512
+
+
+def tokenize_code(text: str) -> List[str]:
+    """
+    Code-aware tokenizer: identifiers are split on underscores and camelCase
+    boundaries (`getUserById` -> get, user, by, id) and the whole identifier
+    is kept as well, so both exact and partial matches score.
+    """
+    tokens: List[str] = []
+    for word in _WORD_RE.findall(text):
+        parts = [p.lower() for piece in word.split("_") for p in _CAMEL_RE.findall(piece)]
+        whole = word.strip("_").lower()
+        if len(parts) > 1 and whole:
+            tokens.append(whole)
+        tokens.extend(parts)
+    return [t for t in tokens if len(t) > 1 and t not in ENGLISH_STOP_WORDS]
+
+
+class BM25Store:
+    """
+    BM25 retriever over a postings-list inverted index.
+
+    Each term maps to the documents containing it together with a precomputed
+    BM25 impact (idf x saturated tf), so a query only touches the postings of
+    its own terms instead of scoring the whole corpus.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._chunks: List[StandardsChunk] = []
+        self._vocabulary: Dict[str, int] = {}
+        self._postings_docs: List[np.ndarray] = []
+        self._postings_impacts: List[np.ndarray] = []
+        self._prefix_counts: Dict[str, Counter[str]] = {}
+
+    @property
+    def is_fitted(self) -> bool:
+        return len(self._chunks) > 0
+
+    def fit(self, chunks: Sequence[StandardsChunk]) -> None:
+        self._chunks = list(chunks)
+        self._vocabulary = {}
+        self._prefix_counts = {}
+
+        doc_counts = [Counter(tokenize_code(c.text)) for c in self._chunks]
+        doc_lengths = np.array([sum(c.values()) for c in doc_counts], dtype=np.float32)
+        avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+        postings: Dict[str, List[tuple[int, int]]] = {}
+        for doc_id, counts in enumerate(doc_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        n_docs = len(self._chunks)
+        self._postings_docs = []
+        self._postings_impacts = []
+        for term in sorted(postings):
+            entries = postings[term]
+            docs = np.array([d for d, _ in entries], dtype=np.int32)
+            tf = np.array([t for _, t in entries], dtype=np.float32)
+            df = len(entries)
+            idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lengths[docs] / max(avg_length, 1e-9))
+            self._vocabulary[term] = len(self._postings_docs)
+            self._postings_docs.append(docs)
+            self._postings_impacts.append((idf * tf * (self.k1 + 1.0) / (tf + norm)).astype(np.float32))
+
+    def _check_fitted(self) -> None:
+        if not self.is_fitted:
+            raise RuntimeError("BM25 store has not been fitted with any standards.")
+
+    def _postings(self, counts: Counter[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The postings of the query terms, concatenated: document ids (one
+        document may appear once per term) and impacts weighted by query tf.
+        """
+        docs: List[np.ndarray] = []
+        impacts: List[np.ndarray] = []
+        for term, qtf in counts.items():
+            term_id = self._vocabulary.get(term)
+            if term_id is None:
+                continue
+            docs.append(self._postings_docs[term_id])
+            impacts.append(qtf * self._postings_impacts[term_id])
+        if not docs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        return np.concatenate(docs), np.concatenate(impacts)
+
+    def _top_k(self, docs: np.ndarray, impacts: np.ndarray, top_k: int) -> List[RetrievedRule]:
+        """
+        Sum impacts per document and rank. Work is proportional to the
+        postings touched, not to the corpus size.
+        """
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=impacts, minlength=len(candidates)).astype(np.float32)
+        keep = scores > 0
+        candidates, scores = candidates[keep], scores[keep]
+        if 0 < top_k < len(candidates):
+            part = np.argpartition(-scores, top_k - 1)[:top_k]
+            candidates, scores = candidates[part], scores[part]
+        order = np.lexsort((candidates, -scores))
+        return [
+            RetrievedRule(chunk=self._chunks[int(candidates[i])], score=float(scores[i]))
+            for i in order
+        ]
+
+    def query(self, query_text: str, top_k: int = 8) -> List[RetrievedRule]:
+        self._check_fitted()
+        return self._top_k(*self._postings(Counter(tokenize_code(query_text))), top_k)
+
+    def query_batch(
+        self,
+        prefixes: Sequence[str],
+        shared_text: str = "",
+        top_k: int = 8,
+    ) -> List[List[RetrievedRule]]:
+        """
+        Score `prefix + shared_text` for every prefix, tokenizing the shared
+        text once and caching prefix term counts.
+        """
+        self._check_fitted()
+        shared_docs, shared_impacts = self._postings(Counter(tokenize_code(shared_text)))
+
+        results: List[List[RetrievedRule]] = []
+        for prefix in prefixes:
+            counts = self._prefix_counts.get(prefix)
+            if counts is None:
+                counts = Counter(tokenize_code(prefix))
+                if len(self._prefix_counts) >= _MAX_PREFIX_COUNTS:
+                    self._prefix_counts.clear()
+                self._prefix_counts[prefix] = counts
+            # BM25 is linear in query term counts, so prefix and shared postings add up.
+            docs, impacts = self._postings(counts)
+            results.append(
+                self._top_k(np.concatenate([shared_docs, docs]), np.concatenate([shared_impacts, impacts]), top_k)
+            )
+        return results
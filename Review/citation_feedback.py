@@ -0,0 +1,317 @@
+"""
+Citation feedback: learn per-rule retrieval cutoffs from which rules the
+model actually cites.
+
+With CODESENSEI_CITATION_LOG set, every LLM review appends one JSON line: the
+rules that were sent to the model (with the facet and score that retrieved
+them and their prompt tokens), the rule_ids cited in its issues and positive
+feedback, and the index settings the scores were computed under. From that
+log this module learns score cutoffs per language and rule, falling back to
+per language and facet, and reports what they would have saved:
+
+    python citation_feedback.py --log .citation_log.jsonl --write-cutoffs cutoffs.json
+
+Point CODESENSEI_CUTOFFS at the written file to apply the cutoffs at query
+time. Cutoffs are learned on the older part of the log and evaluated on the
+newest `--holdout` fraction, so the reported recall is not measured on the
+records the cutoffs were fitted to.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+from models import ReviewResponse
+
+
+@dataclass
+class RetrievalEvent:
+    rule_id: str
+    facet: str
+    score: float
+    tokens: int
+
+
+@dataclass
+class CitationRecord:
+    language: str
+    rules: List[RetrievalEvent]
+    cited: List[str]
+    # Index settings the scores were computed under (index_registry.score_settings).
+    settings: Dict[str, Any] = field(default_factory=dict)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line: str) -> "CitationRecord":
+        data = json.loads(line)
+        return cls(
+            language=data["language"],
+            rules=[RetrievalEvent(**event) for event in data["rules"]],
+            cited=list(data["cited"]),
+            settings=dict(data.get("settings", {})),
+        )
+
+
+def _language_key(language: str) -> str:
+    return language.lower().strip()
+
+
+def cited_rule_ids(response: ReviewResponse) -> List[str]:
+    cited = {rule_id for issue in response.issues for rule_id in issue.rule_ids}
+    cited.update(rule_id for item in response.positive_feedback for rule_id in item.rule_ids)
+    return sorted(cited)
+
+
+@dataclass
+class RuleStats:
+    retrieved: int = 0
+    cited: int = 0
+    cited_scores: List[float] = field(default_factory=list)
+    uncited_scores: List[float] = field(default_factory=list)
+
+
+def rule_stats(records: Sequence[CitationRecord]) -> Dict[Tuple[str, str], RuleStats]:
+    """
+    Retrieval and citation counts per (language, rule_id).
+    """
+    stats: Dict[Tuple[str, str], RuleStats] = {}
+    for record in records:
+        cited = set(record.cited)
+        language = _language_key(record.language)
+        for event in record.rules:
+            s = stats.setdefault((language, event.rule_id), RuleStats())
+            s.retrieved += 1
+            if event.rule_id in cited:
+                s.cited += 1
+                s.cited_scores.append(event.score)
+            else:
+                s.uncited_scores.append(event.score)
+    return stats
+
+
+class CitationLog:
+    """
+    Append-only JSONL log of citation records.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, record: CitationRecord) -> None:
+        line = record.to_json() + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as fh:
+                fh.write(line)
+
+
+def read_citation_log(path: Path) -> List[CitationRecord]:
+    records: List[CitationRecord] = []
+    with path.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            try:
+                records.append(CitationRecord.from_json(line))
+            except (ValueError, KeyError, TypeError):
+                # A line cut short by a crash mid-write; skip it.
+                continue
+    return records
+
+
+@dataclass
+class RetrievalCutoffs:
+    """
+    Minimum retrieval score per language and rule_id, and per language and
+    facet for rules without enough observations of their own.
+
+    Rules in `excluded` were never cited, so their cutoff sits above every
+    score they were retrieved at; `exploration_rate` of the lookups made
+    with `explore=True` skip it, so such a rule still reaches the model now
+    and then and can be cited (and its cutoff re-learned). `settings` are
+    the index settings the cutoffs were learned under; scores computed
+    under other settings are on another scale.
+    """
+
+    rules: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    facets: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    excluded: Dict[str, List[str]] = field(default_factory=dict)
+    exploration_rate: float = 0.0
+    settings: Dict[str, Any] = field(default_factory=dict)
+
+    def applies_to(self, settings: Dict[str, Any]) -> bool:
+        return self.settings == settings
+
+    def threshold(self, language: str, rule_id: str, facet: str, floor: float, explore: bool = False) -> float:
+        language = _language_key(language)
+        cutoff = self.rules.get(language, {}).get(rule_id)
+        if cutoff is None:
+            cutoff = self.facets.get(language, {}).get(facet, floor)
+        elif explore and rule_id in self.excluded.get(language, ()) and random.random() < self.exploration_rate:
+            return floor
+        return max(floor, cutoff)
+
+    def save(self, path: Path) -> None:
+        path.write_text(json.dumps(asdict(self), indent=2, sort_keys=True), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "RetrievalCutoffs":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(
+            rules={language: dict(rules) for language, rules in data.get("rules", {}).items()},
+            facets={language: dict(facets) for language, facets in data.get("facets", {}).items()},
+            excluded={language: list(rules) for language, rules in data.get("excluded", {}).items()},
+            exploration_rate=float(data.get("exploration_rate", 0.0)),
+            settings=dict(data.get("settings", {})),
+        )
+
+
+def learn_cutoffs(
+    records: Sequence[CitationRecord],
+    min_observations: int = 20,
+    margin: float = 0.1,
+    exploration_rate: float = 0.05,
+) -> RetrievalCutoffs:
+    """
+    Learned from the records logged under the same index settings as the
+    newest one (older settings scored on another scale). Per language and
+    rule with at least `min_observations` retrievals: `margin` below the
+    lowest score it was ever cited at, or, if it was never cited, `margin`
+    above the highest score it was retrieved at (it then only returns on an
+    unusually strong match, or on exploration). Per language and facet:
+    `margin` below the lowest score any rule retrieved by it was cited at.
+    """
+    settings = records[-1].settings if records else {}
+    records = [record for record in records if record.settings == settings]
+    cutoffs = RetrievalCutoffs(exploration_rate=exploration_rate, settings=dict(settings))
+    for (language, rule_id), s in rule_stats(records).items():
+        if s.retrieved < min_observations:
+            continue
+        if s.cited_scores:
+            cutoffs.rules.setdefault(language, {})[rule_id] = min(s.cited_scores) * (1.0 - margin)
+        else:
+            cutoffs.rules.setdefault(language, {})[rule_id] = max(s.uncited_scores) * (1.0 + margin)
+            cutoffs.excluded.setdefault(language, []).append(rule_id)
+
+    by_facet: Dict[Tuple[str, str], List[float]] = {}
+    seen: Dict[Tuple[str, str], int] = {}
+    for record in records:
+        cited = set(record.cited)
+        language = _language_key(record.language)
+        for event in record.rules:
+            key = (language, event.facet)
+            seen[key] = seen.get(key, 0) + 1
+            if event.rule_id in cited:
+                by_facet.setdefault(key, []).append(event.score)
+    for (language, facet), scores in by_facet.items():
+        if seen[(language, facet)] >= min_observations:
+            cutoffs.facets.setdefault(language, {})[facet] = min(scores) * (1.0 - margin)
+    return cutoffs
+
+
+@dataclass
+class CutoffReport:
+    records: int = 0
+    rules_before: int = 0
+    rules_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    citations: int = 0
+    citations_kept: int = 0
+
+    @property
+    def tokens_saved(self) -> float:
+        return 1.0 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0
+
+    @property
+    def citation_recall(self) -> float:
+        return self.citations_kept / self.citations if self.citations else 1.0
+
+
+def evaluate_cutoffs(records: Sequence[CitationRecord], cutoffs: RetrievalCutoffs, floor: float = 0.0) -> CutoffReport:
+    """
+    Replay logged retrievals with `cutoffs`: guideline tokens kept versus the
+    share of cited rules that would still have reached the model.
+    """
+    report = CutoffReport(records=len(records))
+    for record in records:
+        cited = set(record.cited)
+        for event in record.rules:
+            kept = event.score >= cutoffs.threshold(record.language, event.rule_id, event.facet, floor)
+            report.rules_before += 1
+            report.tokens_before += event.tokens
+            if kept:
+                report.rules_after += 1
+                report.tokens_after += event.tokens
+            if event.rule_id in cited:
+                report.citations += 1
+                report.citations_kept += kept
+    return report
+
+
+def _parse_args(argv: List[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Learn retrieval cutoffs from a citation log and report their effect.")
+    parser.add_argument("--log", type=Path, required=True, help="citation log (JSONL) written by the review pipeline")
+    parser.add_argument("--min-observations", type=int, default=20, help="retrievals needed before a rule gets its own cutoff")
+    parser.add_argument("--margins", default="0,0.1,0.2,0.3", help="comma-separated margins to compare")
+    parser.add_argument("--holdout", type=float, default=0.3, help="newest fraction of the log used for evaluation")
+    parser.add_argument("--write-cutoffs", type=Path, help="write cutoffs learned on the whole log with --margin")
+    parser.add_argument("--margin", type=float, default=0.1, help="margin for --write-cutoffs")
+    parser.add_argument(
+        "--exploration-rate",
+        type=float,
+        default=0.05,
+        help="share of lookups that skip the cutoff of a never-cited rule, so it can be re-learned",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = _parse_args(argv)
+    records = read_citation_log(args.log)
+    if not records:
+        print(f"No citation records in {args.log}.", file=sys.stderr)
+        return 1
+
+    # Scores logged under other index settings are on another scale.
+    settings = records[-1].settings
+    current = [record for record in records if record.settings == settings]
+    if len(current) < len(records):
+        print(f"Skipping {len(records) - len(current)} records logged under other index settings.")
+    records = current
+
+    split = len(records) - int(len(records) * args.holdout)
+    train, test = (records[:split], records[split:]) if 0 < split < len(records) else (records, records)
+    print(f"{len(records)} records ({len(train)} to learn from, {len(test)} to evaluate on)")
+    print(f"Index settings: {json.dumps(settings, sort_keys=True)}")
+    print(f"{'margin':>8} {'rules/req':>10} {'tokens saved':>13} {'citation recall':>16}")
+    rows = [("none", RetrievalCutoffs())]
+    rows += [(f"{float(m):.2f}", learn_cutoffs(train, args.min_observations, float(m))) for m in args.margins.split(",") if m.strip()]
+    for label, cutoffs in rows:
+        report = evaluate_cutoffs(test, cutoffs)
+        print(
+            f"{label:>8} {report.rules_after / report.records:>10.2f} "
+            f"{report.tokens_saved:>13.1%} {report.citation_recall:>16.1%}"
+        )
+
+    if args.write_cutoffs is not None:
+        cutoffs = learn_cutoffs(records, args.min_observations, args.margin, args.exploration_rate)
+        cutoffs.save(args.write_cutoffs)
+        n_rules = sum(len(rules) for rules in cutoffs.rules.values())
+        n_facets = sum(len(facets) for facets in cutoffs.facets.values())
+        print(f"Wrote {n_rules} rule and {n_facets} facet cutoffs to {args.write_cutoffs}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Token-lean rendering of submitted code for the LLM prompt, with a map from
+every rendered line back to its line in the original source.
+
+Style review gains nothing from decorative comment banners, runs of blank
+lines, license headers, long docstrings or vendored data tables, but they
+are paid for in prompt tokens. `compact_code` collapses them and
+`CompactedCode.restore_line_refs` rewrites "line N" references in the
+model's answer back to original line numbers.
+"""
+
+from __future__ import annotations
+
+import ast
+import io
+import re
+import tokenize
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+from code_features import strip_js_literals
+from code_segmenter import JS_LANGUAGES, PYTHON_LANGUAGES
+
+
+# Runs of at least this many comment, string or data lines keep their first
+# and last line; the lines in between become one marker line.
+LONG_RUN_LINES = 8
+# Single-line string literals longer than this are shortened.
+LONG_STRING_CHARS = 160
+_STRING_KEEP_CHARS = 48
+MAX_BLANK_LINES = 2
+
+_BANNER_RE = re.compile(r"^\s*(?:#+|//+|/\*+|\*+)\s*[=\-#*~_+/.]{4,}\s*(?:\*+/)?\s*$")
+_LINE_REF_RE = re.compile(r"\b(lines?|L)(\s*)(\d+)(?:(\s*(?:-|–|to)\s*)(\d+))?", re.IGNORECASE)
+# JS/TS lines made only of literals and punctuation once strings are blanked.
+_JS_DATA_LINE_RE = re.compile(
+    r"^[\s\[\]{}(),:;\"'`\d.+\-]*(?:(?:true|false|null|undefined|0x[\da-fA-F]+)[\s\[\]{}(),:;\"'`\d.+\-]*)*$"
+)
+
+COMMENT = "comment"
+STRING = "string"
+DATA = "data"
+
+
+@dataclass
+class CompactedCode:
+    """
+    Compacted code plus `line_map`: `line_map[i]` is the original 1-based
+    line of compacted line `i + 1`.
+    """
+
+    text: str
+    line_map: List[int] = field(default_factory=list)
+    original_lines: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return len(self.line_map) != self.original_lines or self.line_map != list(range(1, self.original_lines + 1))
+
+    def original_line(self, line: int) -> int:
+        if 1 <= line <= len(self.line_map):
+            return self.line_map[line - 1]
+        return line
+
+    def restore_line_refs(self, text: str | None) -> str | None:
+        """
+        Rewrite "line 12" / "lines 12-15" / "L12" references to compacted
+        lines into the matching original line numbers.
+        """
+        if not text or not self.changed:
+            return text
+
+        def repl(match: re.Match[str]) -> str:
+            word, gap, start, sep, end = match.groups()
+            restored = f"{word}{gap}{self.original_line(int(start))}"
+            if end is not None:
+                restored += f"{sep}{self.original_line(int(end))}"
+            return restored
+
+        return _LINE_REF_RE.sub(repl, text)
+
+
+def _python_line_kinds(code: str) -> tuple[Dict[int, str], Dict[int, List[tuple[int, int]]]]:
+    """
+    Line kinds (comment-only, inside a multi-line string, inside a constant
+    data display) and, per line, the column spans of long one-line strings.
+    """
+    kinds: Dict[int, str] = {}
+    long_strings: Dict[int, List[tuple[int, int]]] = {}
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type == tokenize.COMMENT and token.line.strip().startswith("#"):
+                kinds[token.start[0]] = COMMENT
+            elif token.type == tokenize.STRING:
+                (start_line, start_col), (end_line, end_col) = token.start, token.end
+                if end_line > start_line:
+                    for line in range(start_line + 1, end_line):
+                        kinds[line] = STRING
+                elif end_col - start_col > LONG_STRING_CHARS:
+                    long_strings.setdefault(start_line, []).append((start_col, end_col))
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        for lineno, line in enumerate(code.splitlines(), start=1):
+            if line.lstrip().startswith("#"):
+                kinds[lineno] = COMMENT
+        return kinds, {}
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return kinds, long_strings
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set, ast.Dict)) and node.end_lineno is not None:
+            if node.end_lineno - node.lineno > LONG_RUN_LINES and _is_constant_display(node):
+                for line in range(node.lineno + 1, node.end_lineno):
+                    kinds.setdefault(line, DATA)
+    return kinds, long_strings
+
+
+def _is_constant_display(node: ast.AST) -> bool:
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return _is_constant_display(node.operand)
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return all(_is_constant_display(e) for e in node.elts)
+    if isinstance(node, ast.Dict):
+        return all(k is not None and _is_constant_display(k) for k in node.keys) and all(
+            _is_constant_display(v) for v in node.values
+        )
+    return False
+
+
+def _js_line_kinds(code: str) -> tuple[Dict[int, str], Dict[int, List[tuple[int, int]]]]:
+    stripped, _ = strip_js_literals(code)
+    kinds: Dict[int, str] = {}
+    long_strings: Dict[int, List[tuple[int, int]]] = {}
+    raw_lines = code.splitlines()
+    for lineno, text in enumerate(stripped.splitlines(), start=1):
+        raw = raw_lines[lineno - 1] if lineno <= len(raw_lines) else ""
+        if not raw.strip():
+            continue
+        if not text.strip():
+            # Blanked entirely: a comment line or the inside of a template literal.
+            kinds[lineno] = COMMENT if raw.lstrip().startswith(("//", "/*", "*")) else STRING
+        elif _JS_DATA_LINE_RE.match(text):
+            kinds[lineno] = DATA
+        for match in re.finditer(r"([\"'`]) {%d,}\1" % LONG_STRING_CHARS, text):
+            long_strings.setdefault(lineno, []).append(match.span())
+    return kinds, long_strings
+
+
+def _shorten_strings(line: str, spans: List[tuple[int, int]]) -> str:
+    for start, end in sorted(spans, reverse=True):
+        literal = line[start:end]
+        elided = len(literal) - _STRING_KEEP_CHARS - 1
+        line = f"{line[:start]}{literal[:_STRING_KEEP_CHARS]}[... {elided} chars]{literal[-1]}{line[end:]}"
+    return line
+
+
+def _elided_lines(kinds: Dict[int, str], n_lines: int) -> Dict[int, int]:
+    """
+    Lines to replace by a marker, mapped to the size of their elided run
+    (only the first line of each run carries the size; others map to 0).
+    """
+    elided: Dict[int, int] = {}
+    line = 1
+    while line <= n_lines:
+        kind = kinds.get(line)
+        if kind is None:
+            line += 1
+            continue
+        end = line
+        while end + 1 <= n_lines and kinds.get(end + 1) == kind:
+            end += 1
+        if end - line + 1 >= LONG_RUN_LINES:
+            # Keep the first and last line of the run for context.
+            middle = range(line + 1, end)
+            for n in middle:
+                elided[n] = 0
+            elided[line + 1] = len(middle)
+        line = end + 1
+    return elided
+
+
+def compact_code(code: str, language: str) -> CompactedCode:
+    """
+    Compact Python or JS/TS for review: drop decorative comment banners,
+    cap blank-line runs at MAX_BLANK_LINES, collapse long comment, string
+    and constant-data runs, shorten very long one-line strings and strip trailing whitespace.
+    Other languages are returned unchanged.
+    """
+    lines = code.splitlines()
+    lang = language.lower().strip()
+    if lang in PYTHON_LANGUAGES:
+        kinds, long_strings = _python_line_kinds(code)
+    elif lang in JS_LANGUAGES:
+        kinds, long_strings = _js_line_kinds(code)
+    else:
+        return CompactedCode(text=code, line_map=list(range(1, len(lines) + 1)), original_lines=len(lines))
+
+    # Banners are dropped outright, so a comment run ends before them.
+    banners: Set[int] = {n for n, kind in kinds.items() if kind == COMMENT and _BANNER_RE.match(lines[n - 1])}
+    elided = _elided_lines({n: kind for n, kind in kinds.items() if n not in banners}, len(lines))
+
+    out: List[str] = []
+    line_map: List[int] = []
+    for lineno, line in enumerate(lines, start=1):
+        if lineno in elided:
+            count = elided[lineno]
+            if count:
+                indent = line[: len(line) - len(line.lstrip())]
+                out.append(f"{indent}[... {count} lines elided ...]")
+                line_map.append(lineno)
+            continue
+        if lineno in banners:
+            continue
+        line = line.rstrip()
+        if lineno in long_strings:
+            line = _shorten_strings(line, long_strings[lineno])
+        # Up to two blank lines are kept: PEP 8 spacing is part of the style.
+        if not line and (not out or out[-MAX_BLANK_LINES:] == [""] * MAX_BLANK_LINES):
+            continue
+        out.append(line)
+        line_map.append(lineno)
+
+    return CompactedCode(text="\n".join(out), line_map=line_map, original_lines=len(lines))
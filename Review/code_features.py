@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import ast
+import io
+import re
+import tokenize
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from code_segmenter import PYTHON_LANGUAGES
+
+
+# Features detected in code. Each maps to the lines (1-based) where it occurs.
+EXCEPTION_HANDLING = "exception_handling"
+HTTP_ROUTE = "http_route"
+ASYNC = "async"
+DEFINITIONS = "definitions"
+LONG_FUNCTION = "long_function"
+NESTING = "nesting"
+IMPORTS = "imports"
+COMMENTS = "comments"
+
+LONG_FUNCTION_LINES = 30
+DEEP_NESTING = 3
+
+# How strongly a line carrying a feature should be kept in the query excerpt.
+_SALIENCE: Dict[str, float] = {
+    HTTP_ROUTE: 3.0,
+    EXCEPTION_HANDLING: 3.0,
+    ASYNC: 2.0,
+    NESTING: 2.0,
+    LONG_FUNCTION: 1.5,
+    DEFINITIONS: 1.5,
+    IMPORTS: 1.0,
+    COMMENTS: 1.0,
+}
+
+_HTTP_MODULES = {"flask", "fastapi", "django", "starlette", "aiohttp", "express", "koa", "fastify", "hapi", "@hapi/hapi"}
+_ROUTE_METHODS = {"route", "get", "post", "put", "patch", "delete", "api_route", "websocket"}
+
+
+@dataclass
+class CodeFeatures:
+    """
+    Constructs found in a piece of code, keyed by feature name, with the
+    lines they appear on. `parsed` is False when a heuristic scan was used.
+    """
+
+    lines: Dict[str, List[int]] = field(default_factory=dict)
+    parsed: bool = True
+
+    def has(self, feature: str) -> bool:
+        return bool(self.lines.get(feature))
+
+
+def _python_features(code: str) -> CodeFeatures | None:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    found: Dict[str, List[int]] = defaultdict(list)
+
+    def visit(node: ast.AST, depth: int) -> None:
+        if isinstance(node, (ast.Try, ast.ExceptHandler, ast.Raise)):
+            found[EXCEPTION_HANDLING].append(node.lineno)
+        if isinstance(node, (ast.AsyncFunctionDef, ast.Await, ast.AsyncFor, ast.AsyncWith)):
+            found[ASYNC].append(node.lineno)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            found[DEFINITIONS].append(node.lineno)
+            for decorator in node.decorator_list:
+                target = decorator.func if isinstance(decorator, ast.Call) else decorator
+                if isinstance(target, ast.Attribute) and target.attr in _ROUTE_METHODS:
+                    found[HTTP_ROUTE].append(decorator.lineno)
+            if not isinstance(node, ast.ClassDef):
+                length = (node.end_lineno or node.lineno) - node.lineno + 1
+                if length > LONG_FUNCTION_LINES:
+                    found[LONG_FUNCTION].append(node.lineno)
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            found[IMPORTS].append(node.lineno)
+            modules = [a.name for a in node.names] if isinstance(node, ast.Import) else [node.module or ""]
+            if any(m.split(".")[0] in _HTTP_MODULES for m in modules):
+                found[HTTP_ROUTE].append(node.lineno)
+
+        nested = isinstance(node, (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try))
+        if nested:
+            depth += 1
+            if depth > DEEP_NESTING:
+                found[NESTING].append(node.lineno)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            depth = 0
+        for child in ast.iter_child_nodes(node):
+            visit(child, depth)
+
+    visit(tree, 0)
+
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type == tokenize.COMMENT:
+                found[COMMENTS].append(token.start[0])
+    except (tokenize.TokenError, IndentationError):
+        pass
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if ast.get_docstring(node) is not None:
+                found[COMMENTS].append(node.body[0].lineno)
+
+    return CodeFeatures(lines={k: sorted(set(v)) for k, v in found.items()})
+
+
+_JS_PATTERNS: Dict[str, re.Pattern[str]] = {
+    EXCEPTION_HANDLING: re.compile(r"\btry\s*\{|\bcatch\b|\bthrow\b|\.catch\s*\("),
+    ASYNC: re.compile(r"\basync\b|\bawait\b|\.then\s*\(|\.catch\s*\(|\bnew\s+Promise\b|\bPromise\.\w+"),
+    HTTP_ROUTE: re.compile(r"\b(?:app|router|server|api)\.(?:get|post|put|patch|delete|route|all)\s*\("),
+    DEFINITIONS: re.compile(
+        r"\bfunction\b|\bclass\s+[\w$]|=>|\b(?:const|let|var)\s+[\w$]+\s*=|\b(?:interface|type)\s+[\w$]+\s*[={<]"
+    ),
+    IMPORTS: re.compile(r"^\s*import\b|\brequire\s*\(|\bmodule\.exports\b|^\s*export\b"),
+}
+_JS_MODULE_RE = re.compile(r"""(?:from\s+|require\s*\(\s*)['"]([^'"]+)['"]""")
+
+# Line patterns for Python that does not parse (e.g. a diff hunk or fragment).
+_PY_FALLBACK_PATTERNS: Dict[str, re.Pattern[str]] = {
+    EXCEPTION_HANDLING: re.compile(r"^\s*(?:try\s*:|except\b|raise\b)"),
+    DEFINITIONS: re.compile(r"^\s*(?:async\s+)?(?:def|class)\s"),
+    IMPORTS: re.compile(r"^\s*(?:import|from)\s"),
+    COMMENTS: re.compile(r"^\s*#"),
+    HTTP_ROUTE: re.compile(r"^\s*@\w+\.(?:route|get|post|put|patch|delete)\s*\("),
+}
+
+
+def strip_js_literals(code: str) -> tuple[str, List[int]]:
+    """
+    Blank out comments and string contents (keeping line breaks) so patterns
+    only match real code. Returns the stripped code and the comment lines.
+    """
+    out: List[str] = []
+    comment_lines: List[int] = []
+    line = 1
+    i = 0
+    n = len(code)
+    while i < n:
+        c = code[i]
+        if code.startswith("//", i) or code.startswith("/*", i):
+            end = code.find("\n", i) if code[i + 1] == "/" else code.find("*/", i + 2)
+            end = n if end < 0 else (end if code[i + 1] == "/" else end + 2)
+            comment_lines.append(line)
+            text = code[i:end]
+            line += text.count("\n")
+            out.append(re.sub(r"[^\n]", " ", text))
+            i = end
+            continue
+        if c in "\"'`":
+            j = i + 1
+            while j < n and code[j] != c:
+                if code[j] == "\\":
+                    j += 1
+                elif code[j] == "\n" and c != "`":
+                    break
+                j += 1
+            text = code[i + 1 : j]
+            line += text.count("\n")
+            out.append(c + re.sub(r"[^\n]", " ", text) + (c if j < n else ""))
+            i = j + 1
+            continue
+        if c == "\n":
+            line += 1
+        out.append(c)
+        i += 1
+    return "".join(out), comment_lines
+
+
+def _js_features(code: str) -> CodeFeatures:
+    stripped, comment_lines = strip_js_literals(code)
+    found: Dict[str, List[int]] = defaultdict(list)
+    if comment_lines:
+        found[COMMENTS] = comment_lines
+
+    depth = 0
+    function_starts: List[tuple[int, int]] = []  # (line, depth) of open function bodies
+    raw_lines = code.splitlines()
+    for lineno, text in enumerate(stripped.splitlines(), start=1):
+        for feature, pattern in _JS_PATTERNS.items():
+            if pattern.search(text):
+                found[feature].append(lineno)
+        raw = raw_lines[lineno - 1] if lineno <= len(raw_lines) else ""
+        if any(m.group(1).split("/")[0] in _HTTP_MODULES for m in _JS_MODULE_RE.finditer(raw)):
+            found[HTTP_ROUTE].append(lineno)
+
+        is_function = bool(re.search(r"\bfunction\b|=>", text))
+        for c in text:
+            if c == "{":
+                depth += 1
+                if is_function:
+                    function_starts.append((lineno, depth))
+                    is_function = False
+                # Function body counts as level one; deeper blocks are nesting.
+                body_depth = function_starts[-1][1] if function_starts else 0
+                if depth - body_depth > DEEP_NESTING:
+                    found[NESTING].append(lineno)
+            elif c == "}":
+                if function_starts and function_starts[-1][1] == depth:
+                    start, _ = function_starts.pop()
+                    if lineno - start + 1 > LONG_FUNCTION_LINES:
+                        found[LONG_FUNCTION].append(start)
+                depth = max(0, depth - 1)
+
+    return CodeFeatures(lines={k: sorted(set(v)) for k, v in found.items()}, parsed=False)
+
+
+def extract_features(code: str, language: str) -> CodeFeatures:
+    """
+    Detect reviewable constructs: Python through its AST and tokenizer (line
+    patterns when it does not parse), JS/TS and other brace languages
+    through a comment- and string-aware scanner.
+    """
+    if language.lower().strip() not in PYTHON_LANGUAGES:
+        return _js_features(code)
+    features = _python_features(code)
+    if features is not None:
+        return features
+
+    # Python that does not parse, e.g. a diff hunk or a fragment.
+    found: Dict[str, List[int]] = defaultdict(list)
+    for lineno, text in enumerate(code.splitlines(), start=1):
+        for feature, pattern in _PY_FALLBACK_PATTERNS.items():
+            if pattern.match(text):
+                found[feature].append(lineno)
+        if re.search(r"\basync\b|\bawait\b", text):
+            found[ASYNC].append(lineno)
+    return CodeFeatures(lines=dict(found), parsed=False)
+
+
+def salient_excerpt(code: str, features: CodeFeatures, max_chars: int = 600) -> str:
+    """
+    The lines that carry the most detected constructs, in source order, up
+    to `max_chars`. Falls back to the start of the code when nothing was
+    detected.
+    """
+    scores: Dict[int, float] = defaultdict(float)
+    for feature, lines in features.lines.items():
+        for line in lines:
+            scores[line] += _SALIENCE.get(feature, 1.0)
+    if not scores:
+        return code[:max_chars]
+
+    source = code.splitlines()
+    chosen: List[int] = []
+    used = 0
+    for line in sorted(scores, key=lambda l: (-scores[l], l)):
+        if line > len(source):
+            continue
+        text = source[line - 1].strip()
+        if not text:
+            continue
+        if used + len(text) + 1 > max_chars:
+            if chosen:
+                continue
+            text = text[:max_chars]
+        chosen.append(line)
+        used += len(text) + 1
+    return "\n".join(source[line - 1].strip()[:max_chars] for line in sorted(chosen))
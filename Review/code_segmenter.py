@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import ast
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+
+PYTHON_LANGUAGES = ("python", "py")
+JS_LANGUAGES = ("javascript", "typescript", "js", "ts")
+
+_JS_NAME_RE = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?"
+    r"(?:function\s*\*?\s*(?P<func>[\w$]+)|class\s+(?P<cls>[\w$]+)|(?:const|let|var)\s+(?P<var>[\w$]+))"
+)
+# A `CodeSegment.label` prefix, as put in front of merged segment issues.
+_LABEL_PREFIX_RE = re.compile(r"^lines (\d+)-(\d+)(?: \([^)]*\))?(?::\s*|$)")
+
+
+@dataclass
+class CodeSegment:
+    """
+    A contiguous slice of a source file. Line numbers are 1-based and inclusive.
+    """
+
+    start_line: int
+    end_line: int
+    text: str
+    names: Tuple[str, ...] = ()
+
+    @property
+    def label(self) -> str:
+        where = f"lines {self.start_line}-{self.end_line}"
+        if self.names:
+            shown = ", ".join(self.names[:3]) + (", ..." if len(self.names) > 3 else "")
+            return f"{where} ({shown})"
+        return where
+
+
+def split_segment_label(text: str) -> Tuple[Tuple[int, int] | None, str]:
+    """
+    Split a leading segment label off merged issue text: returns the
+    segment's (start_line, end_line), or None without a label, and the rest.
+    """
+    match = _LABEL_PREFIX_RE.match(text)
+    if not match:
+        return None, text
+    return (int(match.group(1)), int(match.group(2))), text[match.end() :]
+
+
+# (start_line, end_line, name) spans before packing; name may be empty.
+_Span = Tuple[int, int, str]
+
+
+def _python_spans(code: str, max_lines: int) -> List[_Span]:
+    return _python_node_spans(ast.parse(code).body, max_lines)
+
+
+def _python_node_spans(nodes: List[ast.stmt], max_lines: int, prefix: str = "") -> List[_Span]:
+    spans: List[_Span] = []
+    for node in nodes:
+        start = node.lineno
+        decorators = getattr(node, "decorator_list", [])
+        if decorators:
+            start = min(start, min(d.lineno for d in decorators))
+        end = getattr(node, "end_lineno", None) or start
+        is_def = isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        name = f"{prefix}{node.name}" if is_def else ""  # type: ignore[attr-defined]
+        if is_def and end - start + 1 > max_lines:
+            # Too long for one segment: split at the statements of its body,
+            # so a large class breaks between its methods.
+            children = _python_node_spans(node.body, max_lines, prefix=f"{name}.")  # type: ignore[attr-defined]
+            spans.append((start, max(start, children[0][0] - 1), name))
+            spans.extend(children)
+        else:
+            spans.append((start, end, name))
+    return spans
+
+
+def _js_spans(code: str) -> List[_Span]:
+    """
+    Split JS/TS into top-level statements by tracking bracket depth while
+    skipping strings, template literals and comments.
+    """
+    spans: List[_Span] = []
+    depth = 0
+    line = 1
+    stmt_start: int | None = None
+    stmt_first_char = 0
+    i = 0
+    n = len(code)
+
+    def close(end_line: int, end_index: int) -> None:
+        nonlocal stmt_start
+        if stmt_start is None:
+            return
+        match = _JS_NAME_RE.match(code[stmt_first_char:end_index])
+        name = ""
+        if match:
+            name = match.group("func") or match.group("cls") or match.group("var") or ""
+        spans.append((stmt_start, end_line, name))
+        stmt_start = None
+
+    while i < n:
+        c = code[i]
+        if c == "\n":
+            line += 1
+            i += 1
+            continue
+        if c.isspace():
+            i += 1
+            continue
+        if code.startswith("//", i):
+            end = code.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        if code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            end = n if end < 0 else end + 2
+            line += code.count("\n", i, end)
+            i = end
+            continue
+
+        if stmt_start is None and depth == 0:
+            stmt_start = line
+            stmt_first_char = i
+
+        if c in "\"'`":
+            j = i + 1
+            while j < n and code[j] != c:
+                if code[j] == "\\":
+                    j += 1
+                elif code[j] == "\n" and c != "`":
+                    break
+                j += 1
+            line += code.count("\n", i, min(j, n))
+            i = j + 1
+            continue
+        if c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth = max(0, depth - 1)
+            if depth == 0 and c == "}":
+                # A block at top level ends the statement unless it continues (e.g. `} else {`, `});`).
+                rest = code[i + 1:i + 64].lstrip(" \t")
+                if not rest.startswith((")", ",", ".", "else", "catch", "finally", ";", "(")):
+                    close(line, i + 1)
+        elif c == ";" and depth == 0:
+            close(line, i + 1)
+        i += 1
+
+    close(line, n)
+    return spans
+
+
+def _line_window_spans(total_lines: int, max_lines: int) -> List[_Span]:
+    return [
+        (start, min(start + max_lines - 1, total_lines), "")
+        for start in range(1, total_lines + 1, max_lines)
+    ]
+
+
+def _pack(spans: List[_Span], lines: List[str], max_lines: int) -> List[CodeSegment]:
+    """
+    Merge adjacent spans into segments of at most `max_lines` and attach the
+    gaps between spans (comments, blank lines) to the following one. A single
+    span longer than `max_lines` (one that could not be split at nested
+    definitions) is cut into line windows.
+    """
+    segments: List[CodeSegment] = []
+    cur_start: int | None = None
+    cur_end = 0
+    cur_names: List[str] = []
+    prev_end = 0
+
+    def flush() -> None:
+        if cur_start is None:
+            return
+        text = "\n".join(lines[cur_start - 1:cur_end])
+        if text.strip():
+            segments.append(CodeSegment(cur_start, cur_end, text, tuple(cur_names)))
+
+    for start, end, name in sorted(spans):
+        start = max(start, prev_end + 1)
+        if end < start:
+            continue
+        fits = end - prev_end <= max_lines
+        if cur_start is not None and end - cur_start + 1 > max_lines and fits:
+            flush()
+            cur_start, cur_names = None, []
+        if cur_start is None:
+            cur_start = prev_end + 1
+        # An oversized span fills the current segment, then continues in windows.
+        while end - cur_start + 1 > max_lines:
+            cur_end = cur_start + max_lines - 1
+            if name:
+                cur_names.append(name)
+            flush()
+            cur_start, cur_names = cur_end + 1, []
+        cur_end = end
+        if name:
+            cur_names.append(name)
+        prev_end = end
+
+    if cur_start is not None:
+        cur_end = max(cur_end, len(lines))
+    flush()
+    return segments
+
+
+def split_code_segments(code: str, language: str, max_lines: int = 120) -> List[CodeSegment]:
+    """
+    Split source into function/class-level segments of roughly `max_lines`.
+
+    Python is split on top-level AST nodes (and a definition too long for
+    one segment on the statements of its body), JS/TS on top-level
+    statements; anything else (or code that fails to parse) falls back to
+    fixed windows.
+    """
+    lines = code.splitlines()
+    if not lines:
+        return []
+
+    lang = language.lower().strip()
+    spans: List[_Span] = []
+    try:
+        if lang in PYTHON_LANGUAGES:
+            spans = _python_spans(code, max_lines)
+        elif lang in JS_LANGUAGES:
+            spans = _js_spans(code)
+    except SyntaxError:
+        spans = []
+
+    if not spans:
+        spans = _line_window_spans(len(lines), max_lines)
+    return _pack(spans, lines, max_lines)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+from index_artifact import hash_standards_sources, write_index_artifact
+from index_registry import StandardsIndexRegistry
+from models import StandardsChunk
+from standards_loader import parse_standards_file
+
+
+@dataclass
+class ReloadReport:
+    changed_files: List[str] = field(default_factory=list)
+    added: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    refitted_stores: int = 0
+    reused_stores: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.changed_files)
+
+
+class StandardsCorpusReloader:
+    """
+    Keeps the live standards index in sync with the markdown files on disk.
+
+    Each reload re-parses only the files whose hash changed, diffs the result
+    by rule_id and publishes a new registry that reuses every vector store
+    whose rules are unchanged. The registry reference is swapped atomically:
+    reviews that already grabbed `registry` keep reading their snapshot.
+    """
+
+    def __init__(
+        self,
+        standards_dir: Path,
+        registry: StandardsIndexRegistry,
+        index_dir: Path | None = None,
+    ) -> None:
+        self._standards_dir = standards_dir
+        self._index_dir = index_dir
+        self._registry = registry
+        self._file_hashes: Dict[str, str] = hash_standards_sources(standards_dir)
+        self._file_chunks: Dict[str, List[StandardsChunk]] = {}
+        for chunk in registry.chunks:
+            self._file_chunks.setdefault(chunk.doc_name, []).append(chunk)
+
+        self._reload_lock = threading.Lock()
+        self._stop_event: threading.Event | None = None
+        self._watcher: threading.Thread | None = None
+
+    @property
+    def registry(self) -> StandardsIndexRegistry:
+        return self._registry
+
+    def reload(self) -> ReloadReport:
+        """
+        Apply on-disk changes to the live index. A no-op when nothing changed.
+
+        The unit of reuse is a whole language group: every group that holds
+        an added, updated or removed rule is refitted from scratch, and only
+        untouched groups keep their store. A change to an all-languages rule
+        therefore refits every group, i.e. a full re-index. Rows are not
+        patched in place because IDF weights, and the LSA projection, depend
+        on every rule of the group; a row-level update would leave them stale.
+        """
+        with self._reload_lock:
+            return self._reload_locked()
+
+    def _reload_locked(self) -> ReloadReport:
+        report = ReloadReport()
+        new_hashes = hash_standards_sources(self._standards_dir)
+        names = sorted(set(new_hashes) | set(self._file_hashes))
+        report.changed_files = [n for n in names if new_hashes.get(n) != self._file_hashes.get(n)]
+        if not report.changed_files:
+            return report
+
+        file_chunks = dict(self._file_chunks)
+        for name in report.changed_files:
+            if name in new_hashes:
+                file_chunks[name] = parse_standards_file(self._standards_dir / name)
+            else:
+                file_chunks.pop(name, None)
+
+        new_chunks = [chunk for name in sorted(file_chunks) for chunk in file_chunks[name]]
+        if not new_chunks:
+            raise RuntimeError(f"No standards rules found in: {self._standards_dir}")
+
+        old_by_rule = {c.rule_id: c for c in self._registry.chunks}
+        new_by_rule = {c.rule_id: c for c in new_chunks}
+        report.added = sorted(r for r in new_by_rule if r not in old_by_rule)
+        report.removed = sorted(r for r in old_by_rule if r not in new_by_rule)
+        report.updated = sorted(
+            r for r in new_by_rule if r in old_by_rule and new_by_rule[r] != old_by_rule[r]
+        )
+
+        registry = self._registry.with_chunks(new_chunks)
+        report.reused_stores = len(registry.fitted_stores())
+        registry.warm()
+        report.refitted_stores = len(registry.fitted_stores()) - report.reused_stores
+
+        self._registry = registry
+        self._file_hashes = new_hashes
+        self._file_chunks = file_chunks
+
+        if self._index_dir is not None:
+            try:
+                write_index_artifact(registry, self._index_dir, new_hashes)
+            except OSError:
+                # The live index is already updated; the artifact is only a startup cache.
+                pass
+        return report
+
+    def start_watching(self, interval_seconds: float = 2.0) -> None:
+        """
+        Poll the standards directory in a daemon thread and reload on change.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        stop_event = threading.Event()
+
+        def _poll() -> None:
+            while not stop_event.wait(interval_seconds):
+                try:
+                    self.reload()
+                except (OSError, RuntimeError, ValueError):
+                    # A file caught mid-save; keep serving the last good snapshot.
+                    continue
+
+        self._stop_event = stop_event
+        self._watcher = threading.Thread(target=_poll, name="standards-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join()
+        self._stop_event = None
+        self._watcher = None
@@ -0,0 +1,334 @@
+"""
+Diff-aware review: only the hunks of a unified diff are reviewed, each with
+the context lines the diff already carries, so the cost follows the size of
+the change rather than the size of the files.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Sequence, Tuple
+
+from code_segmenter import split_segment_label
+from index_registry import StandardsIndexRegistry
+from languages import infer_language_from_path
+from llm_client import GROQ_MODEL
+from models import DiffReviewRequest, ReviewIssue, ReviewRequest, ReviewResponse, StandardsChunk
+from prompts import prompt_version
+from rag_pipeline import COMPACT_MIN_LINES, MAX_SEGMENT_WORKERS, PROMPT_LAYOUT, arun_rag_review, run_rag_review
+from review_cache import ReviewCache
+from review_merge import NO_COVERAGE_SUMMARY, ReviewMerger, verdict_for_issues
+
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# Local checks and segment reviews refer to lines of the reviewed snippet.
+_SNIPPET_LINE_RE = re.compile(r"^lines? (\d+)(?:-\d+)?:\s*", re.IGNORECASE)
+
+
+@dataclass
+class DiffHunk:
+    """
+    New-side content of one hunk: context and added lines, with the added
+    ones flagged in `changed`. `new_start` is the 1-based line of `lines[0]`
+    in the new file.
+    """
+
+    path: str
+    new_start: int
+    lines: List[str] = field(default_factory=list)
+    changed: List[bool] = field(default_factory=list)
+
+    @property
+    def end_line(self) -> int:
+        return self.new_start + max(len(self.lines), 1) - 1
+
+    @property
+    def has_changes(self) -> bool:
+        return any(self.changed)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    @property
+    def label(self) -> str:
+        return f"{self.path}:{self.new_start}-{self.end_line}"
+
+    def changed_snippet_lines(self) -> List[int]:
+        return [i + 1 for i, flag in enumerate(self.changed) if flag]
+
+
+@dataclass
+class FileDiff:
+    path: str
+    hunks: List[DiffHunk] = field(default_factory=list)
+
+
+def _diff_path(header: str) -> str | None:
+    path = header[4:].split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def parse_unified_diff(diff: str) -> List[FileDiff]:
+    """
+    Parse `git diff` / `diff -u` output. Deleted files are skipped; removed
+    lines are dropped since there is nothing left to review in them.
+    """
+    files: List[FileDiff] = []
+    current: FileDiff | None = None
+    hunk: DiffHunk | None = None
+    old_left = new_left = 0
+
+    for line in diff.splitlines():
+        if hunk is not None and (old_left > 0 or new_left > 0):
+            tag, body = line[:1], line[1:]
+            if tag == "+":
+                hunk.lines.append(body)
+                hunk.changed.append(True)
+                new_left -= 1
+                continue
+            if tag == "-":
+                old_left -= 1
+                continue
+            if tag in (" ", ""):
+                hunk.lines.append(body)
+                hunk.changed.append(False)
+                old_left -= 1
+                new_left -= 1
+                continue
+            if tag == "\\":
+                # "\ No newline at end of file"
+                continue
+
+        match = _HUNK_RE.match(line)
+        if match and current is not None:
+            hunk = DiffHunk(path=current.path, new_start=int(match.group(3)))
+            current.hunks.append(hunk)
+            old_left = int(match.group(2) or 1)
+            new_left = int(match.group(4) or 1)
+        elif line.startswith("+++ "):
+            path = _diff_path(line)
+            current = FileDiff(path=path) if path is not None else None
+            if current is not None:
+                files.append(current)
+            hunk = None
+        elif line.startswith("diff --git "):
+            current = None
+            hunk = None
+    return files
+
+
+def corpus_fingerprint(chunks: Sequence[StandardsChunk]) -> str:
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(f"{chunk.rule_id}\0{chunk.scope}\0{chunk.text}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def hunk_cache_key(hunk: DiffHunk, language: str, context: str | None, corpus: str = "") -> str:
+    """
+    Content hash of a hunk. Position and file name are left out, so a hunk
+    that only moved (or whose file was renamed) reuses its earlier review.
+    `corpus` (see `corpus_fingerprint`) invalidates entries when the
+    standards change.
+    """
+    payload = json.dumps(
+        [
+            "diff-hunk",
+            GROQ_MODEL,
+            prompt_version(PROMPT_LAYOUT),
+            COMPACT_MIN_LINES,
+            corpus,
+            language,
+            context,
+            hunk.lines,
+            hunk.changed,
+        ]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _hunk_request(hunk: DiffHunk, language: str, context: str | None) -> ReviewRequest:
+    changed = ", ".join(str(n) for n in hunk.changed_snippet_lines())
+    note = (
+        "This snippet is a changed region from a diff. "
+        f"Lines {changed} (1-based within the snippet) were added or modified; "
+        "the other lines are unchanged context. Review only the changed lines."
+    )
+    return ReviewRequest(
+        language=language,
+        code=hunk.text,
+        context=f"{context}\n{note}" if context else note,
+    )
+
+
+def _snippet_line(issue: ReviewIssue, hunk: DiffHunk) -> Tuple[int | None, str | None]:
+    """
+    The 1-based snippet line an issue points at, or None when it cannot be
+    placed, and the affected_code without any snippet-relative line prefix.
+    """
+    segment, affected = split_segment_label(issue.affected_code or "")
+    match = _SNIPPET_LINE_RE.match(affected)
+    if match:
+        return int(match.group(1)), affected[match.end() :] or None
+
+    first = next((l.strip() for l in affected.splitlines() if l.strip()), "")
+    if first:
+        # Changed lines first: the review is asked to focus on them.
+        order = sorted(range(len(hunk.lines)), key=lambda i: not hunk.changed[i])
+        for i in order:
+            if first in hunk.lines[i]:
+                return i + 1, affected
+    if segment is not None:
+        return segment[0], affected or None
+    return None, issue.affected_code
+
+
+def _changed_issues(response: ReviewResponse, hunk: DiffHunk) -> Tuple[List[Tuple[ReviewIssue, str]], bool]:
+    """
+    The issues of a hunk review that point at a changed line (or could not
+    be placed at all), each with its `path:line` label in the new file, and
+    whether any issue on unchanged context lines was dropped.
+    """
+    changed = set(hunk.changed_snippet_lines())
+    kept: List[Tuple[ReviewIssue, str]] = []
+    dropped = False
+    for issue in response.issues:
+        line, affected = _snippet_line(issue, hunk)
+        if line is not None and line not in changed:
+            dropped = True
+            continue
+        label = f"{hunk.path}:{hunk.new_start + line - 1}" if line is not None else hunk.label
+        kept.append((issue.model_copy(update={"affected_code": affected}), label))
+    return kept, dropped
+
+
+def _review_hunk(
+    hunk: DiffHunk,
+    language: str,
+    context: str | None,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None,
+    cache: ReviewCache | None,
+    corpus: str = "",
+) -> ReviewResponse:
+    key = hunk_cache_key(hunk, language, context, corpus) if cache is not None else None
+    if cache is not None and key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    response = run_rag_review(_hunk_request(hunk, language, context), all_chunks, registry=registry, cache=cache)
+    if cache is not None and key is not None:
+        cache.put(key, response)
+    return response
+
+
+def _diff_jobs(request: DiffReviewRequest) -> List[Tuple[DiffHunk, str]]:
+    """
+    The (hunk, language) pairs of a diff that add or modify lines.
+    """
+    jobs: List[Tuple[DiffHunk, str]] = []
+    for file_diff in parse_unified_diff(request.diff):
+        language = request.language or infer_language_from_path(file_diff.path)
+        if language is None:
+            continue
+        jobs.extend((hunk, language) for hunk in file_diff.hunks if hunk.has_changes)
+    return jobs
+
+
+def _merge_hunk_reviews(jobs: Sequence[Tuple[DiffHunk, str]], responses: Sequence[ReviewResponse]) -> ReviewResponse:
+    merger = ReviewMerger()
+    for (hunk, _), response in zip(jobs, responses):
+        issues, dropped = _changed_issues(response, hunk)
+        # The hunk's verdict may rest on context-line findings; judge it on what is left.
+        verdict = verdict_for_issues([issue for issue, _ in issues]) if dropped else response.verdict
+        merger.add_verdict(verdict)
+        if response.verdict != "no_coverage":
+            merger.add_summary(response.summary, label=hunk.label)
+        for item in response.positive_feedback:
+            merger.add_positive(item)
+        for issue, label in issues:
+            merger.add_issue(issue, label=label)
+    return merger.result()
+
+
+def run_diff_review(
+    request: DiffReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None = None,
+    cache: ReviewCache | None = None,
+) -> ReviewResponse:
+    """
+    Review every hunk that adds or modifies lines, in parallel, and merge
+    the results. Issues point at `path:line` in the new version of the file;
+    findings on the unchanged context lines of a hunk are left out.
+    """
+    jobs = _diff_jobs(request)
+    if not jobs:
+        return ReviewResponse(verdict="no_coverage", summary=NO_COVERAGE_SUMMARY)
+
+    corpus = corpus_fingerprint(all_chunks) if cache is not None else ""
+    with ThreadPoolExecutor(max_workers=min(MAX_SEGMENT_WORKERS, len(jobs))) as pool:
+        responses = list(
+            pool.map(
+                lambda job: _review_hunk(job[0], job[1], request.context, all_chunks, registry, cache, corpus),
+                jobs,
+            )
+        )
+    return _merge_hunk_reviews(jobs, responses)
+
+
+async def _areview_hunk(
+    hunk: DiffHunk,
+    language: str,
+    context: str | None,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None,
+    cache: ReviewCache | None,
+    corpus: str = "",
+) -> ReviewResponse:
+    key = hunk_cache_key(hunk, language, context, corpus) if cache is not None else None
+    if cache is not None and key is not None:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+
+    response = await arun_rag_review(_hunk_request(hunk, language, context), all_chunks, registry=registry, cache=cache)
+    if cache is not None and key is not None:
+        await asyncio.to_thread(cache.put, key, response)
+    return response
+
+
+async def arun_diff_review(
+    request: DiffReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None = None,
+    cache: ReviewCache | None = None,
+) -> ReviewResponse:
+    """
+    Async variant of `run_diff_review`: hunks are reviewed concurrently,
+    up to MAX_SEGMENT_WORKERS at a time, with non-blocking LLM calls.
+    """
+    jobs = _diff_jobs(request)
+    if not jobs:
+        return ReviewResponse(verdict="no_coverage", summary=NO_COVERAGE_SUMMARY)
+
+    corpus = await asyncio.to_thread(corpus_fingerprint, all_chunks) if cache is not None else ""
+    limit = asyncio.Semaphore(MAX_SEGMENT_WORKERS)
+
+    async def review(hunk: DiffHunk, language: str) -> ReviewResponse:
+        async with limit:
+            return await _areview_hunk(hunk, language, request.context, all_chunks, registry, cache, corpus)
+
+    responses = await asyncio.gather(*(review(hunk, language) for hunk, language in jobs))
+    return _merge_hunk_reviews(jobs, responses)
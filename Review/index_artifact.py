@@ -0,0 +1,241 @@
+"""
+Persistent standards index for fast CodeSensei startup.
+
+The artifact is a directory holding the chunk table (a columnar
+CompactCorpus: one text buffer with offsets and interned metadata), plus one
+sub-directory per fitted vector store with its vocabulary, IDF weights and
+CSR matrix as plain `.npy` files that are memory-mapped on load (and, for stores with an
+approximate index, its LSH bucket keys under `ann/`; for stores with a latent
+index, the float32 LSA projection under `lsa/`). A manifest records the
+artifact version, the LSA and ANN settings and a hash of every source
+markdown file; any mismatch triggers a rebuild.
+
+Build it ahead of time with:
+
+    python index_artifact.py build
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from scipy import sparse
+
+from ann_index import RandomProjectionLSH
+from index_registry import StandardsIndexRegistry, index_settings
+from lsa_index import LatentSemanticIndex
+from models import StandardsChunk
+from standards_loader import CompactCorpus, load_standards_corpus
+from vector_store import StandardsVectorStore
+
+
+ARTIFACT_VERSION = 3
+MANIFEST_NAME = "manifest.json"
+CHUNKS_NAME = "chunks.json"
+
+_BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_STANDARDS_DIR = _BASE_DIR / "standards"
+DEFAULT_INDEX_DIR = _BASE_DIR / ".standards_index"
+
+
+def hash_standards_sources(standards_dir: Path) -> Dict[str, str]:
+    """
+    SHA-256 of every markdown file in the standards directory, keyed by file name.
+    """
+    return {
+        path.name: hashlib.sha256(path.read_bytes()).hexdigest()
+        for path in sorted(standards_dir.glob("*.md"))
+    }
+
+
+def _write_store(store_dir: Path, store: StandardsVectorStore) -> Dict[str, Any]:
+    vocabulary, idf, matrix = store.to_arrays()
+    terms = sorted(vocabulary, key=vocabulary.__getitem__)
+
+    store_dir.mkdir(parents=True)
+    np.save(store_dir / "vocabulary.npy", np.array(terms, dtype=str))
+    np.save(store_dir / "idf.npy", np.asarray(idf, dtype=np.float64))
+    np.save(store_dir / "data.npy", matrix.data)
+    np.save(store_dir / "indices.npy", matrix.indices)
+    np.save(store_dir / "indptr.npy", matrix.indptr)
+    if store.ann_index is not None:
+        store.ann_index.save(store_dir / "ann")
+    if store.lsa_index is not None:
+        store.lsa_index.save(store_dir / "lsa")
+    return {
+        "shape": list(matrix.shape),
+        "ann": store.ann_index is not None,
+        "lsa": store.lsa_index is not None,
+    }
+
+
+def _read_store(
+    store_dir: Path,
+    chunks: List[StandardsChunk],
+    shape: List[int],
+    ann: bool = False,
+    lsa: bool = False,
+) -> StandardsVectorStore:
+    terms = np.load(store_dir / "vocabulary.npy", mmap_mode="r")
+    idf = np.load(store_dir / "idf.npy", mmap_mode="r")
+    matrix = sparse.csr_matrix(
+        (
+            np.load(store_dir / "data.npy", mmap_mode="r"),
+            np.load(store_dir / "indices.npy", mmap_mode="r"),
+            np.load(store_dir / "indptr.npy", mmap_mode="r"),
+        ),
+        shape=tuple(shape),
+        copy=False,
+    )
+    vocabulary = {str(term): col for col, term in enumerate(terms)}
+    store = StandardsVectorStore.from_arrays(chunks, vocabulary, np.asarray(idf), matrix)
+    if ann:
+        store.attach_ann(RandomProjectionLSH.load(store_dir / "ann"))
+    if lsa:
+        store.attach_lsa(LatentSemanticIndex.load(store_dir / "lsa"))
+    return store
+
+
+def write_index_artifact(
+    registry: StandardsIndexRegistry,
+    index_dir: Path,
+    sources: Dict[str, str],
+) -> None:
+    """
+    Serialize every fitted store of `registry` into `index_dir`, replacing any
+    previous artifact. The directory is written to a temporary location first
+    so readers never observe a half-written index.
+    """
+    index_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".standards_index-", dir=index_dir.parent))
+    try:
+        corpus = CompactCorpus.from_chunks(registry.chunks)
+        (tmp_dir / CHUNKS_NAME).write_text(json.dumps(corpus.to_dict()), encoding="utf-8")
+
+        stores_meta: List[Dict[str, Any]] = []
+        for i, (positions, store) in enumerate(sorted(registry.fitted_stores().items())):
+            name = f"store-{i}"
+            meta = _write_store(tmp_dir / name, store)
+            stores_meta.append({"name": name, "positions": list(positions), **meta})
+
+        manifest = {
+            "version": ARTIFACT_VERSION,
+            "sources": sources,
+            "settings": index_settings(),
+            "chunk_count": len(corpus),
+            "stores": stores_meta,
+        }
+        (tmp_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+        if index_dir.exists():
+            shutil.rmtree(index_dir)
+        tmp_dir.rename(index_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def build_index_artifact(standards_dir: Path, index_dir: Path) -> StandardsIndexRegistry:
+    """
+    Parse the standards corpus, fit every per-language store and persist them.
+    """
+    sources = hash_standards_sources(standards_dir)
+    registry = StandardsIndexRegistry(load_standards_corpus(standards_dir))
+    registry.warm()
+    write_index_artifact(registry, index_dir, sources)
+    return registry
+
+
+def read_manifest(index_dir: Path) -> Dict[str, Any] | None:
+    manifest_path = index_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        return None
+
+
+def load_index_artifact(index_dir: Path, expected_sources: Dict[str, str] | None = None) -> StandardsIndexRegistry | None:
+    """
+    Load a registry from disk. Returns None when the artifact is missing, was
+    written by a different artifact version or under different index settings
+    (LSA and ANN, see `index_registry.index_settings`), or (if
+    `expected_sources` is given) was built from different standards files.
+    """
+    manifest = read_manifest(index_dir)
+    if manifest is None or manifest.get("version") != ARTIFACT_VERSION:
+        return None
+    if manifest.get("settings") != index_settings():
+        return None
+    if expected_sources is not None and manifest.get("sources") != expected_sources:
+        return None
+
+    # The artifact is written by this module, so chunks skip pydantic validation.
+    corpus = CompactCorpus.from_dict(json.loads((index_dir / CHUNKS_NAME).read_text(encoding="utf-8")))
+    chunks = corpus.to_chunks()
+
+    stores: Dict[tuple[int, ...], StandardsVectorStore] = {}
+    for meta in manifest["stores"]:
+        positions = tuple(meta["positions"])
+        store_chunks = [chunks[pos] for pos in positions]
+        stores[positions] = _read_store(
+            index_dir / meta["name"],
+            store_chunks,
+            meta["shape"],
+            ann=meta.get("ann", False),
+            lsa=meta.get("lsa", False),
+        )
+
+    return StandardsIndexRegistry(chunks, stores=stores)
+
+
+def load_or_build_index(
+    standards_dir: Path = DEFAULT_STANDARDS_DIR,
+    index_dir: Path = DEFAULT_INDEX_DIR,
+) -> StandardsIndexRegistry:
+    """
+    Load the on-disk index if it matches the current standards files,
+    otherwise rebuild (and persist) it.
+    """
+    if not standards_dir.exists():
+        raise FileNotFoundError(f"Standards directory not found: {standards_dir}")
+
+    sources = hash_standards_sources(standards_dir)
+    registry = load_index_artifact(index_dir, expected_sources=sources)
+    if registry is not None:
+        return registry
+
+    registry = StandardsIndexRegistry(load_standards_corpus(standards_dir))
+    registry.warm()
+    try:
+        write_index_artifact(registry, index_dir, sources)
+    except OSError:
+        # A read-only deployment can still serve from the in-memory index.
+        pass
+    return registry
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the CodeSensei standards index artifact.")
+    parser.add_argument("command", choices=["build"], help="Action to perform.")
+    parser.add_argument("--standards-dir", type=Path, default=DEFAULT_STANDARDS_DIR)
+    parser.add_argument("--index-dir", type=Path, default=DEFAULT_INDEX_DIR)
+    args = parser.parse_args(argv)
+
+    registry = build_index_artifact(args.standards_dir, args.index_dir)
+    print(
+        f"Wrote {len(registry.chunks)} rules in {len(registry.fitted_stores())} stores "
+        f"to {args.index_dir}"
+    )
+
+
+if __name__ == "__main__":
+    main()
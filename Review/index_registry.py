@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Callable, Dict, List, Mapping, Sequence, Tuple
+
+from bm25_store import BM25Store
+from models import StandardsChunk
+from prompts import build_guideline_block, format_compact_guideline_chunk
+from static_checks import checks_fully
+from vector_store import StandardsRetriever, StandardsVectorStore
+
+
+GLOBAL_SCOPE = "all-languages"
+
+# Language groups with at least this many rules get an approximate (LSH)
+# index on top of exact TF-IDF; 0 (the default) never builds one. On the
+# synthetic benchmark exact scoring stayed as fast as LSH up to 100k rules
+# (about 3 ms per query) at full recall, while LSH recall@5 was 0.3-0.7.
+ANN_MIN_RULES = int(os.getenv("CODESENSEI_ANN_MIN_RULES", "0"))
+# LSH parameters of those indexes (see ann_index.RandomProjectionLSH).
+ANN_TABLES = 16
+ANN_BITS = 12
+ANN_PROBES = 2
+ANN_DENSITY = 1.0 / 3.0
+
+# Latent (LSA) dimensions fused into TF-IDF scores; 0 keeps retrieval purely
+# lexical. Off by default: on the golden set LSA adds rules per request
+# without improving recall.
+LSA_COMPONENTS = int(os.getenv("CODESENSEI_LSA_COMPONENTS", "0"))
+LSA_WEIGHT = float(os.getenv("CODESENSEI_LSA_WEIGHT", "0.3"))
+
+
+def index_settings() -> Dict[str, object]:
+    """
+    Settings the fitted TF-IDF stores depend on; an index built under
+    different ones (e.g. the on-disk artifact) must be rebuilt.
+    """
+    return {
+        "lsa_components": LSA_COMPONENTS,
+        "lsa_weight": LSA_WEIGHT,
+        "ann_min_rules": ANN_MIN_RULES,
+        "ann_tables": ANN_TABLES,
+        "ann_bits": ANN_BITS,
+        "ann_probes": ANN_PROBES,
+        "ann_density": ANN_DENSITY,
+    }
+
+
+def score_settings() -> Dict[str, object]:
+    """
+    Settings TF-IDF retrieval scores depend on. Scores logged under other
+    settings are on another scale (ANN only changes which rules are scored).
+    """
+    return {"lsa_components": LSA_COMPONENTS, "lsa_weight": LSA_WEIGHT if LSA_COMPONENTS else 0.0}
+
+
+def _tfidf_store() -> StandardsVectorStore:
+    return StandardsVectorStore(lsa_components=LSA_COMPONENTS, lsa_weight=LSA_WEIGHT)
+
+
+# Retrieval backends selectable by name. "tfidf" stores are the ones persisted
+# in the on-disk artifact; other backends are fitted lazily per process.
+RETRIEVER_BACKENDS: Dict[str, Callable[[], StandardsRetriever]] = {
+    "tfidf": _tfidf_store,
+    "bm25": BM25Store,
+}
+
+
+def create_retriever(backend: str) -> StandardsRetriever:
+    factory = RETRIEVER_BACKENDS.get(backend)
+    if factory is None:
+        raise ValueError(f"Unknown retriever backend: {backend!r} (expected one of {sorted(RETRIEVER_BACKENDS)})")
+    return factory()
+
+
+def _scope_tokens(scope: str) -> List[str]:
+    return [s.strip() for s in scope.lower().split(",") if s.strip()]
+
+
+def _chunk_fingerprint(chunk: StandardsChunk) -> Tuple[str, ...]:
+    return (chunk.rule_id, chunk.scope, chunk.doc_name, chunk.section_title, chunk.text)
+
+
+class StandardsIndexRegistry:
+    """
+    Prebuilt retrieval indexes for a standards corpus.
+
+    Scopes are indexed once into a scope -> chunk position map, and one fitted
+    vector store is kept per distinct chunk set. Languages that resolve to the
+    same chunks (e.g. 'javascript' and 'typescript') share a single store.
+    """
+
+    def __init__(
+        self,
+        chunks: Sequence[StandardsChunk],
+        stores: Mapping[Tuple[int, ...], StandardsVectorStore] | None = None,
+        store_factory: Callable[[], StandardsVectorStore] | None = None,
+        renderings: Mapping[str, str] | None = None,
+    ) -> None:
+        self._chunks: Tuple[StandardsChunk, ...] = tuple(chunks)
+        self._global_positions: Tuple[int, ...] = ()
+        self._scope_index: Dict[str, Tuple[int, ...]] = {}
+        # Prebuilt stores (e.g. loaded from an on-disk artifact), keyed by chunk positions.
+        self._stores: Dict[Tuple[int, ...], StandardsVectorStore] = dict(stores or {})
+        # Builds the TF-IDF stores fitted lazily; lets callers (e.g. benchmarks) vary their settings.
+        self._store_factory = store_factory or _tfidf_store
+        self._backend_stores: Dict[Tuple[str, Tuple[int, ...]], StandardsRetriever] = {}
+        self._lock = threading.Lock()
+        self._build_scope_index()
+        # Prompt renderings are computed once per index instead of per request
+        # (or passed in, e.g. shared with the index a tenant is layered over).
+        self._compact_renderings: Mapping[str, str] = (
+            renderings
+            if renderings is not None
+            else {chunk.rule_id: format_compact_guideline_chunk(chunk) for chunk in self._chunks}
+        )
+        # Stable-prefix guideline blocks, built once per language group.
+        self._stable_guidelines: Dict[Tuple[int, ...], str] = {}
+
+    def _build_scope_index(self) -> None:
+        global_positions: List[int] = []
+        scope_index: Dict[str, List[int]] = {}
+        for pos, chunk in enumerate(self._chunks):
+            # Mirrors filter_chunks_for_language: global rules match every language.
+            if GLOBAL_SCOPE in chunk.scope.lower():
+                global_positions.append(pos)
+                continue
+            for token in _scope_tokens(chunk.scope):
+                scope_index.setdefault(token, []).append(pos)
+
+        self._global_positions = tuple(global_positions)
+        self._scope_index = {token: tuple(positions) for token, positions in scope_index.items()}
+
+    @property
+    def chunks(self) -> Tuple[StandardsChunk, ...]:
+        return self._chunks
+
+    @property
+    def scopes(self) -> List[str]:
+        return sorted(self._scope_index)
+
+    def positions_for_language(self, language: str) -> Tuple[int, ...]:
+        """
+        Chunk positions that apply to a language, in corpus order.
+        """
+        specific = self._scope_index.get(language.lower().strip(), ())
+        if not specific:
+            return self._global_positions
+        return tuple(sorted(self._global_positions + specific))
+
+    def has_coverage(self, language: str) -> bool:
+        """
+        True when at least one rule applies to the language. Used to answer
+        'no_coverage' without touching any vector store.
+        """
+        return bool(self.positions_for_language(language))
+
+    def compact_rendering(self, chunk: StandardsChunk) -> str:
+        rendering = self._compact_renderings.get(chunk.rule_id)
+        if rendering is None:
+            rendering = format_compact_guideline_chunk(chunk)
+        return rendering
+
+    def stable_guidelines(self, language: str) -> str | None:
+        """
+        Canonical guideline block for a language: every rule in scope that
+        local checks do not fully cover, ordered by rule_id, in compact form.
+        A registry is one index version, so the block is the same for every
+        request until the standards change.
+        """
+        positions = self.positions_for_language(language)
+        if not positions:
+            return None
+        block = self._stable_guidelines.get(positions)
+        if block is None:
+            # Fully checked rules never go to the model; listing them would
+            # only invite it to flag them again.
+            chunks = sorted(
+                (self._chunks[pos] for pos in positions if not checks_fully(self._chunks[pos].rule_id)),
+                key=lambda c: c.rule_id,
+            )
+            if not chunks:
+                return None
+            block = build_guideline_block([self.compact_rendering(c) for c in chunks])
+            with self._lock:
+                block = self._stable_guidelines.setdefault(positions, block)
+        return block
+
+    def chunks_for_language(self, language: str) -> List[StandardsChunk]:
+        return [self._chunks[pos] for pos in self.positions_for_language(language)]
+
+    def store_for_language(self, language: str) -> StandardsVectorStore | None:
+        """
+        Return the fitted store for a language, fitting it on first use.
+        """
+        positions = self.positions_for_language(language)
+        if not positions:
+            return None
+        return self.store_for_language_group(positions)
+
+    def retriever_for_language(self, language: str, backend: str = "tfidf") -> StandardsRetriever | None:
+        """
+        Like `store_for_language`, for any backend in RETRIEVER_BACKENDS.
+        """
+        if backend == "tfidf":
+            return self.store_for_language(language)
+        positions = self.positions_for_language(language)
+        if not positions:
+            return None
+
+        key = (backend, positions)
+        retriever = self._backend_stores.get(key)
+        if retriever is not None:
+            return retriever
+        with self._lock:
+            retriever = self._backend_stores.get(key)
+            if retriever is None:
+                retriever = create_retriever(backend)
+                retriever.fit([self._chunks[pos] for pos in positions])
+                self._backend_stores[key] = retriever
+        return retriever
+
+    def fitted_stores(self) -> Dict[Tuple[int, ...], StandardsVectorStore]:
+        """
+        Snapshot of the stores fitted so far, keyed by chunk positions.
+        """
+        with self._lock:
+            return dict(self._stores)
+
+    def language_groups(self) -> List[Tuple[int, ...]]:
+        """
+        Distinct chunk sets a language can resolve to (global-only plus one per scope).
+        """
+        groups = {self.positions_for_language(GLOBAL_SCOPE)}
+        groups.update(self.positions_for_language(scope) for scope in self._scope_index)
+        return sorted(g for g in groups if g)
+
+    def warm(self) -> None:
+        """
+        Fit stores for every known scope up front so no request pays for it.
+        """
+        for positions in self.language_groups():
+            self.store_for_language_group(positions)
+
+    def store_for_language_group(self, positions: Tuple[int, ...]) -> StandardsVectorStore:
+        store = self._stores.get(positions)
+        if store is not None:
+            return store
+        with self._lock:
+            store = self._stores.get(positions)
+            if store is None:
+                store = self._store_factory()
+                store.fit([self._chunks[pos] for pos in positions])
+                if ANN_MIN_RULES > 0 and len(positions) >= ANN_MIN_RULES:
+                    store.enable_ann(
+                        n_tables=ANN_TABLES, n_bits=ANN_BITS, n_probes=ANN_PROBES, density=ANN_DENSITY
+                    )
+                self._stores[positions] = store
+        return store
+
+    def _group_fingerprint(self, positions: Tuple[int, ...]) -> Tuple[Tuple[str, ...], ...]:
+        return tuple(_chunk_fingerprint(self._chunks[pos]) for pos in positions)
+
+    def with_chunks(self, chunks: Sequence[StandardsChunk]) -> "StandardsIndexRegistry":
+        """
+        Build a new registry for an updated corpus, reusing every fitted store
+        whose chunk set is unchanged. Only language groups touched by the
+        change are refitted (lazily, or by calling `warm`). The current
+        registry is left untouched so in-flight readers keep a consistent view.
+        """
+        reusable = {
+            self._group_fingerprint(positions): store
+            for positions, store in self.fitted_stores().items()
+        }
+        updated = StandardsIndexRegistry(chunks, store_factory=self._store_factory)
+        for positions in updated.language_groups():
+            store = reusable.get(updated._group_fingerprint(positions))
+            if store is not None:
+                updated._stores[positions] = store
+        return updated
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+
+# File extension -> language name as used in ReviewRequest.language and rule scopes.
+EXTENSION_LANGUAGES: dict[str, str] = {
+    ".py": "python",
+    ".pyi": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".mts": "typescript",
+    ".cts": "typescript",
+    ".java": "java",
+    ".go": "go",
+}
+
+
+def infer_language_from_path(path: str | Path) -> str | None:
+    """
+    Guess the review language from a file name, or None for unsupported files.
+    """
+    return EXTENSION_LANGUAGES.get(Path(path).suffix.lower())
@@ -2,14 +2,18 @@ from __future__ import annotations
 
 import json
 import os
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional, Sequence
 
 from dotenv import load_dotenv
-from groq import Groq
+from groq import AsyncGroq, Groq
 
 from models import ReviewResponse, StandardsChunk
-from prompts import build_system_prompt, build_user_prompt
+from prompts import build_system_prompt, build_user_prompt_sections
+from review_stream import ReviewStreamEvent, parse_review_stream
+from token_budget import PromptReport, count_tokens, record_prompt_report
 
 
 # Load .env from the Review directory (next to this file), if present.
@@ -22,11 +26,95 @@ if _ENV_PATH.exists():
 GROQ_MODEL = os.environ.get("GROQ_MODEL", "llama-3.1-8b-instant")
 
 
-def _get_client() -> Groq:
+@dataclass
+class LLMUsage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Prompt tokens the provider served from its prompt cache, and the time it
+    # reported spending on input tokens.
+    cached_prompt_tokens: int = 0
+    prompt_seconds: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def prompt_cache_hit_rate(self) -> float:
+        return self.cached_prompt_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+_usage_lock = threading.Lock()
+_usage_totals = LLMUsage()
+
+
+def get_llm_usage() -> LLMUsage:
+    """
+    Snapshot of token usage across all completions made by this process.
+    """
+    with _usage_lock:
+        return LLMUsage(**_usage_totals.__dict__)
+
+
+def _record_usage(usage: Any) -> None:
+    with _usage_lock:
+        _usage_totals.calls += 1
+        if usage is not None:
+            _usage_totals.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            _usage_totals.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+            details = getattr(usage, "prompt_tokens_details", None)
+            _usage_totals.cached_prompt_tokens += getattr(details, "cached_tokens", 0) or 0
+            _usage_totals.prompt_seconds += getattr(usage, "prompt_time", 0.0) or 0.0
+
+
+def _api_key() -> str:
     api_key = os.environ.get("GROQ_API_KEY")
     if not api_key:
         raise RuntimeError("GROQ_API_KEY environment variable is not set.")
-    return Groq(api_key=api_key)
+    return api_key
+
+
+def _get_client() -> Groq:
+    return Groq(api_key=_api_key())
+
+
+_async_client: AsyncGroq | None = None
+
+
+def _get_async_client() -> AsyncGroq:
+    # One shared client so concurrent requests reuse its connection pool.
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncGroq(api_key=_api_key())
+    return _async_client
+
+
+def _build_messages(
+    language: str,
+    code: str,
+    context: str | None,
+    chunks: list[StandardsChunk],
+    guidelines: Optional[Sequence[str]] = None,
+    rules_dropped: int = 0,
+    shared_guidelines: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    system_prompt = build_system_prompt()
+    sections = build_user_prompt_sections(
+        language, code, context, chunks, guidelines=guidelines, shared_guidelines=shared_guidelines
+    )
+    user_prompt = "\n".join(part for parts in sections.values() for part in parts)
+
+    report_sections = {"system": count_tokens(system_prompt)}
+    report_sections.update({name: count_tokens("\n".join(parts)) for name, parts in sections.items()})
+    record_prompt_report(
+        PromptReport(sections=report_sections, rules_included=len(chunks), rules_dropped=rules_dropped)
+    )
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
 
 
 def generate_review_with_llm(
@@ -34,24 +122,53 @@ def generate_review_with_llm(
     code: str,
     context: str | None,
     chunks: list[StandardsChunk],
+    guidelines: Optional[Sequence[str]] = None,
+    rules_dropped: int = 0,
+    shared_guidelines: Optional[str] = None,
 ) -> ReviewResponse:
     """
     Call Groq LLM with our system and user prompts and parse the JSON reply into a ReviewResponse.
+    `guidelines` are optional pre-rendered rule texts (see `prompts.build_user_prompt`);
+    `shared_guidelines` selects the stable-prefix layout.
     """
     client = _get_client()
-    system_prompt = build_system_prompt()
-    user_prompt = build_user_prompt(language=language, code=code, context=context, chunks=chunks)
 
     completion = client.chat.completions.create(
         model=GROQ_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+        messages=_build_messages(language, code, context, chunks, guidelines, rules_dropped, shared_guidelines),
+        response_format={"type": "json_object"},
+        temperature=0.2,
+    )
+
+    return _parse_completion(completion)
+
+
+async def agenerate_review_with_llm(
+    language: str,
+    code: str,
+    context: str | None,
+    chunks: list[StandardsChunk],
+    guidelines: Optional[Sequence[str]] = None,
+    rules_dropped: int = 0,
+    shared_guidelines: Optional[str] = None,
+) -> ReviewResponse:
+    """
+    Async variant of `generate_review_with_llm` for the HTTP service.
+    """
+    client = _get_async_client()
+
+    completion = await client.chat.completions.create(
+        model=GROQ_MODEL,
+        messages=_build_messages(language, code, context, chunks, guidelines, rules_dropped, shared_guidelines),
         response_format={"type": "json_object"},
         temperature=0.2,
     )
 
+    return _parse_completion(completion)
+
+
+def _parse_completion(completion: Any) -> ReviewResponse:
+    _record_usage(getattr(completion, "usage", None))
     content = completion.choices[0].message.content or "{}"
 
     try:
@@ -61,3 +178,40 @@ def generate_review_with_llm(
 
     return ReviewResponse.model_validate(data)
 
+
+def stream_review_with_llm(
+    language: str,
+    code: str,
+    context: str | None,
+    chunks: list[StandardsChunk],
+    guidelines: Optional[Sequence[str]] = None,
+    rules_dropped: int = 0,
+    shared_guidelines: Optional[str] = None,
+) -> Iterator[ReviewStreamEvent]:
+    """
+    Streaming variant of `generate_review_with_llm`: yields the verdict, summary,
+    each positive feedback item and each issue as soon as the model has
+    finished writing it, then a final `complete` event with the full response.
+    """
+    client = _get_client()
+
+    # JSON mode is not available together with streaming, so the strict JSON
+    # contract relies on the system prompt; the parser skips any stray preamble.
+    stream = client.chat.completions.create(
+        model=GROQ_MODEL,
+        messages=_build_messages(language, code, context, chunks, guidelines, rules_dropped, shared_guidelines),
+        temperature=0.2,
+        stream=True,
+    )
+
+    def _pieces() -> Iterator[str]:
+        usage = None
+        for chunk in stream:
+            # Groq reports usage on the final chunk under `x_groq`.
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(x_groq, "usage", None) or getattr(chunk, "usage", None) or usage
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+        _record_usage(usage)
+
+    yield from parse_review_stream(_pieces())
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+
+class LatentSemanticIndex:
+    """
+    Truncated-SVD (LSA) projection of a TF-IDF matrix.
+
+    Fitted offline together with the lexical index: `components` maps TF-IDF
+    space to `n_components` latent dimensions, and `embeddings` holds one
+    L2-normalized float32 row per rule. Scoring a batch of queries is a single
+    dense matrix product, and rules that share no word with the query can
+    still score through co-occurring terms.
+    """
+
+    def __init__(self, components: np.ndarray, embeddings: np.ndarray, weight: float = 0.3) -> None:
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        # Share of the fused score that comes from the latent similarity.
+        self.weight = weight
+
+    @classmethod
+    def fit(
+        cls,
+        matrix: sparse.csr_matrix,
+        n_components: int = 64,
+        weight: float = 0.3,
+        seed: int = 0,
+    ) -> "LatentSemanticIndex | None":
+        """
+        Fit on a row-normalized TF-IDF matrix. Returns None when the corpus is
+        too small for any reduction.
+        """
+        n_components = min(n_components, matrix.shape[0] - 1, matrix.shape[1] - 1)
+        if n_components < 1:
+            return None
+        svd = TruncatedSVD(n_components=n_components, random_state=seed)
+        svd.fit(matrix)
+        components = svd.components_.astype(np.float32)
+        embeddings = normalize(np.asarray(matrix @ components.T, dtype=np.float32))
+        return cls(components, embeddings, weight=weight)
+
+    def __len__(self) -> int:
+        return int(self.embeddings.shape[0])
+
+    @property
+    def n_components(self) -> int:
+        return int(self.components.shape[0])
+
+    def project(self, vectors: sparse.spmatrix) -> np.ndarray:
+        """
+        Latent, L2-normalized float32 rows for TF-IDF rows.
+        """
+        return normalize(np.asarray(vectors @ self.components.T, dtype=np.float32))
+
+    def add(self, vectors: sparse.spmatrix) -> None:
+        """
+        Append rules using the existing projection (no refit).
+        """
+        self.embeddings = np.vstack([self.embeddings, self.project(vectors)])
+
+    def scores(self, queries: sparse.spmatrix, ids: np.ndarray | None = None) -> np.ndarray:
+        """
+        Cosine similarity in latent space, shape (n_queries, n_rules) or
+        (n_queries, len(ids)) when restricted to candidate rules.
+        """
+        embeddings = self.embeddings if ids is None else self.embeddings[ids]
+        return self.project(queries) @ embeddings.T
+
+    def save(self, path: Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        (path / "params.json").write_text(json.dumps({"weight": self.weight}), encoding="utf-8")
+        np.save(path / "components.npy", self.components)
+        np.save(path / "embeddings.npy", self.embeddings)
+
+    @classmethod
+    def load(cls, path: Path) -> "LatentSemanticIndex":
+        params = json.loads((path / "params.json").read_text(encoding="utf-8"))
+        return cls(
+            np.load(path / "components.npy", mmap_mode="r"),
+            np.load(path / "embeddings.npy", mmap_mode="r"),
+            weight=params["weight"],
+        )
@@ -12,6 +12,26 @@ class ReviewRequest(BaseModel):
         default=None,
         description="Optional extra context, e.g. 'this is a REST controller for user management'.",
     )
+    tenant: Optional[str] = Field(
+        default=None,
+        description="Optional tenant whose own standards (tenants/<name>/) are layered over the shared corpus.",
+    )
+
+
+class DiffReviewRequest(BaseModel):
+    diff: str = Field(..., description="Unified diff to review, e.g. the output of `git diff`.")
+    language: Optional[str] = Field(
+        default=None,
+        description="Language of every file in the diff; inferred from file extensions when omitted.",
+    )
+    context: Optional[str] = Field(
+        default=None,
+        description="Optional extra context, e.g. the pull request description.",
+    )
+    tenant: Optional[str] = Field(
+        default=None,
+        description="Optional tenant whose own standards (tenants/<name>/) are layered over the shared corpus.",
+    )
 
 
 Verdict = Literal["approve", "approve_with_nits", "request_changes", "no_coverage"]
@@ -1,10 +1,33 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import re
+from typing import Dict, List, Optional, Sequence
 
 from models import StandardsChunk
 
 
+# Bump whenever the prompts change in a way that can change the model's answers;
+# it is part of the review cache key.
+PROMPT_VERSION = "3"
+
+# Prompt layouts. "retrieved": code first, then the retrieved rules best-first.
+# "stable-prefix": a canonical guideline block that every request for the
+# language shares comes first and the request-specific part (focus rules,
+# context, code) last, so the provider can serve the prefix from its cache.
+RETRIEVED_LAYOUT = "retrieved"
+STABLE_PREFIX_LAYOUT = "stable-prefix"
+PROMPT_LAYOUTS = (RETRIEVED_LAYOUT, STABLE_PREFIX_LAYOUT)
+
+_GUIDELINES_HEADER = "RETRIEVED GUIDELINES (each rule is labeled; you MUST cite rule_ids in your output):\n"
+
+
+def prompt_version(layout: str = RETRIEVED_LAYOUT) -> str:
+    """
+    PROMPT_VERSION qualified by the layout, for cache keys.
+    """
+    return PROMPT_VERSION if layout == RETRIEVED_LAYOUT else f"{PROMPT_VERSION}-{layout}"
+
+
 def build_system_prompt() -> str:
     """
     Define the CodeSensei persona and strict output contract.
@@ -63,38 +86,108 @@ def format_guideline_chunk(chunk: StandardsChunk) -> str:
     return f"{header}\n{body}"
 
 
-def build_user_prompt(
+def format_compact_guideline_chunk(chunk: StandardsChunk) -> str:
+    """
+    Token-lean rendering of a rule: only the citable id as header, one line per
+    top-level bullet with nested bullets folded into it, whitespace collapsed.
+    """
+    lines: List[str] = []
+    for raw in chunk.text.splitlines():
+        if not raw.strip():
+            continue
+        nested = raw[:1].isspace()
+        text = re.sub(r"^[-*+]\s+", "", raw.strip())
+        text = re.sub(r"\s+", " ", text)
+        if nested and lines:
+            lines[-1] = f"{lines[-1]} {text}"
+        else:
+            lines.append(f"- {text}")
+    return f"[{chunk.rule_id}]\n" + "\n".join(lines)
+
+
+def _guideline_parts(rendered: Sequence[str]) -> List[str]:
+    parts: List[str] = [_GUIDELINES_HEADER]
+    for text in rendered:
+        parts.append(text)
+        parts.append("\n---\n")
+    return parts
+
+
+def build_guideline_block(renderings: Sequence[str]) -> str:
+    """
+    The guidelines section as one string, for the stable-prefix layout.
+    Callers pass the renderings in a canonical (rule_id) order so the block
+    is byte-identical across requests.
+    """
+    return "\n".join(_guideline_parts(renderings))
+
+
+def build_user_prompt_sections(
     language: str,
     code: str,
     context: Optional[str],
     chunks: List[StandardsChunk],
-) -> str:
+    guidelines: Optional[Sequence[str]] = None,
+    shared_guidelines: Optional[str] = None,
+) -> Dict[str, List[str]]:
     """
-    Structure how language, code, optional context, and retrieved guidelines are passed to the model.
+    The user prompt split into named sections (header, code, guidelines,
+    instructions), each a list of parts. `guidelines` optionally supplies
+    pre-rendered rule texts to use instead of `format_guideline_chunk`.
+
+    With `shared_guidelines` (see `build_guideline_block`) the stable-prefix
+    layout is used: that block and the instructions come first, then the
+    ids of `chunks` as the rules to focus on, then header and code.
     """
-    parts: List[str] = []
-    parts.append(f"Language: {language}")
+    header: List[str] = [f"Language: {language}"]
     if context:
-        parts.append(f"User context: {context}")
+        header.append(f"User context: {context}")
 
-    parts.append("\nCODE TO REVIEW:\n```code\n")
-    parts.append(code)
-    parts.append("\n```\n")
-
-    parts.append(
-        "RETRIEVED GUIDELINES (each rule is labeled; you MUST cite rule_ids in your output):\n"
-    )
-    for chunk in chunks:
-        parts.append(format_guideline_chunk(chunk))
-        parts.append("\n---\n")
+    code_parts = ["\nCODE TO REVIEW:\n```code\n", code, "\n```\n"]
 
-    parts.append(
+    instructions = [
         "Instructions:\n"
         "- Only raise issues that are clearly supported by at least one of the rules above.\n"
         "- When you reference a rule, include its rule_id in the `rule_ids` array.\n"
         "- If you think something is questionable but cannot find a matching rule, do NOT mention it.\n"
         "- Keep your reasoning internal; the JSON output must be concise and follow the schema exactly.\n"
-    )
+    ]
+
+    if shared_guidelines is not None:
+        focus = [
+            "RULES RETRIEVED FOR THIS CODE (review against these): "
+            + ", ".join(f"[{c.rule_id}]" for c in chunks)
+            + "\n"
+        ]
+        return {
+            "guidelines": [shared_guidelines],
+            "instructions": instructions,
+            "focus": focus,
+            "header": header,
+            "code": code_parts,
+        }
 
-    return "\n".join(parts)
+    rendered = list(guidelines) if guidelines is not None else [format_guideline_chunk(c) for c in chunks]
+    return {
+        "header": header,
+        "code": code_parts,
+        "guidelines": _guideline_parts(rendered),
+        "instructions": instructions,
+    }
 
+
+def build_user_prompt(
+    language: str,
+    code: str,
+    context: Optional[str],
+    chunks: List[StandardsChunk],
+    guidelines: Optional[Sequence[str]] = None,
+    shared_guidelines: Optional[str] = None,
+) -> str:
+    """
+    Structure how language, code, optional context, and retrieved guidelines are passed to the model.
+    """
+    sections = build_user_prompt_sections(
+        language, code, context, chunks, guidelines=guidelines, shared_guidelines=shared_guidelines
+    )
+    return "\n".join(part for parts in sections.values() for part in parts)
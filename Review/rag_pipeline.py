@@ -1,46 +1,161 @@
 from __future__ import annotations
 
-from typing import List, Sequence
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
 
-from models import ReviewRequest, ReviewResponse, StandardsChunk
+import code_features
+from code_compactor import CompactedCode, compact_code
+from citation_feedback import CitationLog, CitationRecord, RetrievalCutoffs, RetrievalEvent, cited_rule_ids
+from code_segmenter import JS_LANGUAGES, PYTHON_LANGUAGES, CodeSegment, split_code_segments
+from index_registry import StandardsIndexRegistry, create_retriever, score_settings
+from models import ReviewIssue, ReviewRequest, ReviewResponse, StandardsChunk
 from standards_loader import filter_chunks_for_language
-from vector_store import StandardsVectorStore, RetrievedRule
-from llm_client import generate_review_with_llm
+from vector_store import RetrievedRule, StandardsRetriever, StandardsVectorStore, mmr_select
+from llm_client import GROQ_MODEL, agenerate_review_with_llm, generate_review_with_llm, stream_review_with_llm
+from prompts import (
+    PROMPT_LAYOUTS,
+    STABLE_PREFIX_LAYOUT,
+    build_guideline_block,
+    format_compact_guideline_chunk,
+    prompt_version,
+)
+from review_cache import ReviewCache, review_cache_key
+from retrieval_batcher import RetrievalBatcher
+from review_merge import NO_COVERAGE_SUMMARY, ReviewMerger
+from review_stream import ReviewStreamEvent, response_to_events
+from static_checks import CheckResult, checks_fully, has_checker, run_static_checks, static_review
+from token_budget import PackedGuidelines, count_tokens, pack_guidelines
 
 
-def infer_review_facets(request: ReviewRequest) -> List[str]:
+# Files longer than this are reviewed segment by segment (map-reduce).
+LARGE_FILE_LINES = 200
+SEGMENT_MAX_LINES = 120
+MAX_SEGMENT_WORKERS = 8
+
+# Retrieval backend used when the caller does not pick one ("tfidf" or "bm25").
+DEFAULT_RETRIEVER = os.environ.get("CODESENSEI_RETRIEVER", "tfidf")
+
+# Approximate token budget for the retrieved-guidelines section of the prompt.
+GUIDELINE_TOKEN_BUDGET = int(os.environ.get("CODESENSEI_GUIDELINE_TOKENS", "1500"))
+
+# Fan-out mode: above 1, the rules of a review are split by facet into at most
+# this many smaller LLM calls, made concurrently. 0 or 1 = one call per review.
+FANOUT_LIMIT = int(os.environ.get("CODESENSEI_FANOUT_LIMIT", "0"))
+
+# Prompt layout (see prompts.PROMPT_LAYOUTS). "stable-prefix" puts a guideline
+# block shared by all requests for a language first, for provider-side prompt
+# caching; languages whose full block exceeds STABLE_PREFIX_MAX_TOKENS share
+# only the retrieved rules, in rule_id order.
+PROMPT_LAYOUT = os.environ.get("CODESENSEI_PROMPT_LAYOUT", "retrieved")
+if PROMPT_LAYOUT not in PROMPT_LAYOUTS:
+    raise ValueError(f"Unknown prompt layout: {PROMPT_LAYOUT!r} (expected one of {list(PROMPT_LAYOUTS)})")
+STABLE_PREFIX_MAX_TOKENS = int(os.environ.get("CODESENSEI_STABLE_PREFIX_TOKENS", "6000"))
+
+# Above 0, retrieval queries from concurrent reviews that arrive within this
+# many milliseconds are ranked together (see retrieval_batcher).
+RETRIEVAL_BATCH_MS = float(os.environ.get("CODESENSEI_RETRIEVAL_BATCH_MS", "0"))
+
+# Python and JS/TS code with at least this many lines is compacted before it
+# goes into the prompt (see code_compactor); 0 sends code verbatim.
+COMPACT_MIN_LINES = int(os.environ.get("CODESENSEI_COMPACT_MIN_LINES", "80"))
+
+# Citation feedback (see citation_feedback): where to log retrieved versus
+# cited rules, and a file of learned per-rule/per-facet score cutoffs to
+# apply at query time. Both are off when unset.
+CITATION_LOG_PATH = os.environ.get("CODESENSEI_CITATION_LOG", "")
+CUTOFFS_PATH = os.environ.get("CODESENSEI_CUTOFFS", "")
+
+# Relevance/diversity trade-off of the MMR pass over retrieved rules: 1.0
+# keeps every rule; lower values drop rules that mostly restate a
+# higher-ranked one (see vector_store.mmr_select).
+MMR_LAMBDA = float(os.environ.get("CODESENSEI_MMR_LAMBDA", "0.6"))
+
+
+GENERAL_FACET = "general code style and readability"
+
+# Facet phrases per detected construct (see code_features). Only constructs
+# present in the code produce a facet; the language tables add to these.
+_FEATURE_FACETS = {
+    code_features.DEFINITIONS: "naming conventions and identifier clarity",
+    code_features.LONG_FUNCTION: "function length and single-responsibility design",
+    code_features.NESTING: "nesting depth, early returns, and small focused functions",
+    code_features.COMMENTS: "comments and documentation style",
+    code_features.EXCEPTION_HANDLING: "error handling and exceptions",
+    code_features.HTTP_ROUTE: "HTTP API design, status codes, and error responses",
+}
+_HTTP_MARKERS = ("http", "route", "router", "endpoint", "get /", "post /", "put /", "patch /", "delete /")
+_PYTHON_FEATURE_FACETS = {
+    code_features.DEFINITIONS: "Python PEP 8 naming conventions and meaningful variable names",
+    code_features.EXCEPTION_HANDLING: "Python exception handling and specific except clauses",
+    code_features.IMPORTS: "Python import grouping: standard library, third-party and local imports",
+    code_features.ASYNC: "Python async functions and awaiting coroutines",
+}
+_JS_FEATURE_FACETS = {
+    code_features.DEFINITIONS: "JavaScript/TypeScript camelCase and PascalCase naming",
+    code_features.IMPORTS: "ES module imports and exports versus CommonJS require",
+    code_features.ASYNC: "JavaScript/TypeScript async patterns and error handling for promises",
+}
+
+
+def infer_review_facets(
+    request: ReviewRequest,
+    features: code_features.CodeFeatures | None = None,
+) -> List[str]:
     """
-    Heuristic extraction of aspects of the code that should be checked.
-    This is intentionally simple and deterministic (no extra LLM call).
+    Aspects of the code that should be checked, one per construct actually
+    present (exception handling, routes, async code, definitions, ...).
+    Deterministic; no extra LLM call.
     """
-    language = request.language.lower()
-    code_lower = request.code.lower()
+    language = request.language.lower().strip()
     context_lower = (request.context or "").lower()
+    if features is None:
+        features = code_features.extract_features(request.code, language)
 
-    facets: List[str] = [
-        "naming conventions and identifier clarity",
-        "function length and single-responsibility design",
-        "comments and documentation style",
-        "error handling and exceptions",
-        "duplication and code smells",
-    ]
+    tables = [_FEATURE_FACETS]
+    if language in PYTHON_LANGUAGES:
+        tables.append(_PYTHON_FEATURE_FACETS)
+    elif language in JS_LANGUAGES:
+        tables.append(_JS_FEATURE_FACETS)
+
+    facets = [facet for table in tables for feature, facet in table.items() if features.has(feature)]
+
+    # HTTP code the scanner cannot see as routes (API specs, clients), or
+    # that the caller describes as API code.
+    api_facet = _FEATURE_FACETS[code_features.HTTP_ROUTE]
+    code_lower = request.code.lower()
+    if api_facet not in facets and (
+        any(m in code_lower for m in _HTTP_MARKERS) or any(m in context_lower for m in ("rest", "api", "endpoint"))
+    ):
+        facets.append(api_facet)
+
+    return facets or [GENERAL_FACET]
+
+
+@lru_cache(maxsize=1)
+def get_retrieval_batcher() -> RetrievalBatcher:
+    """
+    Process-wide retrieval batcher (used when RETRIEVAL_BATCH_MS > 0).
+    """
+    return RetrievalBatcher(window_ms=RETRIEVAL_BATCH_MS)
 
-    # If this looks like HTTP / REST code, include API design facets.
-    http_markers = ("http", "route", "router", "endpoint", "@app.route", "fastapi", "express", "flask")
-    if any(m in code_lower for m in http_markers) or "rest" in context_lower or "api" in context_lower:
-        facets.append("HTTP API design, status codes, and error responses")
 
-    # Light language-specific hints.
-    if language in ("python", "py"):
-        facets.append("Python naming and import organization")
-    if language in ("javascript", "typescript", "js", "ts"):
-        facets.append("JavaScript/TypeScript async patterns and error handling for promises")
+@lru_cache(maxsize=1)
+def get_citation_log() -> CitationLog | None:
+    return CitationLog(Path(CITATION_LOG_PATH)) if CITATION_LOG_PATH else None
 
-    return facets
 
+@lru_cache(maxsize=1)
+def get_retrieval_cutoffs() -> RetrievalCutoffs | None:
+    return RetrievalCutoffs.load(Path(CUTOFFS_PATH)) if CUTOFFS_PATH else None
 
-def _build_vector_store(chunks: Sequence[StandardsChunk]) -> StandardsVectorStore:
-    store = StandardsVectorStore()
+
+def _build_retriever(chunks: Sequence[StandardsChunk], backend: str) -> StandardsRetriever:
+    store = create_retriever(backend)
     store.fit(chunks)
     return store
 
@@ -50,64 +165,697 @@ def retrieve_relevant_rules(
     all_chunks: Sequence[StandardsChunk],
     top_k_per_facet: int = 5,
     min_score: float = 0.1,
+    registry: StandardsIndexRegistry | None = None,
+    retriever: str | None = None,
+    cutoffs: RetrievalCutoffs | None = None,
+    mmr_lambda: float | None = None,
 ) -> List[StandardsChunk]:
     """
-    Multi-step retrieval:
-    - Filter corpus for language.
-    - Infer facets.
-    - For each facet, query the vector store with facet+code.
+    Multi-step retrieval (`retriever` picks the backend, default DEFAULT_RETRIEVER):
+    - Filter corpus for language (or look up the prebuilt store in `registry`).
+    - Detect code constructs and infer one facet per construct present.
+    - Query the vector store with facet + the most salient code lines for
+      every facet in one batch.
     - Deduplicate by rule_id, keeping the highest score.
+    - Drop rules scoring below their learned cutoff (`cutoffs`, by default
+      the CODESENSEI_CUTOFFS file if set); `min_score` stays the floor.
+      Both are cosine thresholds and are not applied to BM25 scores.
+    - With `mmr_lambda` < 1 (default MMR_LAMBDA), drop near-duplicate rules
+      by maximal marginal relevance over their TF-IDF vectors (skipped for
+      the bm25 backend, which has no rule vectors).
+    """
+    ranked = _retrieve_with_facets(
+        request, all_chunks, top_k_per_facet, min_score, registry, retriever, cutoffs, mmr_lambda
+    )
+    return [r.chunk for r, _ in ranked]
+
+
+def _retrieve_with_facets(
+    request: ReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    top_k_per_facet: int = 5,
+    min_score: float = 0.1,
+    registry: StandardsIndexRegistry | None = None,
+    retriever: str | None = None,
+    cutoffs: RetrievalCutoffs | None = None,
+    mmr_lambda: float | None = None,
+) -> List[Tuple[RetrievedRule, str]]:
     """
-    lang_chunks = filter_chunks_for_language(all_chunks, request.language)
-    if not lang_chunks:
-        return []
+    `retrieve_relevant_rules`, returning each rule with its score and the
+    facet whose query scored it highest.
+    """
+    backend = retriever or DEFAULT_RETRIEVER
+    if registry is not None:
+        store = registry.retriever_for_language(request.language, backend=backend)
+        if store is None:
+            return []
+    else:
+        lang_chunks = filter_chunks_for_language(all_chunks, request.language)
+        if not lang_chunks:
+            return []
+        store = _build_retriever(lang_chunks, backend)
 
-    store = _build_vector_store(lang_chunks)
-    facets = infer_review_facets(request)
+    features = code_features.extract_features(request.code, request.language)
+    facets = infer_review_facets(request, features)
 
-    best_by_rule: dict[str, RetrievedRule] = {}
+    best_by_rule: dict[str, Tuple[RetrievedRule, str]] = {}
 
-    for facet in facets:
-        query_text = (
-            f"Language: {request.language}\n"
-            f"Facet: {facet}\n\n"
-            f"Code snippet:\n{request.code[:600]}"
-        )
-        results = store.query(query_text, top_k=top_k_per_facet)
+    # All facet queries share the code snippet, so they are scored as one batch.
+    prefixes = [
+        f"Language: {request.language}\n"
+        f"Facet: {facet}\n\n"
+        f"Code snippet:\n"
+        for facet in facets
+    ]
+    # The code part of every query is the most salient lines, not just the file header.
+    excerpt = code_features.salient_excerpt(request.code, features, max_chars=600)
+    if RETRIEVAL_BATCH_MS > 0:
+        batch_results = get_retrieval_batcher().query_batch(store, prefixes, shared_text=excerpt, top_k=top_k_per_facet)
+    else:
+        batch_results = store.query_batch(prefixes, shared_text=excerpt, top_k=top_k_per_facet)
+
+    # `min_score` and learned cutoffs are cosine similarities in [0, 1]. BM25
+    # scores are unbounded and depend on query length, so with the bm25
+    # backend neither applies and only `top_k_per_facet` bounds retrieval.
+    cosine = isinstance(store, StandardsVectorStore)
+    for facet, results in zip(facets, batch_results):
         for r in results:
-            if r.score < min_score:
+            if cosine and r.score < min_score:
                 continue
             existing = best_by_rule.get(r.chunk.rule_id)
-            if existing is None or r.score > existing.score:
-                best_by_rule[r.chunk.rule_id] = r
+            if existing is None or r.score > existing[0].score:
+                best_by_rule[r.chunk.rule_id] = (r, facet)
+
+    cutoffs = (cutoffs or get_retrieval_cutoffs()) if cosine else None
+    # Cutoffs learned on another score scale (e.g. with LSA toggled) do not apply.
+    if cutoffs is not None and cutoffs.applies_to(score_settings()):
+        # Rules decided by a local checker cost no prompt tokens; never cut them.
+        best_by_rule = {
+            rule_id: (r, facet)
+            for rule_id, (r, facet) in best_by_rule.items()
+            if checks_fully(rule_id)
+            or r.score >= cutoffs.threshold(request.language, rule_id, facet, min_score, explore=True)
+        }
 
     # Sort by descending score for determinism.
-    sorted_rules = sorted(best_by_rule.values(), key=lambda r: r.score, reverse=True)
-    return [r.chunk for r in sorted_rules]
+    ranked = sorted(best_by_rule.values(), key=lambda item: item[0].score, reverse=True)
+    mmr_lambda = MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+    # MMR needs TF-IDF rule vectors to measure redundancy. BM25 has none, so
+    # with the bm25 backend the pass is skipped and every retrieved rule is kept.
+    if mmr_lambda < 1.0 and isinstance(store, StandardsVectorStore):
+        ranked = _diversify(ranked, store, mmr_lambda)
+    return ranked
 
 
-def run_rag_review(request: ReviewRequest, all_chunks: Sequence[StandardsChunk]) -> ReviewResponse:
+def _diversify(
+    ranked: List[Tuple[RetrievedRule, str]],
+    store: StandardsVectorStore,
+    mmr_lambda: float,
+) -> List[Tuple[RetrievedRule, str]]:
     """
-    Top-level RAG pipeline used by the application.
+    MMR over the retrieved rules, keeping score order. Rules decided by a
+    local checker cost no prompt tokens, so they are neither dropped nor
+    count as covering the rules similar to them.
     """
-    relevant_chunks = retrieve_relevant_rules(request, all_chunks=all_chunks)
+    candidates = [item for item in ranked if not checks_fully(item[0].chunk.rule_id)]
+    if len(candidates) < 2:
+        return ranked
+    vectors = store.rule_vectors([r.chunk for r, _ in candidates])
+    kept = {candidates[i][0].chunk.rule_id for i in mmr_select([r.score for r, _ in candidates], vectors, mmr_lambda)}
+    return [item for item in ranked if checks_fully(item[0].chunk.rule_id) or item[0].chunk.rule_id in kept]
 
-    if not relevant_chunks:
-        # No coverage for this language / code.
-        return ReviewResponse(
-            verdict="no_coverage",
-            summary=(
-                "No applicable coding standards could be confidently matched for this code and language. "
-                "CodeSensei will stay silent rather than guess."
-            ),
-            positive_feedback=[],
-            issues=[],
-        )
 
-    return generate_review_with_llm(
+def _no_coverage_response() -> ReviewResponse:
+    return ReviewResponse(
+        verdict="no_coverage",
+        summary=NO_COVERAGE_SUMMARY,
+        positive_feedback=[],
+        issues=[],
+    )
+
+
+def _cache_key(
+    request: ReviewRequest,
+    chunks: Sequence[StandardsChunk],
+    shared_guidelines: str | None = None,
+) -> str:
+    return review_cache_key(
         language=request.language,
         code=request.code,
         context=request.context,
-        chunks=relevant_chunks,
+        chunks=chunks,
+        model=GROQ_MODEL,
+        prompt_version=prompt_version(PROMPT_LAYOUT),
+        compact_min_lines=COMPACT_MIN_LINES,
+        shared_guidelines=shared_guidelines,
     )
 
+
+def _is_large(request: ReviewRequest) -> bool:
+    return request.code.count("\n") + 1 > LARGE_FILE_LINES
+
+
+def _segment_request(request: ReviewRequest, segment: CodeSegment) -> ReviewRequest:
+    note = f"This is {segment.label} of a larger file; review only this part."
+    context = f"{request.context}\n{note}" if request.context else note
+    return ReviewRequest(language=request.language, code=segment.text, context=context)
+
+
+def _segment_line_map(segment: CodeSegment) -> CompactedCode:
+    """
+    Line map from a segment's own lines (what the model numbers from) to
+    lines of the whole file.
+    """
+    return CompactedCode(
+        text=segment.text,
+        line_map=list(range(segment.start_line, segment.end_line + 1)),
+        original_lines=segment.end_line,
+    )
+
+
+def _segment_review(segment: CodeSegment, response: ReviewResponse) -> ReviewResponse:
+    """
+    A segment's review with its line references shifted to whole-file lines.
+    """
+    return _restore_line_refs(_segment_line_map(segment), response)
+
+
+def _pack_for_prompt(
+    chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None,
+) -> PackedGuidelines:
+    """
+    Fit the (best-first) rules into the guideline token budget using their
+    compact renderings, precomputed by the registry when one is available.
+    """
+    if registry is not None:
+        renderings = [registry.compact_rendering(c) for c in chunks]
+    else:
+        renderings = [format_compact_guideline_chunk(c) for c in chunks]
+    return pack_guidelines(chunks, renderings, GUIDELINE_TOKEN_BUDGET)
+
+
+@lru_cache(maxsize=64)
+def _block_tokens(block: str) -> int:
+    return count_tokens(block)
+
+
+def _shared_guidelines(
+    language: str,
+    packed: PackedGuidelines,
+    registry: StandardsIndexRegistry | None,
+) -> str | None:
+    """
+    Guideline block for the stable-prefix layout, or None with the default
+    layout. Uses the registry's per-language block when it fits the limit;
+    otherwise the packed rules in rule_id order.
+    """
+    if PROMPT_LAYOUT != STABLE_PREFIX_LAYOUT:
+        return None
+    if registry is not None:
+        block = registry.stable_guidelines(language)
+        if block is not None and _block_tokens(block) <= STABLE_PREFIX_MAX_TOKENS:
+            return block
+    ordered = sorted(zip(packed.chunks, packed.renderings), key=lambda item: item[0].rule_id)
+    return build_guideline_block([rendering for _, rendering in ordered])
+
+
+def _compact_for_prompt(request: ReviewRequest) -> CompactedCode | None:
+    """
+    Compacted code for the prompt, or None when the code is sent verbatim.
+    """
+    if COMPACT_MIN_LINES <= 0 or request.code.count("\n") + 1 < COMPACT_MIN_LINES:
+        return None
+    compacted = compact_code(request.code, request.language)
+    return compacted if compacted.changed else None
+
+
+def _restore_issue(compacted: CompactedCode, issue: ReviewIssue) -> ReviewIssue:
+    return issue.model_copy(
+        update={
+            "affected_code": compacted.restore_line_refs(issue.affected_code),
+            "description": compacted.restore_line_refs(issue.description),
+        }
+    )
+
+
+def _restore_line_refs(compacted: CompactedCode | None, response: ReviewResponse) -> ReviewResponse:
+    """
+    Point line references in the model's issues back at the original code.
+    """
+    if compacted is None:
+        return response
+    return response.model_copy(update={"issues": [_restore_issue(compacted, issue) for issue in response.issues]})
+
+
+def _facet_groups(packed: PackedGuidelines, facet_of: Dict[str, str], limit: int) -> List[PackedGuidelines]:
+    """
+    Split packed rules by the facet that retrieved them, for fan-out. While
+    there are more groups than `limit`, the smallest group is folded into
+    the next smallest. Rules keep their best-first order within a group.
+    """
+    if limit < 2 or len(packed.chunks) < 2:
+        return [packed]
+    by_facet: Dict[str, List[int]] = {}
+    for i, chunk in enumerate(packed.chunks):
+        by_facet.setdefault(facet_of.get(chunk.rule_id, GENERAL_FACET), []).append(i)
+    groups = list(by_facet.values())
+    while len(groups) > limit:
+        groups.sort(key=len)
+        smallest = groups.pop(0)
+        groups[0] = sorted(groups[0] + smallest)
+    groups.sort(key=lambda g: g[0])
+
+    parts: List[PackedGuidelines] = []
+    for n, group in enumerate(groups):
+        renderings = [packed.renderings[i] for i in group]
+        parts.append(
+            PackedGuidelines(
+                chunks=[packed.chunks[i] for i in group],
+                renderings=renderings,
+                tokens=sum(count_tokens(r) for r in renderings),
+                # Report budget drops once, not once per call.
+                dropped_rule_ids=packed.dropped_rule_ids if n == 0 else [],
+            )
+        )
+    return parts
+
+
+@dataclass
+class _ReviewPlan:
+    """
+    Everything about one review that is decided before the LLM call. When
+    `response` is set, no LLM call is needed (no coverage, local checks
+    only, or a cache hit). In fan-out mode the LLM work is in `parts`, one
+    sub-plan per facet group, each with its own cache entry.
+    """
+
+    request: ReviewRequest
+    static_results: List[CheckResult] = field(default_factory=list)
+    response: ReviewResponse | None = None
+    packed: PackedGuidelines | None = None
+    cache_key: str | None = None
+    shared_guidelines: str | None = None
+    compacted: CompactedCode | None = None
+    # rule_id -> (facet, score) that retrieved it, for the citation log.
+    retrieval: Dict[str, Tuple[str, float]] = field(default_factory=dict)
+    parts: List[_ReviewPlan] = field(default_factory=list)
+
+    def pending_parts(self) -> List[_ReviewPlan]:
+        return [part for part in self.parts if part.response is None]
+
+    def llm_kwargs(self) -> dict:
+        assert self.packed is not None
+        return {
+            "language": self.request.language,
+            "code": self.compacted.text if self.compacted is not None else self.request.code,
+            "context": self.request.context,
+            "chunks": self.packed.chunks,
+            "guidelines": self.packed.renderings,
+            "rules_dropped": len(self.packed.dropped_rule_ids),
+            "shared_guidelines": self.shared_guidelines,
+        }
+
+
+def _with_static_results(static_results: Sequence[CheckResult], response: ReviewResponse) -> ReviewResponse:
+    if not static_results:
+        return response
+    merger = ReviewMerger()
+    merger.add(static_review(static_results))
+    merger.add(response)
+    return merger.result()
+
+
+def _plan_review(
+    request: ReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None,
+    cache: ReviewCache | None,
+    local_checks: bool = True,
+) -> _ReviewPlan:
+    """
+    Retrieve rules, run local checks, pack the prompt and consult the cache.
+    Retrieved rules with a deterministic local checker are evaluated
+    in-process and dropped from the LLM prompt; when no rule is left, the LLM
+    is not called at all. With `local_checks=False` those rules are still
+    dropped, but their results are discarded (the caller checks the whole
+    file itself). With FANOUT_LIMIT above 1, the packed rules are split by
+    facet into sub-plans (see `_facet_groups`).
+    """
+    plan = _ReviewPlan(request=request)
+    ranked = _retrieve_with_facets(request, all_chunks=all_chunks, registry=registry)
+    relevant_chunks = [r.chunk for r, _ in ranked]
+    plan.retrieval = {r.chunk.rule_id: (facet, r.score) for r, facet in ranked}
+
+    if not relevant_chunks:
+        # No coverage for this language / code.
+        plan.response = _no_coverage_response()
+        return plan
+
+    static_results, llm_chunks = run_static_checks(request.code, request.language, relevant_chunks)
+    if local_checks:
+        plan.static_results = static_results
+
+    if not llm_chunks:
+        if not plan.static_results:
+            plan.response = ReviewResponse(verdict="approve", summary="")
+        else:
+            plan.response = static_review(plan.static_results)
+        return plan
+
+    plan.packed = _pack_for_prompt(llm_chunks, registry)
+    plan.shared_guidelines = _shared_guidelines(request.language, plan.packed, registry)
+    plan.compacted = _compact_for_prompt(request)
+    groups = _facet_groups(plan.packed, {rule_id: facet for rule_id, (facet, _) in plan.retrieval.items()}, FANOUT_LIMIT)
+    if len(groups) > 1:
+        for group in groups:
+            # Parts share the guideline prefix and differ only in their focus rules.
+            part = _ReviewPlan(
+                request=request,
+                packed=group,
+                shared_guidelines=plan.shared_guidelines,
+                compacted=plan.compacted,
+                retrieval=plan.retrieval,
+            )
+            if cache is not None:
+                part.cache_key = _cache_key(request, group.chunks, plan.shared_guidelines)
+                part.response = cache.get(part.cache_key)
+            plan.parts.append(part)
+        if not plan.pending_parts():
+            plan.response = _merge_parts(plan)
+        return plan
+
+    if cache is not None:
+        plan.cache_key = _cache_key(request, plan.packed.chunks, plan.shared_guidelines)
+        cached = cache.get(plan.cache_key)
+        if cached is not None:
+            plan.response = _with_static_results(plan.static_results, cached)
+    return plan
+
+
+def _log_citations(plan: _ReviewPlan, llm_response: ReviewResponse) -> None:
+    log = get_citation_log()
+    # Cutoffs are learned on cosine scores; BM25 scores would skew them.
+    if log is None or plan.packed is None or DEFAULT_RETRIEVER == "bm25":
+        return
+    events: List[RetrievalEvent] = []
+    for chunk, rendering in zip(plan.packed.chunks, plan.packed.renderings):
+        facet, score = plan.retrieval.get(chunk.rule_id, (GENERAL_FACET, 0.0))
+        events.append(RetrievalEvent(chunk.rule_id, facet, round(score, 6), count_tokens(rendering)))
+    log.record(
+        CitationRecord(
+            language=plan.request.language,
+            rules=events,
+            cited=cited_rule_ids(llm_response),
+            settings=score_settings(),
+        )
+    )
+
+
+def _finish_review(plan: _ReviewPlan, llm_response: ReviewResponse, cache: ReviewCache | None) -> ReviewResponse:
+    llm_response = _restore_line_refs(plan.compacted, llm_response)
+    _log_citations(plan, llm_response)
+    if cache is not None and plan.cache_key is not None:
+        cache.put(plan.cache_key, llm_response)
+    return _with_static_results(plan.static_results, llm_response)
+
+
+def _merge_parts(plan: _ReviewPlan) -> ReviewResponse:
+    """
+    Combine local check findings and the per-facet reviews of a fan-out
+    plan: issues deduplicated and renumbered, the most severe verdict wins.
+    """
+    merger = ReviewMerger()
+    if plan.static_results:
+        merger.add(static_review(plan.static_results))
+    for part in plan.parts:
+        assert part.response is not None
+        merger.add(part.response)
+    return merger.result()
+
+
+def _stream_llm_review(plan: _ReviewPlan, cache: ReviewCache | None) -> Iterator[ReviewStreamEvent]:
+    """
+    Stream the single LLM call of `plan` (local check results not included).
+    """
+    compacted = plan.compacted
+    for event in stream_review_with_llm(**plan.llm_kwargs()):
+        if compacted is not None and event.kind == "issue":
+            event = ReviewStreamEvent(kind="issue", value=_restore_issue(compacted, event.value))
+        elif event.kind == "complete":
+            event = ReviewStreamEvent(kind="complete", value=_restore_line_refs(compacted, event.value))
+            _log_citations(plan, event.value)
+            if cache is not None and plan.cache_key is not None:
+                cache.put(plan.cache_key, event.value)
+        yield event
+
+
+def _stream_parts(plan: _ReviewPlan, cache: ReviewCache | None) -> Iterator[ReviewStreamEvent]:
+    """
+    Fan-out streaming: local findings and cached parts first, then each
+    facet call's findings as soon as that call finishes.
+    """
+    merger = ReviewMerger()
+    if plan.static_results:
+        yield from _stream_merged(merger, static_review(plan.static_results))
+    for part in plan.parts:
+        if part.response is not None:
+            yield from _stream_merged(merger, part.response)
+    pending = plan.pending_parts()
+    with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+        futures = {pool.submit(generate_review_with_llm, **part.llm_kwargs()): part for part in pending}
+        for future in as_completed(futures):
+            part = futures[future]
+            part.response = _finish_review(part, future.result(), cache)
+            yield from _stream_merged(merger, part.response)
+    yield from _stream_final(merger)
+
+
+def _review_single(
+    request: ReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None,
+    cache: ReviewCache | None,
+    local_checks: bool = True,
+) -> ReviewResponse:
+    """
+    Review one piece of code (see `_plan_review`).
+    """
+    plan = _plan_review(request, all_chunks, registry, cache, local_checks=local_checks)
+    if plan.response is not None:
+        return plan.response
+    if plan.parts:
+        pending = plan.pending_parts()
+        with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+            responses = list(pool.map(lambda part: generate_review_with_llm(**part.llm_kwargs()), pending))
+        for part, response in zip(pending, responses):
+            part.response = _finish_review(part, response, cache)
+        return _merge_parts(plan)
+    return _finish_review(plan, generate_review_with_llm(**plan.llm_kwargs()), cache)
+
+
+async def _areview_single(
+    request: ReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None,
+    cache: ReviewCache | None,
+    local_checks: bool = True,
+) -> ReviewResponse:
+    # Retrieval and cache lookups are CPU/disk bound; keep them off the event loop.
+    plan = await asyncio.to_thread(_plan_review, request, all_chunks, registry, cache, local_checks)
+    if plan.response is not None:
+        return plan.response
+    if plan.parts:
+        pending = plan.pending_parts()
+        responses = await asyncio.gather(*(agenerate_review_with_llm(**part.llm_kwargs()) for part in pending))
+
+        def finish() -> ReviewResponse:
+            for part, response in zip(pending, responses):
+                part.response = _finish_review(part, response, cache)
+            return _merge_parts(plan)
+
+        return await asyncio.to_thread(finish)
+    llm_response = await agenerate_review_with_llm(**plan.llm_kwargs())
+    return await asyncio.to_thread(_finish_review, plan, llm_response, cache)
+
+
+def _whole_file_checks(
+    request: ReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None,
+) -> List[CheckResult]:
+    """
+    Run every local checker whose rule applies to the language over the full
+    file, so findings carry whole-file line numbers.
+    """
+    if registry is not None:
+        lang_chunks = registry.chunks_for_language(request.language)
+    else:
+        lang_chunks = filter_chunks_for_language(all_chunks, request.language)
+    checkable = [c for c in lang_chunks if has_checker(c.rule_id)]
+    results, _ = run_static_checks(request.code, request.language, checkable)
+    return results
+
+
+def _iter_segment_reviews(
+    request: ReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None,
+    cache: ReviewCache | None,
+) -> Iterator[tuple[int, CodeSegment, ReviewResponse]]:
+    """
+    Map step: retrieve and review every segment in parallel, yielding
+    (segment index, segment, review) in completion order. Line references
+    in the reviews are already shifted to whole-file lines.
+    """
+    segments = split_code_segments(request.code, request.language, max_lines=SEGMENT_MAX_LINES)
+    with ThreadPoolExecutor(max_workers=min(MAX_SEGMENT_WORKERS, max(1, len(segments)))) as pool:
+        futures = {
+            pool.submit(
+                _review_single, _segment_request(request, seg), all_chunks, registry, cache, False
+            ): (i, seg)
+            for i, seg in enumerate(segments)
+        }
+        for future in as_completed(futures):
+            i, seg = futures[future]
+            yield i, seg, _segment_review(seg, future.result())
+
+
+def run_segmented_review(
+    request: ReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None = None,
+    cache: ReviewCache | None = None,
+) -> ReviewResponse:
+    """
+    Large-file mode: split the code into function/class-level segments,
+    retrieve rules and review each segment in parallel, then merge the
+    results into one response with deduplicated, renumbered issues.
+    """
+    merger = ReviewMerger()
+    static_results = _whole_file_checks(request, all_chunks, registry)
+    if static_results:
+        merger.add(static_review(static_results))
+
+    results = sorted(_iter_segment_reviews(request, all_chunks, registry, cache), key=lambda r: r[0])
+    for _, seg, response in results:
+        merger.add(response, label=seg.label)
+    return merger.result()
+
+
+def run_rag_review(
+    request: ReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None = None,
+    cache: ReviewCache | None = None,
+) -> ReviewResponse:
+    """
+    Top-level RAG pipeline used by the application.
+    """
+    if _is_large(request):
+        return run_segmented_review(request, all_chunks=all_chunks, registry=registry, cache=cache)
+    return _review_single(request, all_chunks=all_chunks, registry=registry, cache=cache)
+
+
+async def arun_rag_review(
+    request: ReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None = None,
+    cache: ReviewCache | None = None,
+) -> ReviewResponse:
+    """
+    Async variant of `run_rag_review`: same pipeline, with non-blocking LLM
+    calls. Large files review up to MAX_SEGMENT_WORKERS segments concurrently.
+    """
+    if not _is_large(request):
+        return await _areview_single(request, all_chunks, registry, cache)
+
+    merger = ReviewMerger()
+    static_results = await asyncio.to_thread(_whole_file_checks, request, all_chunks, registry)
+    if static_results:
+        merger.add(static_review(static_results))
+
+    segments = split_code_segments(request.code, request.language, max_lines=SEGMENT_MAX_LINES)
+    limit = asyncio.Semaphore(MAX_SEGMENT_WORKERS)
+
+    async def review_segment(seg: CodeSegment) -> ReviewResponse:
+        async with limit:
+            return await _areview_single(_segment_request(request, seg), all_chunks, registry, cache, False)
+
+    responses = await asyncio.gather(*(review_segment(seg) for seg in segments))
+    for seg, response in zip(segments, responses):
+        merger.add(_segment_review(seg, response), label=seg.label)
+    return merger.result()
+
+
+def _stream_merged(
+    merger: ReviewMerger,
+    partial: ReviewResponse,
+    label: str | None = None,
+) -> Iterator[ReviewStreamEvent]:
+    new_positives, new_issues = merger.add(partial, label=label)
+    for item in new_positives:
+        yield ReviewStreamEvent(kind="positive_feedback", value=item)
+    for issue in new_issues:
+        yield ReviewStreamEvent(kind="issue", value=issue)
+
+
+def _stream_final(merger: ReviewMerger) -> Iterator[ReviewStreamEvent]:
+    merged = merger.result()
+    yield ReviewStreamEvent(kind="verdict", value=merged.verdict)
+    yield ReviewStreamEvent(kind="summary", value=merged.summary)
+    yield ReviewStreamEvent(kind="complete", value=merged)
+
+
+def stream_rag_review(
+    request: ReviewRequest,
+    all_chunks: Sequence[StandardsChunk],
+    registry: StandardsIndexRegistry | None = None,
+    cache: ReviewCache | None = None,
+) -> Iterator[ReviewStreamEvent]:
+    """
+    Same pipeline as `run_rag_review`, but yields review parts as they are generated.
+    Local checker findings are emitted before the LLM starts. In fan-out
+    mode the facet calls are not streamed token by token; each one's
+    findings are emitted as soon as it completes.
+    """
+    if _is_large(request):
+        merger = ReviewMerger()
+        static_results = _whole_file_checks(request, all_chunks, registry)
+        if static_results:
+            yield from _stream_merged(merger, static_review(static_results))
+        # Segments finish out of order; surface their findings as they land.
+        for _, seg, response in _iter_segment_reviews(request, all_chunks, registry, cache):
+            yield from _stream_merged(merger, response, label=seg.label)
+        yield from _stream_final(merger)
+        return
+
+    plan = _plan_review(request, all_chunks, registry, cache)
+    if plan.response is not None:
+        # No coverage, local checks only, or every LLM part cached.
+        yield from response_to_events(plan.response)
+        return
+    if plan.parts:
+        yield from _stream_parts(plan, cache)
+        return
+    if not plan.static_results:
+        yield from _stream_llm_review(plan, cache)
+        return
+
+    merger = ReviewMerger()
+    yield from _stream_merged(merger, static_review(plan.static_results))
+    for event in _stream_llm_review(plan, cache):
+        # Renumber streamed LLM issues after the local ones; merger.add on the
+        # final response is idempotent for items already added here.
+        if event.kind == "issue":
+            issue = merger.add_issue(event.value)
+            if issue is not None:
+                yield ReviewStreamEvent(kind="issue", value=issue)
+        elif event.kind == "positive_feedback":
+            if merger.add_positive(event.value):
+                yield event
+        elif event.kind == "verdict":
+            yield ReviewStreamEvent(kind="verdict", value=merger.add_verdict(event.value))
+        elif event.kind == "complete":
+            merger.add(event.value)
+            yield from _stream_final(merger)
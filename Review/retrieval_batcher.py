@@ -0,0 +1,160 @@
+"""
+Micro-batched retrieval shared by concurrent reviews.
+
+Each review scores a handful of facet queries; under load, many reviews do
+so at the same time, and every one pays for its own small sparse product.
+`RetrievalBatcher` collects the encoded queries that arrive within a short
+window, stacks them per store and ranks each stack with one product on a
+single worker thread, then hands every caller its own rows back. scipy's
+sparse kernels release the GIL, so callers keep encoding their next
+queries while a batch is scored.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+from scipy import sparse
+
+from vector_store import RetrievedRule, StandardsRetriever, StandardsVectorStore
+
+
+@dataclass
+class BatcherStats:
+    requests: int = 0
+    queries: int = 0
+    batches: int = 0
+
+    @property
+    def mean_batch_queries(self) -> float:
+        return self.queries / self.batches if self.batches else 0.0
+
+
+@dataclass
+class _Pending:
+    store: StandardsVectorStore
+    query_matrix: sparse.csr_matrix
+    top_k: int
+    exact: bool
+    future: Future
+
+
+class RetrievalBatcher:
+    """
+    Coalesces `query_batch` calls from many threads into batched ranking.
+
+    A batch is closed `window_ms` after its first request arrives, or once
+    it holds `max_batch_queries` query rows. Only TF-IDF stores are batched;
+    other backends are queried directly on the calling thread.
+    """
+
+    def __init__(self, window_ms: float = 2.0, max_batch_queries: int = 1024) -> None:
+        self.window_seconds = window_ms / 1000.0
+        self.max_batch_queries = max_batch_queries
+        self._queue: queue.Queue[_Pending | None] = queue.Queue()
+        self._stats = BatcherStats()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._closed = False
+
+    @property
+    def stats(self) -> BatcherStats:
+        with self._lock:
+            return BatcherStats(self._stats.requests, self._stats.queries, self._stats.batches)
+
+    def query_batch(
+        self,
+        store: StandardsRetriever,
+        prefixes: Sequence[str],
+        shared_text: str = "",
+        top_k: int = 8,
+        exact: bool = False,
+    ) -> List[List[RetrievedRule]]:
+        """
+        Same result as `store.query_batch(prefixes, shared_text, top_k)`,
+        ranked together with whatever other callers submit in the window.
+        """
+        if not isinstance(store, StandardsVectorStore) or not prefixes:
+            return store.query_batch(prefixes, shared_text=shared_text, top_k=top_k)
+
+        # Encoding is per-request work; do it here so the worker only ranks.
+        pending = _Pending(store, store.encode_batch(prefixes, shared_text), top_k, exact, Future())
+        self._ensure_worker()
+        self._queue.put(pending)
+        return pending.future.result()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            worker = self._worker
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Retrieval batcher is closed.")
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="retrieval-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            rows = first.query_matrix.shape[0]
+            stop = False
+            deadline = time.monotonic() + self.window_seconds
+            while rows < self.max_batch_queries:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                rows += item.query_matrix.shape[0]
+            self._score(batch)
+            if stop:
+                return
+
+    def _score(self, batch: List[_Pending]) -> None:
+        by_store: Dict[tuple[int, bool], List[_Pending]] = {}
+        for item in batch:
+            by_store.setdefault((id(item.store), item.exact), []).append(item)
+
+        for group in by_store.values():
+            try:
+                store = group[0].store
+                # top_k <= 0 means every rule, as in `StandardsVectorStore.rank`.
+                top_k = 0 if any(item.top_k <= 0 for item in group) else max(item.top_k for item in group)
+                stacked = sparse.vstack([item.query_matrix for item in group], format="csr")
+                ranked = store.rank(stacked, top_k, group[0].exact)
+            except Exception as exc:
+                for item in group:
+                    item.future.set_exception(exc)
+                continue
+
+            start = 0
+            for item in group:
+                n = item.query_matrix.shape[0]
+                rows = ranked[start : start + n]
+                item.future.set_result(rows if item.top_k <= 0 else [results[: item.top_k] for results in rows])
+                start += n
+
+        with self._lock:
+            self._stats.requests += len(batch)
+            self._stats.queries += sum(item.query_matrix.shape[0] for item in batch)
+            self._stats.batches += 1
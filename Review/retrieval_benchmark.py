@@ -0,0 +1,420 @@
+"""
+Latency, memory and recall benchmarks for the Review RAG layer.
+
+    python retrieval_benchmark.py                                   # print a report
+    python retrieval_benchmark.py --write-baseline benchmark_baseline.json
+    python retrieval_benchmark.py --baseline benchmark_baseline.json
+
+Two workloads are measured for every retriever configuration:
+
+- the real standards corpus against the labelled golden set in
+  `benchmark_golden.json` (recall of the expected rule ids through
+  `retrieve_relevant_rules`, and its latency), plus `load_standards_corpus`
+  and `build_user_prompt` timings;
+- synthetic corpora of increasing size (100 to 100k rules by default):
+  fit time and peak memory, query p50/p95 latency and recall@k of the rule
+  each query was generated from.
+
+With `--baseline`, every metric is compared with a previous report and the
+process exits with status 1 when one regresses past its threshold. Latency
+baselines are only meaningful on the machine that recorded them. The report
+records the retrieval settings read from the environment (MMR, learned
+cutoffs, LSA, ANN); a baseline recorded under other settings is rejected.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence
+
+from index_registry import LSA_WEIGHT, RETRIEVER_BACKENDS, StandardsIndexRegistry, index_settings
+from models import ReviewRequest, StandardsChunk
+from prompts import build_user_prompt
+from rag_pipeline import CUTOFFS_PATH, MMR_LAMBDA, retrieve_relevant_rules
+from standards_loader import load_standards_corpus
+from vector_store import StandardsRetriever, StandardsVectorStore
+
+
+_BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_GOLDEN_PATH = _BASE_DIR / "benchmark_golden.json"
+DEFAULT_STANDARDS_DIR = _BASE_DIR / "standards"
+DEFAULT_SIZES = (100, 1_000, 10_000, 100_000)
+
+
+@dataclass(frozen=True)
+class RetrieverConfig:
+    """
+    One retriever setup to benchmark. `backend` is the RETRIEVER_BACKENDS name
+    used for golden-set runs; `golden` is False for setups the pipeline cannot
+    select (they are only measured on synthetic corpora), and `synthetic` is
+    False for setups that only differ after the store is queried.
+    `mmr_lambda` overrides MMR_LAMBDA for golden-set retrieval.
+    """
+
+    name: str
+    backend: str
+    factory: Callable[[], StandardsRetriever]
+    ann: bool = False
+    golden: bool = True
+    synthetic: bool = True
+    mmr_lambda: float | None = None
+
+    def build(self, chunks: Sequence[StandardsChunk]) -> StandardsRetriever:
+        store = self.factory()
+        store.fit(chunks)
+        if self.ann and isinstance(store, StandardsVectorStore):
+            store.enable_ann()
+        return store
+
+
+def _lexical_store() -> StandardsVectorStore:
+    return StandardsVectorStore(lsa_components=0)
+
+
+def _lsa_store() -> StandardsVectorStore:
+    return StandardsVectorStore(lsa_components=64, lsa_weight=LSA_WEIGHT)
+
+
+# "tfidf" is the store the pipeline builds (LSA per CODESENSEI_LSA_COMPONENTS,
+# off by default); "tfidf+lsa" fuses 64 LSA dimensions to show what they add.
+CONFIGS: Dict[str, RetrieverConfig] = {
+    config.name: config
+    for config in (
+        RetrieverConfig("tfidf", "tfidf", RETRIEVER_BACKENDS["tfidf"]),
+        RetrieverConfig("tfidf+lsa", "tfidf", _lsa_store),
+        RetrieverConfig("tfidf+ann", "tfidf", _lexical_store, ann=True, golden=False),
+        RetrieverConfig("tfidf-no-mmr", "tfidf", RETRIEVER_BACKENDS["tfidf"], synthetic=False, mmr_lambda=1.0),
+        RetrieverConfig("bm25", "bm25", RETRIEVER_BACKENDS["bm25"]),
+    )
+}
+
+
+def benchmark_settings() -> Dict[str, object]:
+    """
+    Environment settings the golden-set numbers depend on. Learned cutoffs
+    are recorded by path only; they also explore, so runs with them set
+    are not exactly repeatable.
+    """
+    return {"mmr_lambda": MMR_LAMBDA, "cutoffs": CUTOFFS_PATH or None, **index_settings()}
+
+
+@dataclass
+class GoldenCase:
+    name: str
+    language: str
+    code: str
+    context: str
+    expected: List[str]
+
+    @property
+    def request(self) -> ReviewRequest:
+        return ReviewRequest(language=self.language, code=self.code, context=self.context or None)
+
+
+def load_golden_set(path: Path = DEFAULT_GOLDEN_PATH) -> List[GoldenCase]:
+    rows = json.loads(path.read_text(encoding="utf-8"))
+    return [GoldenCase(**row) for row in rows]
+
+
+def _percentile(samples: Sequence[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _timed(func: Callable[[], object], repeat: int) -> List[float]:
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _latency_metrics(prefix: str, samples_ms: Sequence[float]) -> Dict[str, float]:
+    return {
+        f"{prefix}/p50_ms": _percentile(samples_ms, 50),
+        f"{prefix}/p95_ms": _percentile(samples_ms, 95),
+    }
+
+
+def _peak_memory_mb(func: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def benchmark_real_corpus(
+    standards_dir: Path,
+    golden: Sequence[GoldenCase],
+    configs: Sequence[RetrieverConfig],
+    repeat: int = 20,
+) -> Dict[str, float]:
+    metrics: Dict[str, float] = {}
+    metrics.update(_latency_metrics("corpus/load_standards_corpus", _timed(lambda: load_standards_corpus(standards_dir), repeat)))
+    chunks = load_standards_corpus(standards_dir)
+
+    prompt_chunks = chunks[:8]
+    samples = _timed(
+        lambda: [build_user_prompt(c.language, c.code, c.context, prompt_chunks) for c in golden],
+        repeat,
+    )
+    metrics.update(_latency_metrics("corpus/build_user_prompt", [s / max(len(golden), 1) for s in samples]))
+
+    for config in configs:
+        if not config.golden:
+            continue
+        factory = config.factory if config.backend == "tfidf" else None
+        registry = StandardsIndexRegistry(chunks, store_factory=factory)  # type: ignore[arg-type]
+        registry.warm()
+
+        hits = expected = retrieved = 0
+        latencies: List[float] = []
+        for case in golden:
+            request = case.request
+            result: List[StandardsChunk] = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = retrieve_relevant_rules(
+                    request, chunks, registry=registry, retriever=config.backend, mmr_lambda=config.mmr_lambda
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+            found = {c.rule_id for c in result}
+            hits += len(found & set(case.expected))
+            expected += len(case.expected)
+            retrieved += len(result)
+
+        prefix = f"golden/{config.name}"
+        metrics[f"{prefix}/recall"] = hits / expected if expected else 1.0
+        metrics[f"{prefix}/rules_per_request"] = retrieved / max(len(golden), 1)
+        metrics.update(_latency_metrics(f"{prefix}/retrieve", latencies))
+    return metrics
+
+
+def synthetic_corpus(
+    n_rules: int,
+    n_queries: int,
+    seed: int = 0,
+) -> tuple[List[StandardsChunk], List[tuple[str, str]]]:
+    """
+    Rules mix words from a few shared topics with a handful of rule-specific
+    rare words, mimicking real standards (shared jargon plus specifics).
+    Each query samples words from one rule plus noise and is labelled with
+    that rule's id.
+    """
+    rng = random.Random(seed)
+    n_topics = max(10, n_rules // 50)
+    topics = [[f"topic{t}w{w}" for w in range(25)] for t in range(n_topics)]
+    filler = [f"common{w}" for w in range(300)]
+
+    chunks: List[StandardsChunk] = []
+    words_by_rule: List[List[str]] = []
+    for i in range(n_rules):
+        words = [rng.choice(topics[rng.randrange(n_topics)]) for _ in range(20)]
+        words += [f"rare{rng.randrange(n_rules * 4)}" for _ in range(4)]
+        words += [rng.choice(filler) for _ in range(16)]
+        rng.shuffle(words)
+        words_by_rule.append(words)
+        chunks.append(
+            StandardsChunk(
+                rule_id=f"SYN-{i:06d}",
+                scope="python",
+                doc_name=f"synthetic_{i // 100:04d}.md",
+                section_title="Synthetic Guide",
+                text="- " + " ".join(words),
+            )
+        )
+
+    queries: List[tuple[str, str]] = []
+    for _ in range(n_queries):
+        target = rng.randrange(n_rules)
+        words = rng.sample(words_by_rule[target], 12) + [rng.choice(filler) for _ in range(8)]
+        rng.shuffle(words)
+        queries.append((" ".join(words), chunks[target].rule_id))
+    return chunks, queries
+
+
+def benchmark_synthetic(
+    sizes: Sequence[int],
+    configs: Sequence[RetrieverConfig],
+    n_queries: int = 200,
+    k: int = 5,
+) -> Dict[str, float]:
+    metrics: Dict[str, float] = {}
+    for size in sizes:
+        chunks, queries = synthetic_corpus(size, n_queries)
+        for config in configs:
+            if not config.synthetic:
+                continue
+            prefix = f"synthetic/{config.name}/{size}"
+            start = time.perf_counter()
+            store = config.build(chunks)
+            metrics[f"{prefix}/fit_ms"] = (time.perf_counter() - start) * 1000
+            # Measured on a second fit: tracemalloc slows allocation-heavy code down.
+            metrics[f"{prefix}/fit_peak_mb"] = _peak_memory_mb(lambda: config.build(chunks))
+
+            latencies: List[float] = []
+            hits = 0
+            for text, rule_id in queries:
+                start = time.perf_counter()
+                results = store.query(text, top_k=k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += any(r.chunk.rule_id == rule_id for r in results)
+            metrics.update(_latency_metrics(f"{prefix}/query", latencies))
+            metrics[f"{prefix}/recall_at_{k}"] = hits / max(len(queries), 1)
+            print(
+                f"{prefix}: fit {metrics[f'{prefix}/fit_ms']:.0f} ms, "
+                f"query p95 {metrics[f'{prefix}/query/p95_ms']:.2f} ms, "
+                f"recall@{k} {metrics[f'{prefix}/recall_at_{k}']:.3f}",
+                file=sys.stderr,
+            )
+    return metrics
+
+
+@dataclass
+class Regression:
+    metric: str
+    baseline: float
+    current: float
+
+    def line(self) -> str:
+        return f"REGRESSION {self.metric}: {self.baseline:.4g} -> {self.current:.4g}"
+
+
+def compare_to_baseline(
+    current: Dict[str, float],
+    baseline: Dict[str, float],
+    max_latency_regression: float = 0.5,
+    max_memory_regression: float = 0.25,
+    max_recall_drop: float = 0.02,
+    min_latency_delta_ms: float = 0.05,
+) -> List[Regression]:
+    """
+    Latency and memory regress when they grow by more than the given
+    fraction; recall regresses when it drops by more than `max_recall_drop`
+    (absolute). Latency changes below `min_latency_delta_ms` are timer noise.
+    Metrics missing from either side are ignored.
+    """
+    regressions: List[Regression] = []
+    for metric, before in sorted(baseline.items()):
+        after = current.get(metric)
+        if after is None:
+            continue
+        if metric.endswith("_ms"):
+            failed = after > before * (1 + max_latency_regression) and after - before > min_latency_delta_ms
+        elif metric.endswith("_mb"):
+            failed = after > before * (1 + max_memory_regression)
+        elif "recall" in metric:
+            failed = after < before - max_recall_drop
+        else:
+            failed = False
+        if failed:
+            regressions.append(Regression(metric, before, after))
+    return regressions
+
+
+def run_benchmarks(
+    sizes: Sequence[int],
+    configs: Sequence[RetrieverConfig],
+    n_queries: int = 200,
+    k: int = 5,
+    repeat: int = 20,
+    standards_dir: Path = DEFAULT_STANDARDS_DIR,
+    golden_path: Path = DEFAULT_GOLDEN_PATH,
+) -> Dict[str, float]:
+    metrics = benchmark_real_corpus(standards_dir, load_golden_set(golden_path), configs, repeat=repeat)
+    metrics.update(benchmark_synthetic(sizes, configs, n_queries=n_queries, k=k))
+    return metrics
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark CodeSensei retrieval latency, memory and recall.")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(s) for s in DEFAULT_SIZES),
+        help="Comma-separated synthetic corpus sizes (number of rules).",
+    )
+    parser.add_argument(
+        "--configs",
+        default=",".join(CONFIGS),
+        help=f"Comma-separated retriever configurations ({', '.join(CONFIGS)}).",
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Queries per synthetic corpus.")
+    parser.add_argument("--k", type=int, default=5, help="k for synthetic recall@k.")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions for real-corpus timings.")
+    parser.add_argument("--golden", type=Path, default=DEFAULT_GOLDEN_PATH)
+    parser.add_argument("--standards-dir", type=Path, default=DEFAULT_STANDARDS_DIR)
+    parser.add_argument("--output", type=Path, default=None, help="Write the report as JSON.")
+    parser.add_argument("--write-baseline", type=Path, default=None, help="Save this run as the baseline.")
+    parser.add_argument("--baseline", type=Path, default=None, help="Fail on regressions against this baseline.")
+    parser.add_argument("--max-latency-regression", type=float, default=0.5, help="Allowed relative latency growth.")
+    parser.add_argument("--max-memory-regression", type=float, default=0.25, help="Allowed relative memory growth.")
+    parser.add_argument("--max-recall-drop", type=float, default=0.02, help="Allowed absolute recall drop.")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.configs.split(",") if name not in CONFIGS]
+    if unknown:
+        parser.error(f"unknown configurations: {', '.join(unknown)}")
+    configs = [CONFIGS[name] for name in args.configs.split(",")]
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    metrics = run_benchmarks(
+        sizes,
+        configs,
+        n_queries=args.queries,
+        k=args.k,
+        repeat=args.repeat,
+        standards_dir=args.standards_dir,
+        golden_path=args.golden,
+    )
+
+    settings = benchmark_settings()
+    for name, setting in sorted(settings.items()):
+        print(f"setting {name:52s} {setting}")
+    for name, value in sorted(metrics.items()):
+        print(f"{name:60s} {value:12.4f}")
+    report = json.dumps({"settings": settings, "metrics": metrics}, indent=2, sort_keys=True)
+    if args.output is not None:
+        args.output.write_text(report, encoding="utf-8")
+    if args.write_baseline is not None:
+        args.write_baseline.write_text(report, encoding="utf-8")
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        mismatched = [
+            f"SETTINGS MISMATCH {name}: {baseline['settings'].get(name)} -> {settings.get(name)}"
+            for name in sorted(baseline["settings"].keys() | settings.keys())
+            if baseline["settings"].get(name) != settings.get(name)
+        ]
+        if mismatched:
+            print("\n".join(mismatched), file=sys.stderr)
+            sys.exit(1)
+        regressions = compare_to_baseline(
+            metrics,
+            baseline["metrics"],
+            max_latency_regression=args.max_latency_regression,
+            max_memory_regression=args.max_memory_regression,
+            max_recall_drop=args.max_recall_drop,
+        )
+        for regression in regressions:
+            print(regression.line(), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+from models import ReviewResponse, StandardsChunk
+
+
+def normalize_code(code: str) -> str:
+    """
+    Canonical form of submitted code for cache keys: unified line endings,
+    no trailing whitespace and no trailing blank lines. Leading blank lines
+    are kept, since reviews refer to code by line number.
+    """
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).rstrip("\n")
+
+
+def review_cache_key(
+    language: str,
+    code: str,
+    context: str | None,
+    chunks: Sequence[StandardsChunk],
+    model: str,
+    prompt_version: str,
+    compact_min_lines: int = 0,
+    shared_guidelines: str | None = None,
+) -> str:
+    """
+    Content address of a review. Every input that can change the model's answer
+    is part of the key, including the text of each retrieved rule, so editing a
+    rule automatically stops serving reviews that were grounded in its old text,
+    the compaction threshold, which decides the code the model is shown, and
+    the shared guideline block of the stable-prefix layout.
+    """
+    rules = [
+        [chunk.rule_id, hashlib.sha256(chunk.text.encode("utf-8")).hexdigest()]
+        for chunk in chunks
+    ]
+    payload = {
+        "language": language.lower().strip(),
+        "code": normalize_code(code),
+        "context": (context or "").strip(),
+        "rules": rules,
+        "model": model,
+        "prompt_version": prompt_version,
+        "compact_min_lines": compact_min_lines,
+    }
+    if shared_guidelines is not None:
+        payload["shared_guidelines"] = hashlib.sha256(shared_guidelines.encode("utf-8")).hexdigest()
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    memory_evictions: int = 0
+    disk_evictions: int = 0
+    memory_entries: int = 0
+    disk_entries: int = 0
+    disk_bytes: int = 0
+
+
+class ReviewCache:
+    """
+    Two-tier cache of review responses keyed by `review_cache_key`.
+
+    The memory tier is a bounded LRU. The optional disk tier stores one JSON
+    file per entry and evicts least recently used files once `max_disk_bytes`
+    is exceeded. Disk hits are promoted to memory.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        disk_dir: Path | None = None,
+        max_disk_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self._max_entries = max_entries
+        self._disk_dir = disk_dir
+        self._max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, ReviewResponse] = OrderedDict()
+        self._disk_index: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+        if disk_dir is not None:
+            self._scan_disk(disk_dir)
+
+    def _scan_disk(self, disk_dir: Path) -> None:
+        disk_dir.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in disk_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self._disk_bytes += size
+
+    def _disk_path(self, key: str) -> Path:
+        assert self._disk_dir is not None
+        return self._disk_dir / key[:2] / f"{key}.json"
+
+    @property
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                **{
+                    **self._stats.__dict__,
+                    "memory_entries": len(self._memory),
+                    "disk_entries": len(self._disk_index),
+                    "disk_bytes": self._disk_bytes,
+                }
+            )
+
+    def get(self, key: str) -> ReviewResponse | None:
+        with self._lock:
+            response = self._memory.get(key)
+            if response is not None:
+                self._memory.move_to_end(key)
+                self._stats.hits += 1
+                self._stats.memory_hits += 1
+                return response
+
+            response = self._read_disk(key)
+            if response is not None:
+                self._stats.hits += 1
+                self._stats.disk_hits += 1
+                self._put_memory(key, response)
+                return response
+
+            self._stats.misses += 1
+            return None
+
+    def put(self, key: str, response: ReviewResponse) -> None:
+        with self._lock:
+            self._put_memory(key, response)
+            self._write_disk(key, response)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            for key in list(self._disk_index):
+                self._remove_disk(key)
+
+    def _put_memory(self, key: str, response: ReviewResponse) -> None:
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+            self._stats.memory_evictions += 1
+
+    def _read_disk(self, key: str) -> ReviewResponse | None:
+        if self._disk_dir is None or key not in self._disk_index:
+            return None
+        path = self._disk_path(key)
+        try:
+            response = ReviewResponse.model_validate_json(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError):
+            self._remove_disk(key)
+            return None
+        self._disk_index.move_to_end(key)
+        return response
+
+    def _write_disk(self, key: str, response: ReviewResponse) -> None:
+        if self._disk_dir is None:
+            return
+        path = self._disk_path(key)
+        data = response.model_dump_json().encode("utf-8")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        self._disk_bytes += len(data) - self._disk_index.pop(key, 0)
+        self._disk_index[key] = len(data)
+        while self._disk_bytes > self._max_disk_bytes and len(self._disk_index) > 1:
+            oldest = next(iter(self._disk_index))
+            self._remove_disk(oldest)
+            self._stats.disk_evictions += 1
+
+    def _remove_disk(self, key: str) -> None:
+        size = self._disk_index.pop(key, 0)
+        self._disk_bytes -= size
+        try:
+            self._disk_path(key).unlink()
+        except OSError:
+            pass
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Sequence, Tuple
+
+from models import PositiveFeedbackItem, ReviewIssue, ReviewResponse
+
+
+NO_COVERAGE_SUMMARY = (
+    "No applicable coding standards could be confidently matched for this code and language. "
+    "CodeSensei will stay silent rather than guess."
+)
+
+# Most severe first; 'no_coverage' only wins when nothing else had coverage.
+_VERDICT_RANK = {"request_changes": 3, "approve_with_nits": 2, "approve": 1, "no_coverage": 0}
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"\W+", " ", text.lower()).strip()
+
+
+def verdict_for_issues(issues: Sequence[ReviewIssue]) -> str:
+    """
+    The verdict a set of issues calls for on its own: any minor or major
+    issue requests changes, nits alone approve with nits.
+    """
+    if any(issue.severity in ("major", "minor") for issue in issues):
+        return "request_changes"
+    if issues:
+        return "approve_with_nits"
+    return "approve"
+
+
+def combine_verdicts(verdicts: Sequence[str]) -> str:
+    if not verdicts:
+        return "no_coverage"
+    return max(verdicts, key=lambda v: _VERDICT_RANK.get(v, 0))
+
+
+class ReviewMerger:
+    """
+    Incrementally merges partial reviews (per file segment, per facet, ...)
+    into one ReviewResponse.
+
+    Issues are deduplicated on (rule_ids, normalized description) and
+    renumbered ISSUE-1..n in arrival order, so ids stay stable for a given
+    input order. Positive feedback is deduplicated the same way.
+    """
+
+    def __init__(self) -> None:
+        self._verdicts: List[str] = []
+        self._summaries: List[str] = []
+        self._issues: List[ReviewIssue] = []
+        self._positives: List[PositiveFeedbackItem] = []
+        self._issue_keys: Dict[Tuple[Tuple[str, ...], str], int] = {}
+        self._positive_keys: set[Tuple[Tuple[str, ...], str]] = set()
+
+    @property
+    def issues(self) -> List[ReviewIssue]:
+        return list(self._issues)
+
+    def add_verdict(self, verdict: str) -> str:
+        """
+        Record a partial verdict and return the combined verdict so far.
+        """
+        self._verdicts.append(verdict)
+        return combine_verdicts(self._verdicts)
+
+    def add_summary(self, summary: str, label: str | None = None) -> None:
+        if summary.strip():
+            self._summaries.append(f"[{label}] {summary.strip()}" if label else summary.strip())
+
+    def add_positive(self, item: PositiveFeedbackItem) -> bool:
+        """
+        Add a positive feedback item; False if an equivalent one was already added.
+        """
+        key = (tuple(sorted(item.rule_ids)), _normalize_text(item.message))
+        if key in self._positive_keys:
+            return False
+        self._positive_keys.add(key)
+        self._positives.append(item)
+        return True
+
+    def add_issue(self, issue: ReviewIssue, label: str | None = None) -> ReviewIssue | None:
+        """
+        Add an issue under the next ISSUE-n id. Returns None when it duplicates
+        an earlier issue, whose affected_code is extended instead.
+        """
+        key = (tuple(sorted(issue.rule_ids)), _normalize_text(issue.description))
+        affected = issue.affected_code
+        if label:
+            affected = f"{label}: {affected}" if affected else label
+
+        existing = self._issue_keys.get(key)
+        if existing is not None:
+            # Same finding in another part: keep one issue, point at both places.
+            merged = self._issues[existing]
+            if affected and affected not in (merged.affected_code or ""):
+                merged.affected_code = f"{merged.affected_code}; {affected}" if merged.affected_code else affected
+            return None
+
+        merged = issue.model_copy(update={"id": f"ISSUE-{len(self._issues) + 1}", "affected_code": affected})
+        self._issue_keys[key] = len(self._issues)
+        self._issues.append(merged)
+        return merged
+
+    def add(
+        self,
+        response: ReviewResponse,
+        label: str | None = None,
+    ) -> Tuple[List[PositiveFeedbackItem], List[ReviewIssue]]:
+        """
+        Fold one partial review in. `label` (e.g. "lines 40-80") is prefixed to
+        the summary and to each issue's `affected_code`. Returns the positive
+        items and issues that were new.
+        """
+        self.add_verdict(response.verdict)
+        if response.verdict != "no_coverage":
+            self.add_summary(response.summary, label=label)
+
+        new_positives = [item for item in response.positive_feedback if self.add_positive(item)]
+        new_issues: List[ReviewIssue] = []
+        for issue in response.issues:
+            merged = self.add_issue(issue, label=label)
+            if merged is not None:
+                new_issues.append(merged)
+        return new_positives, new_issues
+
+    def result(self) -> ReviewResponse:
+        verdict = combine_verdicts(self._verdicts)
+        if verdict == "no_coverage":
+            summary = NO_COVERAGE_SUMMARY
+        else:
+            summary = "\n".join(self._summaries)
+        # A merged review never approves cleanly while it still carries issues.
+        if verdict == "approve" and self._issues:
+            verdict = "approve_with_nits"
+        return ReviewResponse(
+            verdict=verdict,
+            summary=summary,
+            positive_feedback=list(self._positives),
+            issues=list(self._issues),
+        )
+
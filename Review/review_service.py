@@ -0,0 +1,342 @@
+"""
+Async HTTP review service (plain ASGI, no web framework needed).
+
+    uvicorn review_service:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+
+- `POST /review`: body is a ReviewRequest as JSON, reply is a ReviewResponse.
+- `POST /review/diff`: body is a DiffReviewRequest (a unified diff); only the
+  changed hunks are reviewed.
+- `GET /healthz`: liveness plus the size of the loaded standards index.
+- `GET /metrics`: counters and gauges in the Prometheus text format.
+
+At most CODESENSEI_MAX_CONCURRENCY reviews run at once and up to
+CODESENSEI_MAX_QUEUE more wait for a slot; beyond that the service answers
+503 with Retry-After. Identical reviews that are already in flight (same
+tenant, language, code and context) are coalesced: the duplicates wait for the
+running review and share its result, so they cost no extra LLM call and no
+slot. A request naming an unknown tenant is answered 404.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from app_core import areview_diff, arun_review, get_index_registry, get_review_cache, get_tenant_indexes
+from llm_client import get_llm_usage
+from models import DiffReviewRequest, ReviewRequest, ReviewResponse
+from tenant_indexes import UnknownTenantError
+
+
+MAX_CONCURRENCY = int(os.environ.get("CODESENSEI_MAX_CONCURRENCY", "8"))
+MAX_QUEUE = int(os.environ.get("CODESENSEI_MAX_QUEUE", "64"))
+MAX_BODY_BYTES = int(os.environ.get("CODESENSEI_MAX_BODY_BYTES", str(1024 * 1024)))
+
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ServiceOverloaded(RuntimeError):
+    pass
+
+
+def review_request_key(request: ReviewRequest | DiffReviewRequest) -> str:
+    if isinstance(request, DiffReviewRequest):
+        payload = json.dumps(["diff", request.language, request.context, request.diff, request.tenant])
+    else:
+        payload = json.dumps([request.language, request.context, request.code, request.tenant])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ServiceMetrics:
+    requests: int = 0
+    reviews_started: int = 0
+    reviews_coalesced: int = 0
+    reviews_rejected: int = 0
+    review_errors: int = 0
+    review_seconds_sum: float = 0.0
+    review_seconds_count: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution. The work
+    runs as its own task, so a caller that disconnects does not cancel it for
+    the others.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Task[Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run `func` unless a call with `key` is already running; returns the
+        result and whether it was shared with an earlier caller.
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task), shared
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded wait queue.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise ServiceOverloaded("Review queue is full; retry later.")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+
+class ReviewService:
+    """
+    ASGI application serving the review pipeline.
+    """
+
+    def __init__(
+        self,
+        review: Callable[[ReviewRequest], Awaitable[ReviewResponse]] = arun_review,
+        review_diff: Callable[[DiffReviewRequest], Awaitable[ReviewResponse]] = areview_diff,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_queue: int = MAX_QUEUE,
+    ) -> None:
+        self._review = review
+        self._review_diff = review_diff
+        self._max_concurrency = max_concurrency
+        self._max_queue = max_queue
+        self._admission: AdmissionController | None = None
+        self._singleflight = SingleFlight()
+        self.metrics = ServiceMetrics()
+
+    @property
+    def admission(self) -> AdmissionController:
+        # asyncio primitives are created lazily, inside the server's event loop.
+        if self._admission is None:
+            self._admission = AdmissionController(self._max_concurrency, self._max_queue)
+        return self._admission
+
+    async def __call__(self, scope: Dict[str, Any], receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        self.metrics.requests += 1
+        route = (scope["method"], scope["path"])
+        if route == ("POST", "/review"):
+            await self._handle_review(receive, send, ReviewRequest)
+        elif route == ("POST", "/review/diff"):
+            await self._handle_review(receive, send, DiffReviewRequest)
+        elif route == ("GET", "/healthz"):
+            await self._handle_health(send)
+        elif route == ("GET", "/metrics"):
+            await _send(send, 200, self.render_metrics().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            await _send_json(send, 404, {"error": "Not found."})
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    # Load the standards index before the first request needs it.
+                    await asyncio.to_thread(get_index_registry)
+                except Exception as exc:
+                    await send({"type": "lifespan.startup.failed", "message": str(exc)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _handle_review(
+        self,
+        receive: Receive,
+        send: Send,
+        model: type[ReviewRequest] | type[DiffReviewRequest],
+    ) -> None:
+        body = await _read_body(receive, MAX_BODY_BYTES)
+        if body is None:
+            await _send_json(send, 413, {"error": f"Request body exceeds {MAX_BODY_BYTES} bytes."})
+            return
+        try:
+            request = model.model_validate_json(body)
+        except ValidationError as exc:
+            await _send_json(send, 422, {"error": "Invalid review request.", "details": json.loads(exc.json())})
+            return
+
+        try:
+            response, shared = await self._singleflight.do(review_request_key(request), lambda: self._run(request))
+        except ServiceOverloaded as exc:
+            await _send_json(send, 503, {"error": str(exc)}, headers=[(b"retry-after", b"1")])
+            return
+        except UnknownTenantError as exc:
+            await _send_json(send, 404, {"error": str(exc)})
+            return
+        except Exception as exc:
+            await _send_json(send, 502, {"error": f"Review failed: {exc}"})
+            return
+
+        if shared:
+            self.metrics.reviews_coalesced += 1
+        await _send(send, 200, response.model_dump_json().encode("utf-8"), "application/json")
+
+    async def _run(self, request: ReviewRequest | DiffReviewRequest) -> ReviewResponse:
+        try:
+            async with self.admission.slot():
+                self.metrics.reviews_started += 1
+                start = time.perf_counter()
+                try:
+                    if isinstance(request, DiffReviewRequest):
+                        return await self._review_diff(request)
+                    return await self._review(request)
+                except Exception:
+                    self.metrics.review_errors += 1
+                    raise
+                finally:
+                    self.metrics.review_seconds_sum += time.perf_counter() - start
+                    self.metrics.review_seconds_count += 1
+        except ServiceOverloaded:
+            self.metrics.reviews_rejected += 1
+            raise
+
+    async def _handle_health(self, send: Send) -> None:
+        registry = await asyncio.to_thread(get_index_registry)
+        await _send_json(
+            send,
+            200,
+            {
+                "status": "ok",
+                "rules": len(registry.chunks),
+                "in_flight": self.admission.active,
+                "queued": self.admission.waiting,
+            },
+        )
+
+    def render_metrics(self) -> str:
+        m = self.metrics
+        usage = get_llm_usage()
+        cache = get_review_cache().stats
+        tenants = get_tenant_indexes().stats
+        samples: List[Tuple[str, str, float]] = [
+            ("codesensei_http_requests_total", "counter", m.requests),
+            ("codesensei_reviews_started_total", "counter", m.reviews_started),
+            ("codesensei_reviews_coalesced_total", "counter", m.reviews_coalesced),
+            ("codesensei_reviews_rejected_total", "counter", m.reviews_rejected),
+            ("codesensei_review_errors_total", "counter", m.review_errors),
+            ("codesensei_review_seconds_sum", "counter", m.review_seconds_sum),
+            ("codesensei_review_seconds_count", "counter", m.review_seconds_count),
+            ("codesensei_reviews_in_flight", "gauge", self.admission.active),
+            ("codesensei_reviews_queued", "gauge", self.admission.waiting),
+            ("codesensei_reviews_distinct_in_flight", "gauge", len(self._singleflight)),
+            ("codesensei_llm_calls_total", "counter", usage.calls),
+            ("codesensei_llm_prompt_tokens_total", "counter", usage.prompt_tokens),
+            ("codesensei_llm_completion_tokens_total", "counter", usage.completion_tokens),
+            ("codesensei_llm_cached_prompt_tokens_total", "counter", usage.cached_prompt_tokens),
+            ("codesensei_llm_prompt_seconds_total", "counter", usage.prompt_seconds),
+            ("codesensei_review_cache_hits_total", "counter", cache.hits),
+            ("codesensei_review_cache_misses_total", "counter", cache.misses),
+            ("codesensei_tenant_index_hits_total", "counter", tenants.hits),
+            ("codesensei_tenant_index_loads_total", "counter", tenants.loads),
+            ("codesensei_tenant_index_evictions_total", "counter", tenants.evictions),
+            ("codesensei_tenant_index_load_seconds_sum", "counter", tenants.load_seconds_sum),
+            ("codesensei_tenant_index_load_seconds_max", "gauge", tenants.load_seconds_max),
+            ("codesensei_tenant_indexes_resident", "gauge", tenants.resident),
+            ("codesensei_tenant_index_bytes", "gauge", tenants.resident_bytes),
+        ]
+        lines: List[str] = []
+        for name, kind, value in samples:
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+async def _read_body(receive: Receive, limit: int) -> bytes | None:
+    """
+    Read the full request body, or None once it exceeds `limit` bytes.
+    """
+    parts: List[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            return None
+        parts.append(chunk)
+        if not message.get("more_body", False):
+            break
+    return b"".join(parts)
+
+
+async def _send(
+    send: Send,
+    status: int,
+    body: bytes,
+    content_type: str,
+    headers: List[Tuple[bytes, bytes]] | None = None,
+) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                *(headers or []),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(
+    send: Send,
+    status: int,
+    payload: Dict[str, Any],
+    headers: List[Tuple[bytes, bytes]] | None = None,
+) -> None:
+    await _send(send, status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+
+app = ReviewService()
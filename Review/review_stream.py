@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator, List, Literal, Tuple
+
+from models import PositiveFeedbackItem, ReviewIssue, ReviewResponse
+
+
+StreamEventKind = Literal["verdict", "summary", "positive_feedback", "issue", "complete"]
+
+
+@dataclass
+class ReviewStreamEvent:
+    """
+    One progressively available piece of a review. The final event is always
+    `complete` and carries the fully validated ReviewResponse.
+    """
+
+    kind: StreamEventKind
+    value: Any
+
+
+class IncrementalObjectParser:
+    """
+    Incremental scanner for a single top-level JSON object arriving in pieces.
+
+    `feed` returns `(key, value, is_element)` tuples as soon as they are
+    complete: every top-level member once its value closes, and additionally
+    every element of a top-level array as soon as that element closes. Any
+    text before the first '{' (e.g. a markdown fence) is ignored.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_role: str | None = None
+        self._expect_key = False
+        self._key: str | None = None
+        self._key_start = -1
+        self._value_start = -1
+        self._value_is_array = False
+        self._element_start = -1
+        self._root_start = -1
+        self._root_end = -1
+
+    @property
+    def done(self) -> bool:
+        return self._root_end >= 0
+
+    @property
+    def object_text(self) -> str:
+        """
+        Text of the root object seen so far (the whole object once `done`).
+        """
+        if self._root_start < 0:
+            return ""
+        end = self._root_end + 1 if self.done else len(self._text)
+        return self._text[self._root_start:end]
+
+    def _emit_value(self, end: int, out: List[Tuple[str, Any, bool]]) -> None:
+        raw = self._text[self._value_start:end].strip()
+        if self._key is not None:
+            out.append((self._key, json.loads(raw), False))
+        self._value_start = -1
+        self._value_is_array = False
+
+    def _emit_element(self, end: int, out: List[Tuple[str, Any, bool]]) -> None:
+        raw = self._text[self._element_start:end].strip()
+        if self._key is not None:
+            out.append((self._key, json.loads(raw), True))
+        self._element_start = -1
+
+    def feed(self, piece: str) -> List[Tuple[str, Any, bool]]:
+        out: List[Tuple[str, Any, bool]] = []
+        if self.done:
+            return out
+        self._text += piece
+        text = self._text
+
+        i = self._pos
+        while i < len(text) and not self.done:
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_role == "key":
+                        self._key = json.loads(text[self._key_start:i + 1])
+                        self._expect_key = False
+                    elif self._string_role == "value":
+                        self._emit_value(i + 1, out)
+                    elif self._string_role == "element":
+                        self._emit_element(i + 1, out)
+                    self._string_role = None
+                i += 1
+                continue
+
+            if self._depth == 0:
+                if c == "{":
+                    self._root_start = i
+                    self._depth = 1
+                    self._expect_key = True
+                i += 1
+                continue
+
+            in_array_value = self._depth == 2 and self._value_is_array
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._string_role = "key"
+                    self._key_start = i
+                elif self._depth == 1 and self._value_start < 0:
+                    self._string_role = "value"
+                    self._value_start = i
+                elif in_array_value and self._element_start < 0:
+                    self._string_role = "element"
+                    self._element_start = i
+            elif c in "{[":
+                if self._depth == 1 and self._value_start < 0:
+                    self._value_start = i
+                    self._value_is_array = c == "["
+                elif in_array_value and self._element_start < 0:
+                    self._element_start = i
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 1:
+                    # Closing the root object, possibly ending a scalar member.
+                    if self._value_start >= 0:
+                        self._emit_value(i, out)
+                    self._depth = 0
+                    self._root_end = i
+                else:
+                    if in_array_value and self._element_start >= 0:
+                        # A scalar element ended by the array's closing bracket.
+                        self._emit_element(i, out)
+                    self._depth -= 1
+                    if self._depth == 2 and self._value_is_array and self._element_start >= 0:
+                        self._emit_element(i + 1, out)
+                    elif self._depth == 1 and self._value_start >= 0:
+                        self._emit_value(i + 1, out)
+            elif c == ",":
+                if self._depth == 1:
+                    if self._value_start >= 0:
+                        self._emit_value(i, out)
+                    self._expect_key = True
+                elif in_array_value and self._element_start >= 0:
+                    self._emit_element(i, out)
+            elif not c.isspace() and c != ":":
+                # Start of a number / true / false / null.
+                if self._depth == 1 and not self._expect_key and self._value_start < 0:
+                    self._value_start = i
+                elif in_array_value and self._element_start < 0:
+                    self._element_start = i
+            i += 1
+
+        self._pos = i
+        return out
+
+
+def parse_review_stream(pieces: Iterable[str]) -> Iterator[ReviewStreamEvent]:
+    """
+    Turn streamed completion text into review events as soon as each part of
+    the JSON review is complete, finishing with the validated response.
+    """
+    parser = IncrementalObjectParser()
+    raw_parts: List[str] = []
+
+    for piece in pieces:
+        if not piece:
+            continue
+        raw_parts.append(piece)
+        for key, value, is_element in parser.feed(piece):
+            if key in ("verdict", "summary") and not is_element:
+                yield ReviewStreamEvent(kind=key, value=value)
+            elif key == "issues" and is_element:
+                yield ReviewStreamEvent(kind="issue", value=ReviewIssue.model_validate(value))
+            elif key == "positive_feedback" and is_element:
+                yield ReviewStreamEvent(kind="positive_feedback", value=PositiveFeedbackItem.model_validate(value))
+
+    content = parser.object_text or "".join(raw_parts) or "{}"
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as exc:
+        raise RuntimeError(f"Model did not return valid JSON: {exc}\nRaw content: {''.join(raw_parts)}") from exc
+
+    yield ReviewStreamEvent(kind="complete", value=ReviewResponse.model_validate(data))
+
+
+def response_to_events(response: ReviewResponse) -> Iterator[ReviewStreamEvent]:
+    """
+    Replay an already complete response as stream events (e.g. no-coverage answers).
+    """
+    yield ReviewStreamEvent(kind="verdict", value=response.verdict)
+    yield ReviewStreamEvent(kind="summary", value=response.summary)
+    for item in response.positive_feedback:
+        yield ReviewStreamEvent(kind="positive_feedback", value=item)
+    for issue in response.issues:
+        yield ReviewStreamEvent(kind="issue", value=issue)
+    yield ReviewStreamEvent(kind="complete", value=response)
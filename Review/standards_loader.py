@@ -1,27 +1,34 @@
 from __future__ import annotations
 
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
 
 from models import StandardsChunk
 
 
-def _parse_standards_file(path: Path) -> List[StandardsChunk]:
+# Below this many files, process start-up costs more than parsing in-process.
+PARALLEL_MIN_FILES = 16
+
+
+def _iter_rules(text: str, default_title: str) -> Iterator[Tuple[str, str, str, str]]:
     """
     Very lightweight parser that treats each "Rule ID:" block in the markdown file
     as a single chunk. This keeps each rule self-contained and easy to cite.
+    Yields (rule_id, scope, section_title, body) tuples.
     """
-    text = path.read_text(encoding="utf-8")
-    lines = text.splitlines()
-
-    chunks: List[StandardsChunk] = []
     current_rule_id: str | None = None
     current_scope: str = "all-languages"
     current_body_lines: List[str] = []
 
     # Use the first markdown heading as a section title, if present.
-    section_title = path.stem.replace("_", " ").title()
-    for line in lines:
+    section_title = default_title
+    for line in text.splitlines():
         if line.startswith("# "):
             section_title = line.lstrip("# ").strip()
             continue
@@ -29,15 +36,7 @@ def _parse_standards_file(path: Path) -> List[StandardsChunk]:
         if line.strip().startswith("Rule ID:"):
             # Flush previous rule, if any.
             if current_rule_id and current_body_lines:
-                chunks.append(
-                    StandardsChunk(
-                        rule_id=current_rule_id,
-                        scope=current_scope,
-                        doc_name=path.name,
-                        section_title=section_title,
-                        text="\n".join(current_body_lines).strip(),
-                    )
-                )
+                yield current_rule_id, current_scope, section_title, "\n".join(current_body_lines).strip()
                 current_body_lines = []
 
             # Start a new rule.
@@ -55,34 +54,205 @@ def _parse_standards_file(path: Path) -> List[StandardsChunk]:
 
     # Flush last rule.
     if current_rule_id and current_body_lines:
-        chunks.append(
-            StandardsChunk(
-                rule_id=current_rule_id,
-                scope=current_scope,
-                doc_name=path.name,
-                section_title=section_title,
-                text="\n".join(current_body_lines).strip(),
-            )
+        yield current_rule_id, current_scope, section_title, "\n".join(current_body_lines).strip()
+
+
+@dataclass
+class CompactCorpus:
+    """
+    Columnar chunk table. Rule texts live in one contiguous buffer addressed
+    by `offsets` (rule i is `texts[offsets[i]:offsets[i + 1]]`), and scope,
+    document name and section title are stored once per distinct value and
+    referenced by index.
+
+    This is the parse, transfer and on-disk format: cheap to pickle back
+    from worker processes and to persist. It is not kept once the corpus is
+    loaded; the index is built over the StandardsChunk objects `to_chunks`
+    materializes (without re-validating). Those share the interned metadata
+    strings but otherwise cost as much memory as validated chunks.
+    """
+
+    rule_ids: List[str]
+    texts: str
+    offsets: np.ndarray
+    scope_ids: np.ndarray
+    doc_ids: np.ndarray
+    section_ids: np.ndarray
+    scopes: List[str]
+    doc_names: List[str]
+    sections: List[str]
+
+    def __len__(self) -> int:
+        return len(self.rule_ids)
+
+    def text(self, index: int) -> str:
+        return self.texts[int(self.offsets[index]) : int(self.offsets[index + 1])]
+
+    def chunk(self, index: int) -> StandardsChunk:
+        # Fields are str by construction, so pydantic validation is skipped.
+        return StandardsChunk.model_construct(
+            rule_id=self.rule_ids[index],
+            scope=self.scopes[self.scope_ids[index]],
+            doc_name=self.doc_names[self.doc_ids[index]],
+            section_title=self.sections[self.section_ids[index]],
+            text=self.text(index),
+        )
+
+    def to_chunks(self) -> List[StandardsChunk]:
+        return [self.chunk(i) for i in range(len(self))]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, str, str, str]]) -> "CompactCorpus":
+        """
+        Build from (rule_id, scope, doc_name, section_title, text) rows,
+        interning repeated metadata.
+        """
+        tables: Tuple[Dict[str, int], Dict[str, int], Dict[str, int]] = ({}, {}, {})
+        rule_ids: List[str] = []
+        texts: List[str] = []
+        ids: Tuple[List[int], List[int], List[int]] = ([], [], [])
+        for rule_id, *meta, text in rows:
+            rule_ids.append(sys.intern(rule_id))
+            texts.append(text)
+            for value, table, column in zip(meta, tables, ids):
+                column.append(table.setdefault(value, len(table)))
+
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in texts], out=offsets[1:])
+        scopes, doc_names, sections = ([sys.intern(v) for v in table] for table in tables)
+        return cls(
+            rule_ids=rule_ids,
+            texts="".join(texts),
+            offsets=offsets,
+            scope_ids=np.array(ids[0], dtype=np.int32),
+            doc_ids=np.array(ids[1], dtype=np.int32),
+            section_ids=np.array(ids[2], dtype=np.int32),
+            scopes=scopes,
+            doc_names=doc_names,
+            sections=sections,
         )
 
-    return chunks
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[StandardsChunk]) -> "CompactCorpus":
+        return cls.from_rows((c.rule_id, c.scope, c.doc_name, c.section_title, c.text) for c in chunks)
 
+    @classmethod
+    def concat(cls, parts: Sequence["CompactCorpus"]) -> "CompactCorpus":
+        """
+        Join corpora buffer to buffer: texts and offsets are appended as
+        they are and metadata ids are remapped into merged tables, without
+        going back through per-rule rows.
+        """
+        tables: Tuple[Dict[str, int], Dict[str, int], Dict[str, int]] = ({}, {}, {})
+        columns: Tuple[List[np.ndarray], List[np.ndarray], List[np.ndarray]] = ([], [], [])
+        offsets: List[np.ndarray] = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for part in parts:
+            for values, ids, table, column in zip(
+                (part.scopes, part.doc_names, part.sections),
+                (part.scope_ids, part.doc_ids, part.section_ids),
+                tables,
+                columns,
+            ):
+                remap = np.array([table.setdefault(v, len(table)) for v in values], dtype=np.int32)
+                column.append(remap[ids])
+            offsets.append(part.offsets[1:] + base)
+            base += int(part.offsets[-1])
 
-def load_standards_corpus(standards_dir: Path) -> List[StandardsChunk]:
+        def joined(column: List[np.ndarray]) -> np.ndarray:
+            return np.concatenate(column) if column else np.zeros(0, dtype=np.int32)
+
+        return cls(
+            rule_ids=[rule_id for part in parts for rule_id in part.rule_ids],
+            texts="".join(part.texts for part in parts),
+            offsets=np.concatenate(offsets),
+            scope_ids=joined(columns[0]),
+            doc_ids=joined(columns[1]),
+            section_ids=joined(columns[2]),
+            scopes=list(tables[0]),
+            doc_names=list(tables[1]),
+            sections=list(tables[2]),
+        )
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "rule_ids": self.rule_ids,
+            "texts": self.texts,
+            "offsets": self.offsets.tolist(),
+            "scope_ids": self.scope_ids.tolist(),
+            "doc_ids": self.doc_ids.tolist(),
+            "section_ids": self.section_ids.tolist(),
+            "scopes": self.scopes,
+            "doc_names": self.doc_names,
+            "sections": self.sections,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> "CompactCorpus":
+        """
+        Trusted load (e.g. from the index artifact): no per-rule validation.
+        """
+        return cls(
+            rule_ids=[sys.intern(r) for r in data["rule_ids"]],  # type: ignore[union-attr]
+            texts=data["texts"],  # type: ignore[arg-type]
+            offsets=np.asarray(data["offsets"], dtype=np.int64),
+            scope_ids=np.asarray(data["scope_ids"], dtype=np.int32),
+            doc_ids=np.asarray(data["doc_ids"], dtype=np.int32),
+            section_ids=np.asarray(data["section_ids"], dtype=np.int32),
+            scopes=[sys.intern(v) for v in data["scopes"]],  # type: ignore[union-attr]
+            doc_names=[sys.intern(v) for v in data["doc_names"]],  # type: ignore[union-attr]
+            sections=[sys.intern(v) for v in data["sections"]],  # type: ignore[union-attr]
+        )
+
+
+def parse_standards_file_compact(path: Path) -> CompactCorpus:
     """
-    Load all markdown documents from the standards directory and return a flat list of chunks.
+    Parse one markdown standards document into a CompactCorpus.
+    """
+    text = path.read_text(encoding="utf-8")
+    default_title = path.stem.replace("_", " ").title()
+    return CompactCorpus.from_rows(
+        (rule_id, scope, path.name, section_title, body)
+        for rule_id, scope, section_title, body in _iter_rules(text, default_title)
+    )
+
+
+def parse_standards_file(path: Path) -> List[StandardsChunk]:
+    """
+    Parse one markdown standards document into chunks, in file order.
+    """
+    return parse_standards_file_compact(path).to_chunks()
+
+
+def load_compact_corpus(standards_dir: Path, workers: int | None = None) -> CompactCorpus:
+    """
+    Parse every markdown document in the standards directory into one
+    CompactCorpus. Large directories are parsed across a process pool
+    (`workers` processes, default one per CPU); results keep file order.
     """
     if not standards_dir.exists():
         raise FileNotFoundError(f"Standards directory not found: {standards_dir}")
 
-    chunks: List[StandardsChunk] = []
-    for md_path in standards_dir.glob("*.md"):
-        chunks.extend(_parse_standards_file(md_path))
+    paths = sorted(standards_dir.glob("*.md"))
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(paths) < PARALLEL_MIN_FILES:
+        parts = [parse_standards_file_compact(path) for path in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(paths) // (workers * 4))
+            parts = list(pool.map(parse_standards_file_compact, paths, chunksize=chunksize))
 
-    if not chunks:
+    corpus = CompactCorpus.concat(parts)
+    if not len(corpus):
         raise RuntimeError(f"No standards rules found in: {standards_dir}")
+    return corpus
 
-    return chunks
+
+def load_standards_corpus(standards_dir: Path, workers: int | None = None) -> List[StandardsChunk]:
+    """
+    Load all markdown documents from the standards directory and return a flat list of chunks.
+    """
+    return load_compact_corpus(standards_dir, workers=workers).to_chunks()
 
 
 def filter_chunks_for_language(chunks: Iterable[StandardsChunk], language: str) -> List[StandardsChunk]:
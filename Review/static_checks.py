@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import ast
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Sequence
+
+from models import PositiveFeedbackItem, ReviewIssue, ReviewResponse, StandardsChunk
+from review_merge import verdict_for_issues
+
+
+@dataclass
+class CheckResult:
+    """
+    Outcome of checking one rule locally. `issues` use placeholder ids; they
+    are renumbered when merged into a review.
+    """
+
+    rule_id: str
+    issues: List[ReviewIssue] = field(default_factory=list)
+    positive: str | None = None
+
+
+# A checker returns None when it cannot decide (e.g. the code does not parse),
+# in which case the rule is left to the LLM.
+StaticChecker = Callable[[str, str], CheckResult | None]
+
+_CHECKERS: Dict[str, StaticChecker] = {}
+# Rules whose checker only covers part of the rule text.
+_PARTIAL: set[str] = set()
+
+
+def register_checker(rule_id: str, complete: bool = True) -> Callable[[StaticChecker], StaticChecker]:
+    """
+    Register a deterministic checker for a standards rule. A checker that
+    does not cover everything the rule asks for is registered with
+    `complete=False`: its findings are reported, but the rule still goes to
+    the LLM for the rest and no positive feedback is given for it.
+    """
+
+    def decorator(func: StaticChecker) -> StaticChecker:
+        _CHECKERS[rule_id] = func
+        if complete:
+            _PARTIAL.discard(rule_id)
+        else:
+            _PARTIAL.add(rule_id)
+        return func
+
+    return decorator
+
+
+def has_checker(rule_id: str) -> bool:
+    return rule_id in _CHECKERS
+
+
+def checks_fully(rule_id: str) -> bool:
+    """
+    True when the rule is decided locally and never needs the LLM.
+    """
+    return rule_id in _CHECKERS and rule_id not in _PARTIAL
+
+
+def _issue(rule_id: str, severity: str, description: str, affected_code: str) -> ReviewIssue:
+    return ReviewIssue(
+        id=f"{rule_id}-LOCAL",
+        severity=severity,  # type: ignore[arg-type]
+        description=description,
+        affected_code=affected_code,
+        rule_ids=[rule_id],
+    )
+
+
+def _parse_python(code: str, language: str) -> ast.Module | None:
+    if language.lower().strip() not in ("python", "py"):
+        return None
+    try:
+        return ast.parse(code)
+    except SyntaxError:
+        return None
+
+
+_BROAD_EXCEPTIONS = {"Exception", "BaseException"}
+_LOG_METHODS = {"debug", "info", "warning", "warn", "error", "exception", "critical", "log", "print_exc", "print_exception"}
+
+
+def _catches_broadly(handler: ast.ExceptHandler) -> bool:
+    types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+    return any(
+        (isinstance(t, ast.Name) and t.id in _BROAD_EXCEPTIONS)
+        or (isinstance(t, ast.Attribute) and t.attr in _BROAD_EXCEPTIONS)
+        for t in types
+    )
+
+
+def _raises_or_logs(handler: ast.ExceptHandler) -> bool:
+    for node in ast.walk(ast.Module(body=handler.body, type_ignores=[])):
+        if isinstance(node, ast.Raise):
+            return True
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in _LOG_METHODS:
+            return True
+    return False
+
+
+@register_checker("PY-ERROR-001")
+def check_bare_except(code: str, language: str) -> CheckResult | None:
+    tree = _parse_python(code, language)
+    if tree is None:
+        return None
+
+    result = CheckResult(rule_id="PY-ERROR-001")
+    handlers = [n for n in ast.walk(tree) if isinstance(n, ast.ExceptHandler)]
+    for handler in handlers:
+        if handler.type is None:
+            result.issues.append(
+                _issue(
+                    "PY-ERROR-001",
+                    "minor",
+                    "Bare `except:` clause; catch a specific exception type instead.",
+                    f"line {handler.lineno}: except:",
+                )
+            )
+        elif _catches_broadly(handler) and not _raises_or_logs(handler):
+            caught = ast.unparse(handler.type)
+            result.issues.append(
+                _issue(
+                    "PY-ERROR-001",
+                    "minor",
+                    f"`except {caught}:` swallows every error; catch a specific exception type, "
+                    "or re-raise or log inside the handler.",
+                    f"line {handler.lineno}: except {caught}:",
+                )
+            )
+    if handlers and not result.issues:
+        result.positive = "Exception handlers catch specific exception types, and broad handlers re-raise or log."
+    return result
+
+
+_SNAKE_RE = re.compile(r"^_{0,2}[a-z][a-z0-9_]*_{0,2}$|^_$")
+_PASCAL_RE = re.compile(r"^_?[A-Z][A-Za-z0-9]*$")
+_CONSTANT_RE = re.compile(r"^_?[A-Z][A-Z0-9_]*$")
+
+
+def _is_snake(name: str) -> bool:
+    return bool(_SNAKE_RE.match(name)) or (name.startswith("__") and name.endswith("__"))
+
+
+# Only casing is checked: whether a module-level name is a constant, and so
+# should be SCREAMING_SNAKE_CASE, is left to the LLM.
+@register_checker("PY-NAMING-001", complete=False)
+def check_pep8_naming(code: str, language: str) -> CheckResult | None:
+    tree = _parse_python(code, language)
+    if tree is None:
+        return None
+
+    result = CheckResult(rule_id="PY-NAMING-001")
+    seen: set[str] = set()
+
+    def flag(name: str, lineno: int, what: str, expected: str) -> None:
+        if name in seen:
+            return
+        seen.add(name)
+        result.issues.append(
+            _issue(
+                "PY-NAMING-001",
+                "nit",
+                f"{what} `{name}` does not follow PEP 8; use {expected}.",
+                f"line {lineno}: {name}",
+            )
+        )
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            if not _PASCAL_RE.match(node.name):
+                flag(node.name, node.lineno, "Class name", "PascalCase")
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if not _is_snake(node.name):
+                flag(node.name, node.lineno, "Function name", "snake_case")
+            for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs:
+                if not _is_snake(arg.arg):
+                    flag(arg.arg, arg.lineno, "Argument name", "snake_case")
+            for inner in ast.walk(node):
+                # Locals only: module-level names may legitimately be constants.
+                if isinstance(inner, ast.Name) and isinstance(inner.ctx, ast.Store):
+                    name = inner.id
+                    if not _is_snake(name) and not _CONSTANT_RE.match(name):
+                        flag(name, inner.lineno, "Variable name", "snake_case")
+
+    return result
+
+
+_STDLIB = set(getattr(sys, "stdlib_module_names", ())) | set(sys.builtin_module_names) | {"__future__"}
+_GROUP_NAMES = {0: "standard library", 1: "third-party", 2: "local application"}
+
+
+def _import_group(node: ast.Import | ast.ImportFrom) -> tuple[int, str]:
+    if isinstance(node, ast.ImportFrom):
+        if node.level:
+            return 2, "." * node.level + (node.module or "")
+        module = node.module or ""
+    else:
+        module = node.names[0].name
+    top = module.split(".")[0]
+    return (0 if top in _STDLIB else 1), module
+
+
+# Absolute imports of the application's own modules look like third-party
+# ones, so the local block cannot be told apart here; the LLM covers that.
+@register_checker("PY-STRUCTURE-001", complete=False)
+def check_import_grouping(code: str, language: str) -> CheckResult | None:
+    tree = _parse_python(code, language)
+    if tree is None:
+        return None
+
+    result = CheckResult(rule_id="PY-STRUCTURE-001")
+    # Leading import block only (after an optional docstring).
+    imports: List[ast.Import | ast.ImportFrom] = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append(node)
+        elif imports or not (isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)):
+            break
+    if not imports:
+        return result
+
+    lines = code.splitlines()
+    prev: ast.Import | ast.ImportFrom | None = None
+    prev_group, prev_module = -1, ""
+    prev_key: tuple[bool, str] = (False, "")
+    for node in imports:
+        group, module = _import_group(node)
+        # isort's default order: plain `import x` lines before `from x import y`.
+        key = (isinstance(node, ast.ImportFrom), module.lower())
+        if prev is not None:
+            prev_end = prev.end_lineno or prev.lineno
+            separated = any(not lines[i].strip() for i in range(prev_end, node.lineno - 1))
+            where = f"line {node.lineno}: {module}"
+            if group < prev_group:
+                result.issues.append(
+                    _issue(
+                        "PY-STRUCTURE-001",
+                        "nit",
+                        f"{_GROUP_NAMES[group].capitalize()} import `{module}` comes after "
+                        f"{_GROUP_NAMES[prev_group]} imports; order blocks standard library, third-party, local.",
+                        where,
+                    )
+                )
+            elif group > prev_group and not separated:
+                result.issues.append(
+                    _issue(
+                        "PY-STRUCTURE-001",
+                        "nit",
+                        f"Missing blank line between the {_GROUP_NAMES[prev_group]} and "
+                        f"{_GROUP_NAMES[group]} import blocks.",
+                        where,
+                    )
+                )
+            elif group == prev_group and not separated and key < prev_key:
+                result.issues.append(
+                    _issue(
+                        "PY-STRUCTURE-001",
+                        "nit",
+                        f"Import `{module}` is not sorted within its block (after `{prev_module}`).",
+                        where,
+                    )
+                )
+        prev, prev_group, prev_module, prev_key = node, group, module, key
+
+    return result
+
+
+def run_static_checks(
+    code: str,
+    language: str,
+    chunks: Sequence[StandardsChunk],
+) -> tuple[List[CheckResult], List[StandardsChunk]]:
+    """
+    Check every rule that has a local checker. Returns the results and the
+    chunks that still need the LLM (no checker, a partial checker, or the
+    checker declined).
+    """
+    results: List[CheckResult] = []
+    remaining: List[StandardsChunk] = []
+    for chunk in chunks:
+        checker = _CHECKERS.get(chunk.rule_id)
+        outcome = checker(code, language) if checker is not None else None
+        if outcome is None:
+            remaining.append(chunk)
+            continue
+        if chunk.rule_id in _PARTIAL:
+            # Passing the local part says nothing about the rest of the rule.
+            outcome.positive = None
+            remaining.append(chunk)
+        results.append(outcome)
+    return results, remaining
+
+
+def static_review(results: Sequence[CheckResult]) -> ReviewResponse:
+    """
+    Turn local check results into a ReviewResponse without any LLM call.
+    """
+    issues = [issue for r in results for issue in r.issues]
+    positives = [
+        PositiveFeedbackItem(message=r.positive, rule_ids=[r.rule_id]) for r in results if r.positive
+    ]
+    checked = ", ".join(r.rule_id for r in results)
+    verdict = verdict_for_issues(issues)
+    summary = (
+        f"Checked {checked} with deterministic local checks: found {len(issues)} issue(s)."
+        if issues
+        else f"Checked {checked} with deterministic local checks: no violations found."
+    )
+    return ReviewResponse(
+        verdict=verdict,  # type: ignore[arg-type]
+        summary=summary,
+        positive_feedback=positives,
+        issues=[i.model_copy(update={"id": f"ISSUE-{n}"}) for n, i in enumerate(issues, start=1)],
+    )
@@ -4,8 +4,8 @@ import json
 
 import streamlit as st
 
-from app_core import run_review
-from models import ReviewRequest
+from app_core import run_review, stream_review
+from models import PositiveFeedbackItem, ReviewIssue, ReviewRequest, ReviewResponse
 
 
 st.set_page_config(page_title="CodeReview - RAG Code Review", layout="wide")
@@ -28,6 +28,7 @@ with st.sidebar:
         "Optional context (e.g. 'This is a REST controller for user management')",
         height=100,
     )
+    stream_results = st.checkbox("Show results as they are generated", value=True)
 
 
 code = st.text_area("Code to review", height=320, placeholder="Paste your code here...")
@@ -37,49 +38,111 @@ with col1:
     run_button = st.button("Review Code", type="primary", use_container_width=True)
 
 
+VERDICT_COLORS = {
+    "approve": "green",
+    "approve_with_nits": "orange",
+    "request_changes": "red",
+    "no_coverage": "gray",
+}
+
+
+def render_verdict(verdict: str) -> None:
+    verdict_color = VERDICT_COLORS.get(verdict, "gray")
+    st.markdown(f"**Verdict:** <span style='color:{verdict_color};'>{verdict}</span>", unsafe_allow_html=True)
+
+
+def render_positive(item: PositiveFeedbackItem) -> None:
+    rules = ", ".join(item.rule_ids) if item.rule_ids else "—"
+    st.markdown(f"- {item.message} _(rules: {rules})_")
+
+
+def render_issue(issue: ReviewIssue) -> None:
+    st.markdown(
+        f"**{issue.id}** – **{issue.severity.upper()}**  "
+        f"(rules: {', '.join(issue.rule_ids) if issue.rule_ids else '—'})"
+    )
+    st.write(issue.description)
+    if issue.affected_code:
+        with st.expander("Affected code"):
+            st.code(issue.affected_code, language=language)
+
+
+def render_raw(response: ReviewResponse) -> None:
+    with st.expander("Raw response JSON"):
+        st.code(json.dumps(response.model_dump(), indent=2), language="json")
+
+
+def render_response(response: ReviewResponse) -> None:
+    render_verdict(response.verdict)
+    st.markdown(f"**Summary:** {response.summary}")
+
+    st.subheader("Positive feedback")
+    if not response.positive_feedback:
+        st.write("No explicit positives were identified from the standards corpus.")
+    else:
+        for item in response.positive_feedback:
+            render_positive(item)
+
+    st.subheader("Issues")
+    if not response.issues:
+        st.write("No issues found (or no applicable standards).")
+    else:
+        for issue in response.issues:
+            render_issue(issue)
+
+    render_raw(response)
+
+
+def render_stream(request: ReviewRequest) -> None:
+    """
+    Render each part of the review as soon as the model has produced it.
+    """
+    status = st.empty()
+    status.info("Running CodeSensei review...")
+    verdict_slot = st.empty()
+    summary_slot = st.empty()
+    st.subheader("Positive feedback")
+    positives_box = st.container()
+    st.subheader("Issues")
+    issues_box = st.container()
+
+    for event in stream_review(request):
+        if event.kind == "verdict":
+            with verdict_slot.container():
+                render_verdict(event.value)
+        elif event.kind == "summary":
+            summary_slot.markdown(f"**Summary:** {event.value}")
+        elif event.kind == "positive_feedback":
+            with positives_box:
+                render_positive(event.value)
+        elif event.kind == "issue":
+            with issues_box:
+                render_issue(event.value)
+        elif event.kind == "complete":
+            response = event.value
+            if not response.positive_feedback:
+                positives_box.write("No explicit positives were identified from the standards corpus.")
+            if not response.issues:
+                issues_box.write("No issues found (or no applicable standards).")
+            status.empty()
+            render_raw(response)
+
+
 if run_button:
     if not code.strip():
         st.warning("Please paste some code first.")
     else:
-        with st.spinner("Running CodeSensei review..."):
-            request = ReviewRequest(language=language, code=code, context=context or None)
+        request = ReviewRequest(language=language, code=code, context=context or None)
+        if stream_results:
             try:
-                response = run_review(request)
+                render_stream(request)
             except Exception as exc:  # noqa: BLE001
                 st.error(f"Review failed: {exc}")
-            else:
-                verdict_color = {
-                    "approve": "green",
-                    "approve_with_nits": "orange",
-                    "request_changes": "red",
-                    "no_coverage": "gray",
-                }.get(response.verdict, "gray")
-
-                st.markdown(f"**Verdict:** <span style='color:{verdict_color};'>{response.verdict}</span>", unsafe_allow_html=True)
-                st.markdown(f"**Summary:** {response.summary}")
-
-                st.subheader("Positive feedback")
-                if not response.positive_feedback:
-                    st.write("No explicit positives were identified from the standards corpus.")
+        else:
+            with st.spinner("Running CodeSensei review..."):
+                try:
+                    response = run_review(request)
+                except Exception as exc:  # noqa: BLE001
+                    st.error(f"Review failed: {exc}")
                 else:
-                    for item in response.positive_feedback:
-                        rules = ", ".join(item.rule_ids) if item.rule_ids else "—"
-                        st.markdown(f"- {item.message} _(rules: {rules})_")
-
-                st.subheader("Issues")
-                if not response.issues:
-                    st.write("No issues found (or no applicable standards).")
-                else:
-                    for issue in response.issues:
-                        st.markdown(
-                            f"**{issue.id}** – **{issue.severity.upper()}**  "
-                            f"(rules: {', '.join(issue.rule_ids) if issue.rule_ids else '—'})"
-                        )
-                        st.write(issue.description)
-                        if issue.affected_code:
-                            with st.expander("Affected code"):
-                                st.code(issue.affected_code, language=language)
-
-                with st.expander("Raw response JSON"):
-                    st.code(json.dumps(response.model_dump(), indent=2), language="json")
-
+                    render_response(response)
@@ -0,0 +1,236 @@
+"""
+Per-tenant standards corpora layered over the shared base index.
+
+A tenant is a directory `tenants/<name>/` of markdown standards in the same
+format as `standards/`. A review that names a tenant retrieves from the base
+rules plus the tenant's own; a tenant rule with the same rule_id as a base
+rule replaces it. Tenant indexes are built on first use, hold only the
+tenant's rules (base rules, their vectors and their prompt renderings are
+shared with the base index) and live in an LRU cache bounded by an
+estimate of the memory they hold.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import ChainMap, OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Sequence
+
+from index_registry import GLOBAL_SCOPE, StandardsIndexRegistry
+from models import StandardsChunk
+from prompts import format_compact_guideline_chunk
+from standards_loader import load_standards_corpus
+from vector_store import LayeredVectorStore, StandardsVectorStore
+
+
+_TENANT_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+class UnknownTenantError(ValueError):
+    pass
+
+
+class TenantIndexRegistry(StandardsIndexRegistry):
+    """
+    Registry for one tenant: the base corpus with the tenant's rules added
+    (or substituted by rule_id). TF-IDF stores are `LayeredVectorStore`s over
+    the base registry's stores; other backends are fitted on the merged rules.
+    """
+
+    def __init__(self, name: str, base: StandardsIndexRegistry, chunks: Sequence[StandardsChunk]) -> None:
+        self.name = name
+        self.base = base
+        overridden = {chunk.rule_id for chunk in chunks}
+        self._hidden = frozenset(overridden.intersection(chunk.rule_id for chunk in base.chunks))
+        merged = [chunk for chunk in base.chunks if chunk.rule_id not in overridden] + list(chunks)
+        # Positions from here on hold tenant rules.
+        self._tenant_start = len(merged) - len(chunks)
+        own = {chunk.rule_id: format_compact_guideline_chunk(chunk) for chunk in chunks}
+        renderings = ChainMap(own, base._compact_renderings)
+        super().__init__(merged, store_factory=base._store_factory, renderings=renderings)
+
+    @property
+    def tenant_chunks(self) -> Sequence[StandardsChunk]:
+        return self._chunks[self._tenant_start :]
+
+    def store_for_language(self, language: str) -> StandardsVectorStore | None:
+        positions = self.positions_for_language(language)
+        if not positions:
+            return None
+        store = self._stores.get(positions)
+        if store is not None:
+            return store
+
+        tenant = [self._chunks[pos] for pos in positions if pos >= self._tenant_start]
+        base_store = self.base.store_for_language(language)
+        hidden = self._hidden.intersection(chunk.rule_id for chunk in self.base.chunks_for_language(language))
+        with self._lock:
+            store = self._stores.get(positions)
+            if store is None:
+                if base_store is None:
+                    # Only the tenant has rules for this language: a small standalone store.
+                    store = self._store_factory()
+                    store.fit(tenant)
+                elif tenant or hidden:
+                    store = LayeredVectorStore(base_store, tenant, hidden=hidden)
+                else:
+                    store = base_store
+                self._stores[positions] = store
+        return store
+
+    def store_for_language_group(self, positions: tuple[int, ...]) -> StandardsVectorStore:
+        # Layering is decided per language, so resolve a group through one of its languages.
+        for scope in [GLOBAL_SCOPE, *self.scopes]:
+            if self.positions_for_language(scope) == positions:
+                store = self.store_for_language(scope)
+                assert store is not None
+                return store
+        return super().store_for_language_group(positions)
+
+    def nbytes(self) -> int:
+        """
+        Estimated memory held for this tenant on top of the base index.
+        """
+        size = sum(len(chunk.text) + len(self._compact_renderings[chunk.rule_id]) for chunk in self.tenant_chunks)
+        # Position tables and the merged chunk tuple: one reference per rule.
+        size += 8 * (len(self._chunks) + len(self._global_positions) + sum(len(p) for p in self._scope_index.values()))
+        shared = {id(store) for store in self.base.fitted_stores().values()}
+        with self._lock:
+            stores = [store for store in self._stores.values() if id(store) not in shared]
+            blocks = list(self._stable_guidelines.values())
+        for store in stores:
+            if isinstance(store, LayeredVectorStore):
+                size += store.nbytes()
+            else:
+                _, idf, matrix = store.to_arrays()
+                size += idf.nbytes + matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        return size + sum(len(block) for block in blocks)
+
+
+@dataclass
+class TenantCacheStats:
+    hits: int = 0
+    loads: int = 0
+    evictions: int = 0
+    load_seconds_sum: float = 0.0
+    load_seconds_max: float = 0.0
+    resident: int = 0
+    resident_bytes: int = 0
+
+
+@dataclass
+class _Entry:
+    registry: TenantIndexRegistry
+    nbytes: int
+
+
+class TenantIndexCache:
+    """
+    Tenant registries loaded on demand and kept in LRU order, evicting the
+    least recently used tenants once their estimated size exceeds
+    `max_bytes` (the tenant just loaded is always kept).
+
+    `base` returns the current base registry; a tenant built over an older
+    base (before a standards reload) is rebuilt on its next use. Concurrent
+    requests for a tenant that is still loading wait for that one load.
+    """
+
+    def __init__(
+        self,
+        tenants_dir: Path,
+        base: Callable[[], StandardsIndexRegistry],
+        max_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.tenants_dir = tenants_dir
+        self.max_bytes = max_bytes
+        self._base = base
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._loading: Dict[str, Future] = {}
+        self._stats = TenantCacheStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> TenantCacheStats:
+        with self._lock:
+            return TenantCacheStats(
+                hits=self._stats.hits,
+                loads=self._stats.loads,
+                evictions=self._stats.evictions,
+                load_seconds_sum=self._stats.load_seconds_sum,
+                load_seconds_max=self._stats.load_seconds_max,
+                resident=len(self._entries),
+                resident_bytes=sum(entry.nbytes for entry in self._entries.values()),
+            )
+
+    def tenant_dir(self, name: str) -> Path:
+        if not _TENANT_NAME_RE.match(name):
+            raise UnknownTenantError(f"Invalid tenant name: {name!r}")
+        path = self.tenants_dir / name
+        if not path.is_dir():
+            raise UnknownTenantError(f"Unknown tenant: {name!r}")
+        return path
+
+    def get(self, name: str) -> TenantIndexRegistry:
+        """
+        The tenant's registry over the current base index, loading it if needed.
+        """
+        base = self._base()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.registry.base is base:
+                self._entries.move_to_end(name)
+                self._stats.hits += 1
+                return entry.registry
+            future = self._loading.get(name)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._loading[name] = future
+        assert future is not None
+        if not owner:
+            return future.result()
+
+        try:
+            registry = self._load(name, base)
+        except BaseException as exc:
+            with self._lock:
+                self._loading.pop(name, None)
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            self._loading.pop(name, None)
+        future.set_result(registry)
+        return registry
+
+    def evict(self, name: str) -> bool:
+        with self._lock:
+            return self._entries.pop(name, None) is not None
+
+    def _load(self, name: str, base: StandardsIndexRegistry) -> TenantIndexRegistry:
+        start = time.perf_counter()
+        registry = TenantIndexRegistry(name, base, load_standards_corpus(self.tenant_dir(name)))
+        # Build every language group now so the load time (and size) covers the whole index.
+        registry.warm()
+        elapsed = time.perf_counter() - start
+        nbytes = registry.nbytes()
+
+        with self._lock:
+            self._entries[name] = _Entry(registry, nbytes)
+            self._entries.move_to_end(name)
+            self._stats.loads += 1
+            self._stats.load_seconds_sum += elapsed
+            self._stats.load_seconds_max = max(self._stats.load_seconds_max, elapsed)
+            # Stable-prefix blocks grow a registry after load; refresh sizes before evicting.
+            for entry in self._entries.values():
+                entry.nbytes = entry.registry.nbytes()
+            total = sum(entry.nbytes for entry in self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                total -= evicted.nbytes
+                self._stats.evictions += 1
+        return registry
@@ -0,0 +1,7 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# Review/ is a flat set of modules imported by name (e.g. `from models import ...`).
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ann_index import RandomProjectionLSH
+from retrieval_benchmark import synthetic_corpus
+from vector_store import StandardsVectorStore
+
+
+@pytest.fixture(scope="module")
+def store() -> StandardsVectorStore:
+    chunks, _ = synthetic_corpus(2000, 0)
+    store = StandardsVectorStore()
+    store.fit(chunks)
+    store.enable_ann()
+    return store
+
+
+def test_batched_candidates_match_single_query_lookup(store: StandardsVectorStore) -> None:
+    ann = store.ann_index
+    assert ann is not None
+    queries = store.encode_batch(["errors\n", "naming\n", "imports\n"], shared_text=store._chunks[7].text)
+    batched = ann.candidates_batch(queries)
+    for i, candidates in enumerate(batched):
+        assert np.array_equal(candidates, ann.candidates(queries[i]))
+        assert np.all(np.diff(candidates) > 0)
+
+
+def test_candidate_rescoring_matches_exact_scores(store: StandardsVectorStore) -> None:
+    queries = store.encode_batch(["a\n", "b\n"], shared_text=store._chunks[3].text)
+    ids = np.array([3, 0, 1999, 42, 42])
+    assert np.allclose(store._score(queries, ids), store._score(queries)[:, ids])
+
+
+def test_projection_matches_sparse_product(store: StandardsVectorStore) -> None:
+    ann = store.ann_index
+    assert ann is not None
+    rows = store._matrix[:1500]
+    expected = np.asarray((rows @ ann._planes).todense()).reshape(rows.shape[0], ann.n_tables, ann.n_bits)
+    assert np.allclose(ann._project(rows, block_rows=256), expected, atol=1e-5)
+
+
+def test_ann_finds_a_rule_queried_by_its_own_text(store: StandardsVectorStore) -> None:
+    results = store.query(store._chunks[11].text, top_k=3)
+    assert results[0].chunk.rule_id == store._chunks[11].rule_id
+
+
+def test_incremental_add_matches_a_full_build(store: StandardsVectorStore) -> None:
+    ann = store.ann_index
+    assert ann is not None
+    grown = RandomProjectionLSH(ann.n_features, ann.n_tables, ann.n_bits, ann.n_probes, ann.seed, ann.density)
+    for start, stop in ((0, 700), (700, 1300), (1300, 2000)):
+        grown.add(store._matrix[start:stop])
+
+    assert np.array_equal(grown._keys, ann._keys)
+    for t in range(ann.n_tables):
+        assert np.array_equal(grown._sorted_keys[t], ann._sorted_keys[t])
+        assert np.array_equal(grown._sorted_ids[t], ann._sorted_ids[t])
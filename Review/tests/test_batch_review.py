@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+import batch_review
+from batch_review import discover_files, issue_region, run_batch
+from models import ReviewIssue, ReviewRequest, ReviewResponse
+
+
+def test_issue_region_reads_line_refs_and_quoted_code() -> None:
+    assert issue_region("line 4: except:") == {"startLine": 4}
+    assert issue_region("lines 40-80 (load): vague names") == {"startLine": 40, "endLine": 80}
+    assert issue_region("except:\n    pass", "x = 1\ntry:\n    f()\nexcept:\n    pass\n") == {"startLine": 4}
+    assert issue_region("nowhere to be found", "x = 1\n") is None
+
+
+def test_run_batch_reviews_files_and_writes_sarif_regions(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    reviewed: list[str] = []
+
+    async def fake_review(request: ReviewRequest) -> ReviewResponse:
+        reviewed.append(request.code)
+        issue = ReviewIssue(id="ISSUE-1", severity="minor", description="Bare except.", affected_code="line 2: except:")
+        return ReviewResponse(verdict="request_changes", summary="", issues=[issue])
+
+    monkeypatch.setattr(batch_review, "arun_review", fake_review)
+    monkeypatch.setattr(batch_review, "get_index_registry", lambda: None)
+    root = tmp_path / "repo"
+    root.mkdir()
+    for i in range(5):
+        (root / f"m{i}.py").write_text(f"x = {i}\n", encoding="utf-8")
+    output, sarif = tmp_path / "out.jsonl", tmp_path / "out.sarif"
+
+    files = discover_files(root, use_git=False, max_bytes=10_000)
+    stats = asyncio.run(run_batch(files, output, sarif, concurrency=2, context=None, progress_interval=60))
+
+    assert stats.files == 5 and len(reviewed) == 5
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 5
+    results = json.loads(sarif.read_text(encoding="utf-8"))["runs"][0]["results"]
+    assert [r["locations"][0]["physicalLocation"]["region"] for r in results] == [{"startLine": 2}] * 5
+
+    # A second run resumes: nothing is reviewed again, SARIF is still complete.
+    files = discover_files(root, use_git=False, max_bytes=10_000)
+    stats = asyncio.run(run_batch(files, output, sarif, concurrency=2, context=None, progress_interval=60))
+    assert stats.files == 0 and len(reviewed) == 5
+    assert len(json.loads(sarif.read_text(encoding="utf-8"))["runs"][0]["results"]) == 5
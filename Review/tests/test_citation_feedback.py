@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import citation_feedback
+import rag_pipeline
+from citation_feedback import CitationRecord, RetrievalCutoffs, RetrievalEvent, learn_cutoffs, read_citation_log
+from index_registry import score_settings
+from models import ReviewIssue, ReviewRequest, ReviewResponse
+from review_stream import response_to_events
+from standards_loader import load_standards_corpus
+
+
+STANDARDS_DIR = Path(__file__).resolve().parent.parent / "standards"
+
+
+def test_streamed_reviews_are_logged(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    log_path = tmp_path / "citations.jsonl"
+    monkeypatch.setattr(rag_pipeline, "CITATION_LOG_PATH", str(log_path))
+    response = ReviewResponse(
+        verdict="approve_with_nits",
+        summary="One naming nit.",
+        issues=[ReviewIssue(id="ISSUE-1", severity="nit", description="Vague name.", rule_ids=["PY-NAMING-002"])],
+    )
+    monkeypatch.setattr(rag_pipeline, "stream_review_with_llm", lambda **kwargs: response_to_events(response))
+
+    request = ReviewRequest(language="python", code="def load(p):\n    d = open(p).read()\n    return d\n")
+    events = list(rag_pipeline.stream_rag_review(request, load_standards_corpus(STANDARDS_DIR)))
+
+    assert events[-1].kind == "complete"
+    [record] = read_citation_log(log_path)
+    assert record.language == "python"
+    assert record.cited == ["PY-NAMING-002"]
+    assert record.rules and all(event.score > 0 for event in record.rules)
+    assert record.settings == score_settings()
+
+
+def _records(language: str, rule_id: str, cited: bool, n: int, settings: dict | None = None) -> list[CitationRecord]:
+    return [
+        CitationRecord(
+            language=language,
+            rules=[RetrievalEvent(rule_id, "naming", 0.3 + i / 100, 40)],
+            cited=[rule_id] if cited else [],
+            settings=settings or {"lsa_components": 0, "lsa_weight": 0.0},
+        )
+        for i in range(n)
+    ]
+
+
+def test_cutoffs_are_learned_per_language() -> None:
+    records = _records("python", "GEN-STYLE-001", True, 20) + _records("JavaScript", "GEN-STYLE-001", False, 20)
+    cutoffs = learn_cutoffs(records, min_observations=20, margin=0.1, exploration_rate=0.0)
+
+    assert cutoffs.threshold("python", "GEN-STYLE-001", "naming", 0.0) == pytest.approx(0.27)
+    assert cutoffs.threshold("javascript", "GEN-STYLE-001", "naming", 0.0) == pytest.approx(0.49 * 1.1)
+    assert cutoffs.excluded == {"javascript": ["GEN-STYLE-001"]}
+    assert set(cutoffs.facets) == {"python"}
+
+
+def test_never_cited_rules_are_explored(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    cutoffs = learn_cutoffs(_records("python", "PY-NAMING-001", False, 20), min_observations=20, exploration_rate=0.25)
+    cutoffs.save(tmp_path / "cutoffs.json")
+    cutoffs = RetrievalCutoffs.load(tmp_path / "cutoffs.json")
+
+    monkeypatch.setattr(citation_feedback.random, "random", lambda: 0.2)
+    assert cutoffs.threshold("python", "PY-NAMING-001", "naming", 0.1) > 0.49
+    assert cutoffs.threshold("python", "PY-NAMING-001", "naming", 0.1, explore=True) == 0.1
+    monkeypatch.setattr(citation_feedback.random, "random", lambda: 0.3)
+    assert cutoffs.threshold("python", "PY-NAMING-001", "naming", 0.1, explore=True) > 0.49
+
+
+def test_cutoffs_only_learn_from_the_current_score_scale() -> None:
+    lsa = {"lsa_components": 64, "lsa_weight": 0.3}
+    records = _records("python", "PY-NAMING-001", False, 20, settings=lsa) + _records("python", "PY-NAMING-001", True, 20)
+    cutoffs = learn_cutoffs(records, min_observations=20)
+
+    assert cutoffs.settings == {"lsa_components": 0, "lsa_weight": 0.0}
+    assert cutoffs.applies_to({"lsa_components": 0, "lsa_weight": 0.0})
+    assert not cutoffs.applies_to(lsa)
+    assert cutoffs.excluded == {}
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from code_compactor import compact_code
+
+
+CODE = "\n".join(
+    [
+        "# " + "=" * 40,
+        "import os",
+        "",
+        "",
+        "",
+        "",
+        "def load(path):",
+        *[f"    # note {i}" for i in range(12)],
+        "    return open(path).read()",
+        "",
+    ]
+)
+
+
+def test_line_map_points_every_compacted_line_at_its_original() -> None:
+    compacted = compact_code(CODE, "python")
+    original = CODE.splitlines()
+    assert compacted.changed
+    assert len(compacted.line_map) == len(compacted.text.splitlines())
+    assert compacted.line_map == sorted(compacted.line_map)
+    for line, source in zip(compacted.text.splitlines(), compacted.line_map):
+        if line.strip() and "elided" not in line:
+            assert line == original[source - 1]
+
+
+def test_line_refs_are_restored_to_original_numbers() -> None:
+    compacted = compact_code(CODE, "python")
+    lines = compacted.text.splitlines()
+    ret = lines.index("    return open(path).read()") + 1
+    load = lines.index("def load(path):") + 1
+    restored = compacted.restore_line_refs(f"line {ret}: bare read; see lines {load}-{ret}")
+    assert restored == "line 20: bare read; see lines 7-20"
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from typing import List
+
+from code_segmenter import CodeSegment, split_code_segments
+
+
+def _assert_tiles(segments: List[CodeSegment], code: str, max_lines: int) -> None:
+    assert segments[0].start_line == 1
+    assert segments[-1].end_line == len(code.splitlines())
+    assert all(a.end_line + 1 == b.start_line for a, b in zip(segments, segments[1:]))
+    assert all(s.end_line - s.start_line + 1 <= max_lines for s in segments)
+
+
+def test_large_class_is_split_between_methods() -> None:
+    methods = [f"    def m{i}(self):\n" + "\n".join(f"        x{j} = {j}" for j in range(30)) for i in range(8)]
+    code = "import os\n\n\nclass Big:\n" + "\n".join(methods) + "\n"
+    segments = split_code_segments(code, "python", max_lines=100)
+
+    _assert_tiles(segments, code, 100)
+    assert len(segments) > 1
+    # Every method lands whole in one segment.
+    for i, method in enumerate(methods):
+        [owner] = [s for s in segments if f"Big.m{i}" in s.names]
+        assert method in owner.text
+
+
+def test_oversized_statement_is_cut_into_windows() -> None:
+    code = "x = 1\nfor i in range(3):\n" + "\n".join(f"    y{j} = {j}" for j in range(250)) + "\n"
+    segments = split_code_segments(code, "python", max_lines=100)
+
+    _assert_tiles(segments, code, 100)
+    assert len(segments) == 3
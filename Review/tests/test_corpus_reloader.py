@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from corpus_reloader import StandardsCorpusReloader
+from index_registry import StandardsIndexRegistry
+from standards_loader import load_standards_corpus
+from vector_store import StandardsVectorStore
+
+
+PYTHON_RULES = """# Python
+
+Rule ID: PY-1
+Scope: python
+
+- Use snake_case names.
+
+Rule ID: PY-2
+Scope: python
+
+- Avoid bare except clauses.
+"""
+
+JS_RULES = """# JavaScript
+
+Rule ID: JS-1
+Scope: javascript
+
+- Prefer const over let.
+"""
+
+
+def _reloader(tmp_path: Path) -> StandardsCorpusReloader:
+    (tmp_path / "python.md").write_text(PYTHON_RULES, encoding="utf-8")
+    (tmp_path / "js.md").write_text(JS_RULES, encoding="utf-8")
+    registry = StandardsIndexRegistry(load_standards_corpus(tmp_path), store_factory=StandardsVectorStore)
+    registry.warm()
+    return StandardsCorpusReloader(tmp_path, registry)
+
+
+def test_reload_diffs_rules_and_refits_only_touched_groups(tmp_path: Path) -> None:
+    reloader = _reloader(tmp_path)
+    js_store = reloader.registry.store_for_language("javascript")
+    python_store = reloader.registry.store_for_language("python")
+
+    text = PYTHON_RULES.replace("Avoid bare except clauses.", "Catch specific exceptions.")
+    (tmp_path / "python.md").write_text(text.replace("Rule ID: PY-1", "Rule ID: PY-3"), encoding="utf-8")
+    report = reloader.reload()
+
+    assert report.changed_files == ["python.md"]
+    assert (report.added, report.updated, report.removed) == (["PY-3"], ["PY-2"], ["PY-1"])
+    assert (report.refitted_stores, report.reused_stores) == (1, 1)
+    assert reloader.registry.store_for_language("javascript") is js_store
+    assert reloader.registry.store_for_language("python") is not python_store
+    assert reloader.reload().changed is False
+
+
+def test_global_rule_edit_refits_every_group(tmp_path: Path) -> None:
+    reloader = _reloader(tmp_path)
+    (tmp_path / "global.md").write_text("Rule ID: ALL-1\nScope: all-languages\n\n- Keep functions short.\n")
+    report = reloader.reload()
+
+    assert report.added == ["ALL-1"]
+    assert report.reused_stores == 0
+    assert report.refitted_stores == len(reloader.registry.language_groups())
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+import diff_review
+from models import DiffReviewRequest, ReviewIssue, ReviewRequest, ReviewResponse
+from static_checks import check_bare_except, static_review
+
+
+DIFF = """\
+diff --git a/m.py b/m.py
+--- a/m.py
++++ b/m.py
+@@ -1,5 +1,6 @@
+ x = 1
++y = 2
+ try:
+     run()
+ except:
+     pass
+"""
+
+
+@pytest.fixture(autouse=True)
+def local_checks_only(monkeypatch: pytest.MonkeyPatch) -> None:
+    def review(request: ReviewRequest, *args, **kwargs) -> ReviewResponse:
+        result = check_bare_except(request.code, request.language)
+        assert result is not None
+        return static_review([result])
+
+    monkeypatch.setattr(diff_review, "run_rag_review", review)
+
+
+def test_issues_on_context_lines_are_dropped() -> None:
+    response = diff_review.run_diff_review(DiffReviewRequest(diff=DIFF, language="python"), [])
+    assert response.issues == []
+    assert response.verdict == "approve"
+
+
+def test_issues_on_changed_lines_point_at_new_file_lines() -> None:
+    diff = DIFF.replace(" except:\n", "+except:\n").replace("@@ -1,5 +1,6 @@", "@@ -1,4 +1,6 @@")
+    response = diff_review.run_diff_review(DiffReviewRequest(diff=diff, language="python"), [])
+    assert [issue.rule_ids for issue in response.issues] == [["PY-ERROR-001"]]
+    assert response.issues[0].affected_code == "m.py:5: except:"
+    assert response.verdict == "request_changes"
+
+
+def test_segment_labels_do_not_hide_line_refs() -> None:
+    hunk = diff_review.DiffHunk(path="m.py", new_start=10, lines=["x = 1", "try:", "    run()", "except:"], changed=[False, False, False, True])
+    issue = ReviewIssue(id="ISSUE-1", severity="major", description="d", affected_code="lines 1-4 (run): line 4: except:")
+    assert diff_review._snippet_line(issue, hunk) == (4, "except:")
+    kept, dropped = diff_review._changed_issues(ReviewResponse(verdict="request_changes", summary="", issues=[issue]), hunk)
+    assert [label for _, label in kept] == ["m.py:13"] and not dropped
+
+
+def test_async_diff_review_matches_sync(monkeypatch: pytest.MonkeyPatch) -> None:
+    async def review(request: ReviewRequest, *args, **kwargs) -> ReviewResponse:
+        return diff_review.run_rag_review(request)
+
+    monkeypatch.setattr(diff_review, "arun_rag_review", review)
+    diff = DIFF.replace(" except:\n", "+except:\n").replace("@@ -1,5 +1,6 @@", "@@ -1,4 +1,6 @@")
+    request = DiffReviewRequest(diff=diff, language="python")
+    assert asyncio.run(diff_review.arun_diff_review(request, [])) == diff_review.run_diff_review(request, [])
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import index_registry
+from index_artifact import build_index_artifact, load_index_artifact
+
+
+STANDARDS_DIR = Path(__file__).resolve().parent.parent / "standards"
+
+
+@pytest.mark.parametrize(
+    "setting, value",
+    [("LSA_COMPONENTS", 16), ("LSA_WEIGHT", 0.5), ("ANN_MIN_RULES", 1), ("ANN_BITS", 8), ("ANN_DENSITY", 0.5)],
+)
+def test_artifact_is_rejected_when_index_settings_change(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, setting: str, value: float
+) -> None:
+    index_dir = tmp_path / "index"
+    build_index_artifact(STANDARDS_DIR, index_dir)
+    assert load_index_artifact(index_dir) is not None
+
+    monkeypatch.setattr(index_registry, setting, value)
+    assert load_index_artifact(index_dir) is None
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import batch_review
+import rag_pipeline
+from citation_feedback import RetrievalCutoffs
+from index_registry import StandardsIndexRegistry, score_settings
+from models import ReviewIssue, ReviewRequest, ReviewResponse
+from rag_pipeline import retrieve_relevant_rules
+from standards_loader import load_standards_corpus
+from static_checks import checks_fully
+
+
+STANDARDS_DIR = Path(__file__).resolve().parent.parent / "standards"
+REQUEST = ReviewRequest(language="python", code="def loadUser(id):\n    try:\n        return db[id]\n    except:\n        pass\n")
+
+
+def test_cosine_cutoffs_do_not_apply_to_bm25_scores() -> None:
+    chunks = load_standards_corpus(STANDARDS_DIR)
+    # Far above any cosine similarity, and above typical BM25 scores too.
+    cutoffs = RetrievalCutoffs(rules={"python": {chunk.rule_id: 50.0 for chunk in chunks}}, settings=score_settings())
+
+    tfidf = retrieve_relevant_rules(REQUEST, chunks, retriever="tfidf", cutoffs=cutoffs)
+    bm25 = retrieve_relevant_rules(REQUEST, chunks, retriever="bm25", cutoffs=cutoffs)
+
+    assert all(checks_fully(chunk.rule_id) for chunk in tfidf)
+    assert bm25 and not all(checks_fully(chunk.rule_id) for chunk in bm25)
+
+    other_scale = RetrievalCutoffs(rules=cutoffs.rules, settings={**score_settings(), "lsa_components": 64})
+    unfiltered = retrieve_relevant_rules(REQUEST, chunks, retriever="tfidf")
+    assert retrieve_relevant_rules(REQUEST, chunks, retriever="tfidf", cutoffs=other_scale) == unfiltered
+
+
+def test_streaming_fans_out_by_facet(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(rag_pipeline, "FANOUT_LIMIT", 3)
+    calls: list[list[str]] = []
+
+    def review(**kwargs) -> ReviewResponse:
+        rule_ids = [chunk.rule_id for chunk in kwargs["chunks"]]
+        calls.append(rule_ids)
+        issue = ReviewIssue(id="ISSUE-1", severity="nit", description=f"Part {len(calls)}.", rule_ids=rule_ids[:1])
+        return ReviewResponse(verdict="approve_with_nits", summary="", issues=[issue])
+
+    monkeypatch.setattr(rag_pipeline, "generate_review_with_llm", review)
+    code = "import os\n\n\ndef loadUser(id):\n    # fetch\n    try:\n        return db[id]\n    except:\n        pass\n"
+    request = ReviewRequest(language="python", code=code)
+    events = list(rag_pipeline.stream_rag_review(request, load_standards_corpus(STANDARDS_DIR)))
+
+    assert len(calls) > 1
+    complete = events[-1].value
+    assert events[-1].kind == "complete"
+    parts = sorted(issue.description for issue in complete.issues if issue.description.startswith("Part "))
+    assert parts == [f"Part {n}." for n in range(1, len(calls) + 1)]
+    assert [e.value for e in events if e.kind == "issue"] == complete.issues
+
+
+def test_segment_line_refs_point_at_whole_file_lines(monkeypatch: pytest.MonkeyPatch) -> None:
+    lines = []
+    for n in range(30):
+        body = [f"    step_{i} = payload + {i}" for i in range(7)]
+        lines += [f"def handler_{n}(payload):", *body, "    return step_6", ""]
+    lines[149] = "    return eval(payload)"
+    code = "\n".join(lines)
+    assert code.count("\n") + 1 == 300
+
+    def review(**kwargs) -> ReviewResponse:
+        issues = []
+        for lineno, line in enumerate(kwargs["code"].splitlines(), start=1):
+            if "eval(" in line:
+                issue = ReviewIssue(id="ISSUE-1", severity="major", description="eval on input.", affected_code=f"line {lineno}: {line.strip()}")
+                issues.append(issue)
+        return ReviewResponse(verdict="request_changes" if issues else "approve", summary="", issues=issues)
+
+    monkeypatch.setattr(rag_pipeline, "generate_review_with_llm", review)
+    response = rag_pipeline.run_rag_review(ReviewRequest(language="python", code=code), load_standards_corpus(STANDARDS_DIR))
+
+    flagged = [issue for issue in response.issues if issue.description == "eval on input."]
+    assert len(flagged) == 1
+    assert "line 150: return eval(payload)" in flagged[0].affected_code
+    assert batch_review.issue_region(flagged[0].affected_code) == {"startLine": 150}
+
+
+def test_stable_guidelines_leave_out_fully_checked_rules() -> None:
+    registry = StandardsIndexRegistry(load_standards_corpus(STANDARDS_DIR))
+    block = registry.stable_guidelines("python")
+    in_scope = [chunk.rule_id for chunk in registry.chunks_for_language("python")]
+
+    assert block is not None
+    assert any(checks_fully(rule_id) for rule_id in in_scope)
+    for rule_id in in_scope:
+        assert (rule_id in block) != checks_fully(rule_id)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+from bm25_store import BM25Store
+from retrieval_batcher import RetrievalBatcher
+from standards_loader import load_standards_corpus
+from vector_store import RetrievedRule, StandardsVectorStore
+
+
+STANDARDS_DIR = Path(__file__).resolve().parent.parent / "standards"
+PREFIXES = ["naming: ", "errors: ", "security: "]
+CODE = "def loadUser(id):\n    try:\n        return db.query(id)\n    except:\n        pass\n"
+
+
+def _store(ann: bool = False) -> StandardsVectorStore:
+    store = StandardsVectorStore()
+    store.fit(load_standards_corpus(STANDARDS_DIR))
+    if ann:
+        store.enable_ann(n_tables=4, n_bits=4)
+    return store
+
+
+def _ids(results: List[List[RetrievedRule]]) -> List[List[Tuple[str, float]]]:
+    return [[(r.chunk.rule_id, round(r.score, 12)) for r in rows] for rows in results]
+
+
+def _concurrently(batcher: RetrievalBatcher, calls: List[tuple]) -> List[List[List[RetrievedRule]]]:
+    """
+    Submit every (store, top_k, exact) call at once from its own thread.
+    """
+    barrier = threading.Barrier(len(calls))
+
+    def call(args: tuple) -> List[List[RetrievedRule]]:
+        store, top_k, exact = args
+        barrier.wait()
+        return batcher.query_batch(store, PREFIXES, shared_text=CODE, top_k=top_k, exact=exact)
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(call, calls))
+
+
+def test_batched_results_match_direct_queries() -> None:
+    store = _store(ann=True)
+    calls = [(store, top_k, exact) for top_k in (1, 3, 8, 0, -1) for exact in (False, True)]
+    batcher = RetrievalBatcher(window_ms=200)
+    try:
+        results = _concurrently(batcher, calls)
+    finally:
+        batcher.close()
+
+    for (_, top_k, exact), got in zip(calls, results):
+        assert _ids(got) == _ids(store.query_batch(PREFIXES, shared_text=CODE, top_k=top_k, exact=exact))
+    assert batcher.stats.requests == len(calls)
+    assert batcher.stats.batches < len(calls)
+
+
+def test_batches_rank_once_per_store_and_exactness(monkeypatch: pytest.MonkeyPatch) -> None:
+    first, second = _store(ann=True), _store(ann=True)
+    ranked: List[Tuple[int, int, int, bool]] = []
+    for store in (first, second):
+        rank = store.rank
+
+        def spy(query_matrix, top_k=8, exact=False, store=store, rank=rank):
+            ranked.append((id(store), query_matrix.shape[0], top_k, exact))
+            return rank(query_matrix, top_k, exact)
+
+        monkeypatch.setattr(store, "rank", spy)
+
+    calls = [(first, 2, False), (first, 5, False), (first, 4, True), (second, 3, False), (second, 6, False)]
+    batcher = RetrievalBatcher(window_ms=500)
+    try:
+        _concurrently(batcher, calls)
+    finally:
+        batcher.close()
+
+    assert batcher.stats.batches == 1
+    assert sorted(ranked) == sorted(
+        [
+            (id(first), 2 * len(PREFIXES), 5, False),
+            (id(first), len(PREFIXES), 4, True),
+            (id(second), 2 * len(PREFIXES), 6, False),
+        ]
+    )
+
+
+def test_rank_errors_reach_every_waiter(monkeypatch: pytest.MonkeyPatch) -> None:
+    store = _store()
+
+    def fail(*args, **kwargs):
+        raise ValueError("index corrupted")
+
+    monkeypatch.setattr(store, "rank", fail)
+    batcher = RetrievalBatcher(window_ms=200)
+    barrier = threading.Barrier(3)
+
+    def call(top_k: int) -> BaseException | None:
+        barrier.wait()
+        try:
+            batcher.query_batch(store, PREFIXES, shared_text=CODE, top_k=top_k)
+        except ValueError as exc:
+            return exc
+        return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            errors = list(pool.map(call, (2, 4, 0)))
+        assert [str(exc) for exc in errors] == ["index corrupted"] * 3
+        # The worker survives a failed batch.
+        monkeypatch.undo()
+        assert batcher.query_batch(store, PREFIXES, shared_text=CODE, top_k=2)
+    finally:
+        batcher.close()
+
+
+def test_other_backends_bypass_the_batcher() -> None:
+    store = BM25Store()
+    store.fit(load_standards_corpus(STANDARDS_DIR))
+    batcher = RetrievalBatcher()
+    got = batcher.query_batch(store, PREFIXES, shared_text=CODE, top_k=3)
+    assert _ids(got) == _ids(store.query_batch(PREFIXES, shared_text=CODE, top_k=3))
+    assert batcher.stats.batches == 0
+
+
+def test_close_stops_the_worker_and_rejects_new_queries() -> None:
+    store = _store()
+    batcher = RetrievalBatcher(window_ms=1)
+    assert batcher.query_batch(store, PREFIXES, shared_text=CODE, top_k=2)
+    worker = batcher._worker
+    batcher.close()
+
+    assert worker is not None and not worker.is_alive()
+    with pytest.raises(RuntimeError):
+        batcher.query_batch(store, PREFIXES, shared_text=CODE, top_k=2)
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from review_cache import normalize_code, review_cache_key
+
+
+def _key(code: str) -> str:
+    return review_cache_key("python", code, None, [], "model", "v1")
+
+
+def test_whitespace_only_differences_share_a_key() -> None:
+    assert normalize_code("x = 1  \r\ny = 2\t\r\n\n  \n") == "x = 1\ny = 2"
+    assert _key("x = 1\ny = 2\n") == _key("x = 1   \r\ny = 2\r\n\r\n")
+
+
+def test_leading_blank_lines_keep_line_numbers() -> None:
+    assert normalize_code("\n\nx = 1\n") == "\n\nx = 1"
+    assert _key("\n\nexcept_line = 3\n") != _key("except_line = 3\n")
+
+
+def test_compaction_threshold_is_part_of_the_key() -> None:
+    key = review_cache_key("python", "x = 1\n", None, [], "model", "v1", compact_min_lines=80)
+    assert key != review_cache_key("python", "x = 1\n", None, [], "model", "v1", compact_min_lines=0)
+
+
+def test_key_covers_shared_guideline_block() -> None:
+    key = review_cache_key("python", "x = 1\n", None, [], "model", "v1", shared_guidelines="[PY-1] a")
+    assert key != review_cache_key("python", "x = 1\n", None, [], "model", "v1", shared_guidelines="[PY-1] b")
+    assert key != review_cache_key("python", "x = 1\n", None, [], "model", "v1")
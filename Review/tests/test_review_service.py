@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Callable, List
+
+import httpx
+import pytest
+
+import review_service
+from models import DiffReviewRequest, ReviewRequest, ReviewResponse
+from review_cache import ReviewCache
+from tenant_indexes import TenantIndexCache
+
+
+BODY = {"language": "python", "code": "def f(x):\n    return x * 2\n"}
+APPROVE = ReviewResponse(verdict="approve", summary="Fine.")
+
+
+@pytest.fixture(autouse=True)
+def local_metrics_sources(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    cache = ReviewCache()
+    tenants = TenantIndexCache(tmp_path, lambda: None)  # type: ignore[arg-type, return-value]
+    monkeypatch.setattr(review_service, "get_review_cache", lambda: cache)
+    monkeypatch.setattr(review_service, "get_tenant_indexes", lambda: tenants)
+
+
+class GatedReview:
+    """
+    Fake review that records its calls and blocks until `gate` is set.
+    """
+
+    def __init__(self) -> None:
+        self.gate = asyncio.Event()
+        self.calls: List[ReviewRequest | DiffReviewRequest] = []
+
+    async def __call__(self, request: ReviewRequest | DiffReviewRequest) -> ReviewResponse:
+        self.calls.append(request)
+        await self.gate.wait()
+        return APPROVE
+
+
+async def _wait_for(condition: Callable[[], bool]) -> None:
+    for _ in range(1000):
+        if condition():
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError("condition not reached")
+
+
+def _run(service: review_service.ReviewService, scenario: Callable[[httpx.AsyncClient], Awaitable[None]]) -> None:
+    async def main() -> None:
+        transport = httpx.ASGITransport(app=service)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await scenario(client)
+
+    asyncio.run(main())
+
+
+def test_identical_requests_share_one_review() -> None:
+    review = GatedReview()
+    service = review_service.ReviewService(review=review, review_diff=review)
+
+    async def scenario(client: httpx.AsyncClient) -> None:
+        posts = [asyncio.ensure_future(client.post("/review", json=BODY)) for _ in range(5)]
+        await _wait_for(lambda: len(review.calls) == 1)
+        await asyncio.sleep(0.01)
+        review.gate.set()
+        responses = await asyncio.gather(*posts)
+        assert [r.status_code for r in responses] == [200] * 5
+        assert {r.json()["verdict"] for r in responses} == {"approve"}
+
+    _run(service, scenario)
+    assert len(review.calls) == 1
+    assert service.metrics.reviews_started == 1
+    assert service.metrics.reviews_coalesced == 4
+
+
+def test_disconnected_caller_does_not_cancel_shared_review() -> None:
+    review = GatedReview()
+    service = review_service.ReviewService(review=review, review_diff=review)
+
+    async def scenario(client: httpx.AsyncClient) -> None:
+        first = asyncio.ensure_future(client.post("/review", json=BODY))
+        await _wait_for(lambda: len(review.calls) == 1)
+        second = asyncio.ensure_future(client.post("/review", json=BODY))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        review.gate.set()
+        response = await second
+        assert response.status_code == 200
+
+    _run(service, scenario)
+    assert len(review.calls) == 1
+    assert service.metrics.reviews_coalesced == 1
+
+
+def test_full_queue_answers_503() -> None:
+    review = GatedReview()
+    service = review_service.ReviewService(review=review, review_diff=review, max_concurrency=1, max_queue=1)
+
+    async def scenario(client: httpx.AsyncClient) -> None:
+        running = asyncio.ensure_future(client.post("/review", json={**BODY, "context": "a"}))
+        await _wait_for(lambda: service.admission.active == 1)
+        queued = asyncio.ensure_future(client.post("/review", json={**BODY, "context": "b"}))
+        await _wait_for(lambda: service.admission.waiting == 1)
+
+        rejected = await client.post("/review", json={**BODY, "context": "c"})
+        assert rejected.status_code == 503
+        assert rejected.headers["retry-after"] == "1"
+
+        review.gate.set()
+        assert [r.status_code for r in await asyncio.gather(running, queued)] == [200, 200]
+
+    _run(service, scenario)
+    assert len(review.calls) == 2
+    assert service.metrics.reviews_rejected == 1
+
+
+def test_diff_reviews_use_the_async_diff_pipeline() -> None:
+    review = GatedReview()
+    review.gate.set()
+    service = review_service.ReviewService(review=review, review_diff=review)
+
+    async def scenario(client: httpx.AsyncClient) -> None:
+        response = await client.post("/review/diff", json={"diff": "", "language": "python"})
+        assert response.status_code == 200
+
+    _run(service, scenario)
+    assert [type(request) for request in review.calls] == [DiffReviewRequest]
+
+
+def test_metrics_report_service_counters() -> None:
+    review = GatedReview()
+    review.gate.set()
+    service = review_service.ReviewService(review=review, review_diff=review)
+
+    async def scenario(client: httpx.AsyncClient) -> None:
+        await client.post("/review", json=BODY)
+        await client.post("/review", content=b"{}")
+        metrics = await client.get("/metrics")
+        assert metrics.status_code == 200
+        lines = set(metrics.text.splitlines())
+        assert "codesensei_http_requests_total 3" in lines
+        assert "codesensei_reviews_started_total 1" in lines
+        assert "codesensei_review_seconds_count 1" in lines
+        assert "codesensei_reviews_rejected_total 0" in lines
+        assert "# TYPE codesensei_reviews_in_flight gauge" in lines
+
+    _run(service, scenario)
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+import random
+from typing import Any, List
+
+import pytest
+
+from models import PositiveFeedbackItem, ReviewIssue, ReviewResponse
+from review_stream import IncrementalObjectParser, parse_review_stream
+
+
+RESPONSE = ReviewResponse(
+    verdict="request_changes",
+    summary='Two problems: a "bare" except, and {braces} / [brackets] in "strings" \\ that close nothing.',
+    positive_feedback=[
+        PositiveFeedbackItem(message="Clear names like `load_user` }", rule_ids=["PY-NAMING-001"]),
+        PositiveFeedbackItem(message='Docstring quotes \\"are\\" fine ]'),
+    ],
+    issues=[
+        ReviewIssue(
+            id="ISSUE-1",
+            severity="major",
+            description='Bare `except:` at line 4 hides errors: {"a": [1, 2]}',
+            affected_code="line 4: except:\n    pass",
+            rule_ids=["PY-ERROR-001"],
+        ),
+        ReviewIssue(id="ISSUE-2", severity="nit", description="Unicode é ✓ and a tab\tstay intact.", affected_code=None),
+    ],
+)
+
+
+def _payloads() -> List[str]:
+    data = RESPONSE.model_dump_json()
+    pretty = json.dumps(json.loads(data), indent=2, ensure_ascii=True)
+    return [data, pretty, f"```json\n{pretty}\n```"]
+
+
+def _random_pieces(text: str, rng: random.Random) -> List[str]:
+    pieces: List[str] = []
+    i = 0
+    while i < len(text):
+        step = rng.choice([1, 1, 2, 3, 7, 16, 64])
+        pieces.append(text[i : i + step])
+        i += step
+    return pieces
+
+
+def _expected_events(data: dict) -> List[tuple[str, Any]]:
+    events: List[tuple[str, Any]] = []
+    for key, value in data.items():
+        if key in ("verdict", "summary"):
+            events.append((key, value))
+        elif key == "positive_feedback":
+            events += [("positive_feedback", PositiveFeedbackItem.model_validate(item)) for item in value]
+        elif key == "issues":
+            events += [("issue", ReviewIssue.model_validate(item)) for item in value]
+    return events
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_random_chunk_splits_yield_the_same_events(seed: int) -> None:
+    rng = random.Random(seed)
+    for payload in _payloads():
+        whole = json.loads(payload.removeprefix("```json\n").removesuffix("\n```"))
+        events = list(parse_review_stream(_random_pieces(payload, rng)))
+
+        assert [(e.kind, e.value) for e in events[:-1]] == _expected_events(whole)
+        assert events[-1].kind == "complete"
+        assert events[-1].value == ReviewResponse.model_validate(whole)
+        assert events[-1].value == RESPONSE
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_parser_members_and_elements_match_json_loads(seed: int) -> None:
+    rng = random.Random(seed)
+    payload = json.dumps({"n": -1.5e3, "ok": True, "none": None, "s": "a\\\"}]", "list": [1, "x]", {"k": [2]}, False], "o": {"x": "}"}})
+    parser = IncrementalObjectParser()
+    members = {}
+    elements: List[Any] = []
+    for piece in _random_pieces(payload + " trailing", rng):
+        for key, value, is_element in parser.feed(piece):
+            if is_element:
+                elements.append(value)
+            else:
+                members[key] = value
+
+    whole = json.loads(payload)
+    assert parser.done
+    assert json.loads(parser.object_text) == whole
+    assert members == whole
+    assert elements == whole["list"]
@@ -0,0 +1,10 @@
+from __future__ import annotations
+
+from standards_loader import CompactCorpus
+
+
+def test_concat_matches_building_from_all_rows() -> None:
+    first = [("A-1", "python", "a.md", "A", "one"), ("A-2", "all-languages", "a.md", "A", "two")]
+    second = [("B-1", "all-languages", "b.md", "B", "three"), ("B-2", "python", "b.md", "B", "")]
+    parts = [CompactCorpus.from_rows(first), CompactCorpus.from_rows([]), CompactCorpus.from_rows(second)]
+    assert CompactCorpus.concat(parts).to_chunks() == CompactCorpus.from_rows(first + second).to_chunks()
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from models import StandardsChunk
+from static_checks import check_bare_except, run_static_checks
+
+
+def _chunk(rule_id: str) -> StandardsChunk:
+    return StandardsChunk(rule_id=rule_id, scope="python", doc_name="test", section_title="", text=rule_id)
+
+
+def test_broad_except_that_swallows_errors_is_flagged() -> None:
+    result = check_bare_except("try:\n    run()\nexcept Exception:\n    pass\n", "python")
+    assert result is not None
+    assert [issue.affected_code for issue in result.issues] == ["line 3: except Exception:"]
+    assert result.positive is None
+
+
+def test_broad_except_that_logs_or_reraises_passes() -> None:
+    code = (
+        "try:\n    run()\nexcept Exception:\n    log.exception('failed')\n"
+        "try:\n    run()\nexcept (ValueError, BaseException) as exc:\n    raise RuntimeError() from exc\n"
+    )
+    result = check_bare_except(code, "python")
+    assert result is not None
+    assert result.issues == []
+    assert result.positive is not None
+
+
+def test_partial_checkers_keep_their_rule_for_the_llm() -> None:
+    chunks = [_chunk("PY-ERROR-001"), _chunk("PY-NAMING-001"), _chunk("PY-STRUCTURE-001")]
+    results, remaining = run_static_checks("import os\n\n\ndef run():\n    pass\n", "python", chunks)
+    assert [r.rule_id for r in results] == ["PY-ERROR-001", "PY-NAMING-001", "PY-STRUCTURE-001"]
+    assert [c.rule_id for c in remaining] == ["PY-NAMING-001", "PY-STRUCTURE-001"]
+    assert all(r.positive is None for r in results)
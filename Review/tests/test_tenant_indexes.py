@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from index_registry import StandardsIndexRegistry
+from standards_loader import load_standards_corpus
+from tenant_indexes import TenantIndexCache, TenantIndexRegistry
+from vector_store import LayeredVectorStore, StandardsVectorStore
+
+
+STANDARDS_DIR = Path(__file__).resolve().parent.parent / "standards"
+OVERRIDE = "- Bare except clauses are allowed only in the quarterly ledger reconciliation jobs.\n"
+
+
+def _write_tenant(tenants_dir: Path, name: str, rules: dict[str, str]) -> None:
+    path = tenants_dir / name
+    path.mkdir(parents=True)
+    body = "".join(f"Rule ID: {rule_id}  \nScope: python\n\n{text}\n" for rule_id, text in rules.items())
+    (path / "house_rules.md").write_text(f"# {name} house rules\n\n{body}", encoding="utf-8")
+
+
+def _tenant_rules(name: str) -> dict[str, str]:
+    return {f"{name.upper()}-PY-00{i}": f"- Wrap {name} ledger calls {i} in the reconciliation retry helper.\n" for i in range(3)}
+
+
+@pytest.fixture
+def base() -> StandardsIndexRegistry:
+    return StandardsIndexRegistry(load_standards_corpus(STANDARDS_DIR), store_factory=StandardsVectorStore)
+
+
+def test_least_recently_used_tenants_are_evicted_past_the_byte_bound(base: StandardsIndexRegistry, tmp_path: Path) -> None:
+    for name in ("acme", "bravo", "corex"):
+        _write_tenant(tmp_path, name, _tenant_rules(name))
+    one = TenantIndexCache(tmp_path, lambda: base)
+    one.get("acme")
+    size = one.stats.resident_bytes
+
+    cache = TenantIndexCache(tmp_path, lambda: base, max_bytes=int(size * 2.5))
+    acme = cache.get("acme")
+    cache.get("bravo")
+    assert cache.get("acme") is acme  # now more recently used than bravo
+    cache.get("corex")
+
+    stats = cache.stats
+    assert (stats.loads, stats.hits, stats.evictions, stats.resident) == (3, 1, 1, 2)
+    assert stats.resident_bytes <= cache.max_bytes
+    assert cache.get("acme") is acme
+    assert cache.stats.loads == 3
+    cache.get("bravo")
+    assert cache.stats.loads == 4
+
+
+def test_tenants_are_rebuilt_over_a_new_base(base: StandardsIndexRegistry, tmp_path: Path) -> None:
+    _write_tenant(tmp_path, "acme", _tenant_rules("acme"))
+    current = [base]
+    cache = TenantIndexCache(tmp_path, lambda: current[0])
+    first = cache.get("acme")
+    assert cache.get("acme") is first
+
+    current[0] = base.with_chunks(base.chunks[:-1])
+    second = cache.get("acme")
+    assert second is not first
+    assert second.base is current[0]
+    assert cache.stats.loads == 2
+
+
+def test_concurrent_gets_share_one_load(base: StandardsIndexRegistry, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _write_tenant(tmp_path, "acme", _tenant_rules("acme"))
+    cache = TenantIndexCache(tmp_path, lambda: base)
+    started = threading.Event()
+    release = threading.Event()
+    load = cache._load
+    loads = []
+
+    def slow_load(name: str, registry: StandardsIndexRegistry) -> TenantIndexRegistry:
+        loads.append(name)
+        started.set()
+        release.wait()
+        return load(name, registry)
+
+    monkeypatch.setattr(cache, "_load", slow_load)
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(cache.get, "acme")]
+        started.wait()
+        futures += [pool.submit(cache.get, "acme") for _ in range(4)]
+        release.set()
+        registries = [future.result() for future in futures]
+
+    assert loads == ["acme"]
+    assert all(registry is registries[0] for registry in registries)
+
+
+def test_overridden_base_rule_never_matches(base: StandardsIndexRegistry, tmp_path: Path) -> None:
+    _write_tenant(tmp_path, "acme", {"PY-ERROR-001": OVERRIDE})
+    tenant = TenantIndexCache(tmp_path, lambda: base).get("acme")
+    original = next(chunk for chunk in base.chunks if chunk.rule_id == "PY-ERROR-001")
+
+    assert [c.text for c in tenant.chunks_for_language("python") if c.rule_id == "PY-ERROR-001"] == [OVERRIDE.strip()]
+    store = tenant.store_for_language("python")
+    assert store is not None
+    # Asking with the base rule's own text must still only find the tenant's version.
+    for rows in (store.query(original.text, top_k=0), *store.query_batch(["errors: "], original.text, top_k=0)):
+        matches = [r for r in rows if r.chunk.rule_id == "PY-ERROR-001"]
+        assert [r.chunk.text for r in matches] == [OVERRIDE.strip()]
+
+
+def test_layered_scores_are_cosines_over_the_combined_vocabulary(base: StandardsIndexRegistry, tmp_path: Path) -> None:
+    _write_tenant(tmp_path, "acme", {"PY-ERROR-001": OVERRIDE, **_tenant_rules("acme")})
+    tenant = TenantIndexCache(tmp_path, lambda: base).get("acme")
+    store = tenant.store_for_language("python")
+    base_store = base.store_for_language("python")
+    assert isinstance(store, LayeredVectorStore) and base_store is not None
+
+    # A store refitted over base + tenant rules, keeping the base IDF for base terms.
+    vocabulary, idf, _ = base_store.to_arrays()
+    tenant_texts = [c.text for c in tenant.tenant_chunks]
+    local = TfidfVectorizer(stop_words="english", norm=None).fit(tenant_texts)
+    extra = sorted(t for t in local.vocabulary_ if t not in vocabulary)
+    combined = TfidfVectorizer(stop_words="english", vocabulary={**vocabulary, **{t: len(vocabulary) + i for i, t in enumerate(extra)}})
+    combined.idf_ = np.concatenate([idf, local.idf_[[local.vocabulary_[t] for t in extra]]])
+
+    rules = tenant.chunks_for_language("python")
+    query = "def reconcile_ledger(rows):\n    # log specific exception types, snake_case names\n    try:\n        retry(rows)\n    except Exception:\n        raise\n"
+    expected = (combined.transform([query]) @ combined.transform([c.text for c in rules]).T).toarray()[0]
+    expected_by_rule = dict(zip((c.rule_id for c in rules), expected))
+
+    got = {r.chunk.rule_id: r.score for r in store.query(query, top_k=0)}
+    # Rules with no shared terms score zero and are not returned.
+    assert set(got) == {rule_id for rule_id, score in expected_by_rule.items() if score > 0}
+    assert any(not rule_id.startswith("ACME-") for rule_id in got)
+    for rule_id, score in got.items():
+        assert score == pytest.approx(expected_by_rule[rule_id], abs=1e-9)
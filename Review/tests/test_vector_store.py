@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+import pytest
+
+import code_features
+from bm25_store import BM25Store, tokenize_code
+from models import ReviewRequest
+from rag_pipeline import infer_review_facets
+from standards_loader import filter_chunks_for_language, load_standards_corpus
+from vector_store import StandardsRetriever, StandardsVectorStore
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STANDARDS_DIR = BASE_DIR / "standards"
+GOLDEN = json.loads((BASE_DIR / "benchmark_golden.json").read_text(encoding="utf-8"))
+
+STORES: dict[str, Callable[[], StandardsRetriever]] = {
+    "tfidf": lambda: StandardsVectorStore(lsa_components=0),
+    "tfidf+lsa": lambda: StandardsVectorStore(lsa_components=64),
+    "bm25": BM25Store,
+}
+
+
+def _facet_queries(case: dict) -> tuple[List[str], str]:
+    """
+    The facet prefixes and shared code excerpt retrieval builds for a golden case.
+    """
+    request = ReviewRequest(language=case["language"], code=case["code"], context=case["context"] or None)
+    features = code_features.extract_features(request.code, request.language)
+    prefixes = [
+        f"Language: {request.language}\nFacet: {facet}\n\nCode snippet:\n"
+        for facet in infer_review_facets(request, features)
+    ]
+    return prefixes, code_features.salient_excerpt(request.code, features, max_chars=600)
+
+
+@pytest.mark.parametrize("backend", sorted(STORES))
+@pytest.mark.parametrize("top_k", [5, 0])
+def test_batched_facet_queries_match_per_facet_queries(backend: str, top_k: int) -> None:
+    chunks = load_standards_corpus(STANDARDS_DIR)
+    for case in GOLDEN:
+        store = STORES[backend]()
+        store.fit(filter_chunks_for_language(chunks, case["language"]))
+        prefixes, excerpt = _facet_queries(case)
+
+        batched = store.query_batch(prefixes, shared_text=excerpt, top_k=top_k)
+        looped = [store.query(prefix + excerpt, top_k=top_k) for prefix in prefixes]
+
+        assert len(batched) == len(prefixes)
+        for got, want in zip(batched, looped):
+            # LSA embeddings and BM25 impacts are float32, so a rule scoring
+            # zero on one path may score +-1e-9 on the other.
+            got_scores = {r.chunk.rule_id: r.score for r in got}
+            want_scores = {r.chunk.rule_id: r.score for r in want}
+            for rule_id in got_scores.keys() | want_scores.keys():
+                assert got_scores.get(rule_id, 0.0) == pytest.approx(want_scores.get(rule_id, 0.0), rel=1e-6, abs=1e-7)
+            assert [r.chunk.rule_id for r in got if r.score > 1e-6] == [r.chunk.rule_id for r in want if r.score > 1e-6], case["name"]
+
+
+def test_encoded_batch_rows_match_single_query_vectors() -> None:
+    chunks = load_standards_corpus(STANDARDS_DIR)
+    for case in GOLDEN:
+        store = StandardsVectorStore(lsa_components=0)
+        store.fit(filter_chunks_for_language(chunks, case["language"]))
+        prefixes, excerpt = _facet_queries(case)
+
+        rows = store.encode_batch(prefixes, excerpt).toarray()
+        single = np.vstack([store.encode(prefix + excerpt).toarray() for prefix in prefixes])
+        # `encode` normalizes, `encode_batch` leaves that to ranking.
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        assert rows / np.where(norms == 0, 1, norms) == pytest.approx(single, abs=1e-12)
+
+
+def test_bm25_scores_match_dense_reference() -> None:
+    chunks = filter_chunks_for_language(load_standards_corpus(STANDARDS_DIR), "python")
+    store = BM25Store()
+    store.fit(chunks)
+    query = "def loadUser(id):\n    try:\n        return db.query(id)\n    except:\n        pass\n"
+
+    docs = [Counter(tokenize_code(c.text)) for c in chunks]
+    lengths = np.array([sum(d.values()) for d in docs], dtype=float)
+    expected = np.zeros(len(chunks))
+    for term, qtf in Counter(tokenize_code(query)).items():
+        df = sum(term in d for d in docs)
+        if not df:
+            continue
+        idf = np.log1p((len(docs) - df + 0.5) / (df + 0.5))
+        tf = np.array([d[term] for d in docs], dtype=float)
+        expected += qtf * idf * tf * (store.k1 + 1) / (tf + store.k1 * (1 - store.b + store.b * lengths / lengths.mean()))
+
+    got = {r.chunk.rule_id: r.score for r in store.query(query, top_k=0)}
+    assert set(got) == {c.rule_id for c, score in zip(chunks, expected) if score > 0}
+    for chunk, score in zip(chunks, expected):
+        if score > 0:
+            assert got[chunk.rule_id] == pytest.approx(score, rel=1e-5)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+from models import StandardsChunk
+
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Local approximation of an LLM tokenizer: each punctuation mark is one
+    token and words cost one token per ~4 characters. Close enough to budget
+    prompts without a network call or a tokenizer dependency.
+    """
+    total = 0
+    for match in _TOKEN_RE.finditer(text):
+        piece = match.group()
+        total += math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+    return total
+
+
+@dataclass
+class PackedGuidelines:
+    chunks: List[StandardsChunk]
+    renderings: List[str]
+    tokens: int
+    dropped_rule_ids: List[str] = field(default_factory=list)
+
+
+def pack_guidelines(
+    chunks: Sequence[StandardsChunk],
+    renderings: Sequence[str],
+    budget_tokens: int,
+) -> PackedGuidelines:
+    """
+    Greedily keep rules in the given (best-first) order while they fit in
+    `budget_tokens`. A rule that does not fit is skipped, so a smaller rule
+    further down can still use the remaining budget. The best rule is always
+    kept, even if it alone exceeds the budget.
+    """
+    kept: List[StandardsChunk] = []
+    kept_renderings: List[str] = []
+    dropped: List[str] = []
+    used = 0
+    for chunk, rendering in zip(chunks, renderings):
+        cost = count_tokens(rendering)
+        if kept and used + cost > budget_tokens:
+            dropped.append(chunk.rule_id)
+            continue
+        kept.append(chunk)
+        kept_renderings.append(rendering)
+        used += cost
+    return PackedGuidelines(chunks=kept, renderings=kept_renderings, tokens=used, dropped_rule_ids=dropped)
+
+
+@dataclass
+class PromptReport:
+    """
+    Approximate token usage of each section of one review prompt.
+    """
+
+    sections: Dict[str, int]
+    rules_included: int
+    rules_dropped: int
+
+    @property
+    def total(self) -> int:
+        return sum(self.sections.values())
+
+
+@dataclass
+class PromptStats:
+    prompts: int = 0
+    rules_included: int = 0
+    rules_dropped: int = 0
+    section_tokens: Dict[str, int] = field(default_factory=dict)
+    last: PromptReport | None = None
+
+
+_stats_lock = threading.Lock()
+_stats = PromptStats()
+
+
+def record_prompt_report(report: PromptReport) -> None:
+    with _stats_lock:
+        _stats.prompts += 1
+        _stats.rules_included += report.rules_included
+        _stats.rules_dropped += report.rules_dropped
+        for name, tokens in report.sections.items():
+            _stats.section_tokens[name] = _stats.section_tokens.get(name, 0) + tokens
+        _stats.last = report
+
+
+def get_prompt_stats() -> PromptStats:
+    """
+    Cumulative per-section prompt sizes for this process, plus the last report.
+    """
+    with _stats_lock:
+        return PromptStats(
+            prompts=_stats.prompts,
+            rules_included=_stats.rules_included,
+            rules_dropped=_stats.rules_dropped,
+            section_tokens=dict(_stats.section_tokens),
+            last=_stats.last,
+        )
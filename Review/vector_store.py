@@ -1,30 +1,100 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Sequence, Tuple
+from typing import Collection, Dict, List, Mapping, Protocol, Sequence
 
 import numpy as np
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 
+from ann_index import RandomProjectionLSH, concat_ranges
+from lsa_index import LatentSemanticIndex
 from models import StandardsChunk
 
 
+# Facet prefixes are few per language; the cap only guards against unbounded
+# growth from arbitrary user-supplied language names.
+_MAX_PREFIX_VECTORS = 512
+
+
 @dataclass
 class RetrievedRule:
     chunk: StandardsChunk
     score: float
 
 
+class StandardsRetriever(Protocol):
+    """
+    Interface shared by retrieval backends (TF-IDF, BM25, ...).
+    """
+
+    @property
+    def is_fitted(self) -> bool: ...
+
+    def fit(self, chunks: Sequence[StandardsChunk]) -> None: ...
+
+    def query(self, query_text: str, top_k: int = 8) -> List[RetrievedRule]: ...
+
+    def query_batch(
+        self,
+        prefixes: Sequence[str],
+        shared_text: str = "",
+        top_k: int = 8,
+    ) -> List[List[RetrievedRule]]: ...
+
+
+def mmr_select(relevance: Sequence[float], vectors: sparse.csr_matrix, relevance_weight: float) -> List[int]:
+    """
+    Maximal marginal relevance over L2-normalized `vectors`: repeatedly pick
+    the item with the highest `w * relevance - (1 - w) * max similarity to
+    the items picked so far`, and stop once no remaining item scores above
+    zero (everything left is more redundant than relevant). Returns indices
+    in pick order; `relevance_weight` 1.0 keeps every item by relevance.
+    """
+    n = len(relevance)
+    if n == 0:
+        return []
+    rel = np.asarray(relevance, dtype=np.float64)
+    sims = (vectors @ vectors.T).toarray()
+    redundancy = np.zeros(n)
+    remaining = np.ones(n, dtype=bool)
+    picked: List[int] = []
+    while remaining.any():
+        marginal = relevance_weight * rel - (1.0 - relevance_weight) * redundancy
+        marginal[~remaining] = -np.inf
+        best = int(np.argmax(marginal))
+        if picked and marginal[best] <= 0:
+            break
+        picked.append(best)
+        remaining[best] = False
+        redundancy = np.maximum(redundancy, sims[best])
+    return picked
+
+
 class StandardsVectorStore:
     """
     Simple in-memory TF-IDF vector store for standards chunks.
+
+    The vectorizer is fitted without normalization so that query vectors are
+    additive over text pieces (tf-idf of "prefix + code" equals the sum of the
+    two). Rows of the stored matrix are L2-normalized once at fit time, which
+    makes cosine similarity a single sparse matrix product.
+
+    With `lsa_components > 0`, fitting also builds a truncated-SVD (LSA)
+    projection and scores fuse lexical and latent similarity.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, lsa_components: int = 0, lsa_weight: float = 0.3) -> None:
+        self.lsa_components = lsa_components
+        self.lsa_weight = lsa_weight
         self._vectorizer: TfidfVectorizer | None = None
-        self._matrix: np.ndarray | None = None
+        self._matrix: sparse.csr_matrix | None = None
         self._chunks: List[StandardsChunk] = []
+        self._prefix_vectors: Dict[str, sparse.csr_matrix] = {}
+        self._ann: RandomProjectionLSH | None = None
+        self._lsa: LatentSemanticIndex | None = None
+        self._term_matrix: sparse.csr_matrix | None = None
 
     @property
     def is_fitted(self) -> bool:
@@ -33,25 +103,409 @@ class StandardsVectorStore:
     def fit(self, chunks: Sequence[StandardsChunk]) -> None:
         self._chunks = list(chunks)
         texts = [c.text for c in self._chunks]
-        self._vectorizer = TfidfVectorizer(stop_words="english")
-        self._matrix = self._vectorizer.fit_transform(texts)
+        self._vectorizer = TfidfVectorizer(stop_words="english", norm=None)
+        self._matrix = normalize(self._vectorizer.fit_transform(texts)).tocsr()
+        self._prefix_vectors = {}
+        self._ann = None
+        self._lsa = None
+        self._term_matrix = None
+        if self.lsa_components > 0:
+            self.enable_lsa(self.lsa_components, self.lsa_weight)
 
-    def query(self, query_text: str, top_k: int = 8) -> List[RetrievedRule]:
+    @classmethod
+    def from_arrays(
+        cls,
+        chunks: Sequence[StandardsChunk],
+        vocabulary: Mapping[str, int],
+        idf: np.ndarray,
+        matrix: sparse.csr_matrix,
+    ) -> "StandardsVectorStore":
+        """
+        Rebuild a fitted store from previously exported arrays without refitting.
+        `matrix` must already be row-normalized (as returned by `to_arrays`).
+        """
+        store = cls()
+        store._chunks = list(chunks)
+        vectorizer = TfidfVectorizer(stop_words="english", norm=None, vocabulary=dict(vocabulary))
+        vectorizer.idf_ = idf
+        store._vectorizer = vectorizer
+        store._matrix = matrix
+        return store
+
+    def to_arrays(self) -> tuple[Dict[str, int], np.ndarray, sparse.csr_matrix]:
+        """
+        Export the fitted state as (vocabulary, idf weights, normalized CSR matrix).
+        """
+        self._check_fitted()
+        assert self._vectorizer is not None and self._matrix is not None
+        return dict(self._vectorizer.vocabulary_), self._vectorizer.idf_, self._matrix
+
+    def _check_fitted(self) -> None:
         if not self.is_fitted or self._vectorizer is None or self._matrix is None:
             raise RuntimeError("Vector store has not been fitted with any standards.")
 
-        query_vec = self._vectorizer.transform([query_text])
-        sims = cosine_similarity(query_vec, self._matrix)[0]
+    def _prefix_vector(self, prefix: str) -> sparse.csr_matrix:
+        vec = self._prefix_vectors.get(prefix)
+        if vec is None:
+            assert self._vectorizer is not None
+            vec = self._vectorizer.transform([prefix])
+            if len(self._prefix_vectors) >= _MAX_PREFIX_VECTORS:
+                self._prefix_vectors.clear()
+            self._prefix_vectors[prefix] = vec
+        return vec
+
+    @property
+    def ann_index(self) -> RandomProjectionLSH | None:
+        return self._ann
+
+    def enable_ann(
+        self,
+        n_tables: int = 16,
+        n_bits: int = 12,
+        n_probes: int = 2,
+        seed: int = 0,
+        density: float = 1.0 / 3.0,
+    ) -> None:
+        """
+        Build an approximate nearest-neighbour index over the stored vectors.
+        Queries then only rescore LSH candidates exactly instead of the whole
+        matrix. Exact scoring is usually faster; measure with
+        `ann_index.measure_recall` before relying on it.
+        """
+        self._check_fitted()
+        assert self._matrix is not None
+        ann = RandomProjectionLSH(
+            self._matrix.shape[1], n_tables=n_tables, n_bits=n_bits, n_probes=n_probes, seed=seed, density=density
+        )
+        ann.add(self._matrix)
+        self._ann = ann
+
+    def attach_ann(self, ann: RandomProjectionLSH) -> None:
+        """
+        Use a previously built (e.g. deserialized) ANN index for this store.
+        """
+        self._check_fitted()
+        assert self._matrix is not None
+        if ann.n_features != self._matrix.shape[1] or len(ann) != self._matrix.shape[0]:
+            raise ValueError("ANN index does not match this store.")
+        self._ann = ann
+
+    @property
+    def lsa_index(self) -> LatentSemanticIndex | None:
+        return self._lsa
+
+    def enable_lsa(self, n_components: int = 64, weight: float = 0.3) -> None:
+        """
+        Fit a truncated-SVD (LSA) projection of the stored matrix and fuse its
+        similarity into every score: `(1 - weight) * lexical + weight * latent`.
+        Corpora too small to reduce are left lexical-only.
+        """
+        self._check_fitted()
+        assert self._matrix is not None
+        self._lsa = LatentSemanticIndex.fit(self._matrix, n_components=n_components, weight=weight)
 
-        if top_k <= 0:
-            top_k = len(self._chunks)
+    def attach_lsa(self, lsa: LatentSemanticIndex) -> None:
+        self._check_fitted()
+        assert self._matrix is not None
+        if lsa.components.shape[1] != self._matrix.shape[1] or len(lsa) != self._matrix.shape[0]:
+            raise ValueError("LSA index does not match this store.")
+        self._lsa = lsa
 
-        top_indices = np.argsort(sims)[::-1][:top_k]
+    def add_chunks(self, chunks: Sequence[StandardsChunk]) -> None:
+        """
+        Append chunks using the existing vocabulary and IDF weights (no refit;
+        terms unseen at fit time are ignored). The ANN index, if any, is
+        extended incrementally.
+        """
+        self._check_fitted()
+        assert self._vectorizer is not None and self._matrix is not None
+        new_rows = normalize(self._vectorizer.transform([c.text for c in chunks])).tocsr()
+        self._matrix = sparse.vstack([self._matrix, new_rows], format="csr")
+        self._term_matrix = None
+        self._chunks.extend(chunks)
+        if self._ann is not None:
+            self._ann.add(new_rows)
+        if self._lsa is not None:
+            self._lsa.add(new_rows)
+
+    def encode(self, text: str) -> sparse.csr_matrix:
+        """
+        L2-normalized query vector for `text`.
+        """
+        self._check_fitted()
+        assert self._vectorizer is not None
+        return normalize(self._vectorizer.transform([text])).tocsr()
+
+    def rule_vectors(self, chunks: Sequence[StandardsChunk]) -> sparse.csr_matrix:
+        """
+        L2-normalized TF-IDF rows for `chunks`, as stored for indexed rules.
+        """
+        self._check_fitted()
+        assert self._vectorizer is not None
+        return normalize(self._vectorizer.transform([c.text for c in chunks])).tocsr()
+
+    def _terms(self) -> sparse.csr_matrix:
+        """
+        Term-major (transposed) copy of the rule matrix, built on first use.
+        A query times this touches only the postings of the query's own
+        terms; `queries @ matrix.T` would convert the whole matrix on every
+        call instead.
+        """
+        terms = self._term_matrix
+        if terms is None:
+            assert self._matrix is not None
+            terms = self._term_matrix = self._matrix.T.tocsr()
+        return terms
+
+    def _rows_dot(self, queries: sparse.csr_matrix, ids: np.ndarray) -> np.ndarray:
+        """
+        Dot products of the query rows with the rules in `ids`, gathered
+        straight from the CSR arrays (no per-query submatrix).
+        """
+        assert self._matrix is not None
+        matrix = self._matrix
+        starts = matrix.indptr[ids]
+        lengths = matrix.indptr[ids + 1] - starts
+        entries = concat_ranges(starts, lengths)
+        products = queries.toarray()[:, matrix.indices[entries]] * matrix.data[entries]
+        sims = np.zeros((queries.shape[0], len(ids)))
+        nonempty = lengths > 0
+        if nonempty.any():
+            bounds = (np.cumsum(lengths) - lengths)[nonempty]
+            sims[:, nonempty] = np.add.reduceat(products, bounds, axis=1)
+        return sims
+
+    def _score(self, query_matrix: sparse.csr_matrix, ids: np.ndarray | None = None) -> np.ndarray:
+        """
+        Cosine similarity of every query row against every chunk (or only the
+        chunks in `ids`), as a dense (n_queries, n_chunks) array. With an LSA
+        index attached, lexical and latent similarities are fused.
+        """
+        assert self._matrix is not None
+        queries = normalize(query_matrix).tocsr()
+        sims = (queries @ self._terms()).toarray() if ids is None else self._rows_dot(queries, ids)
+        if self._lsa is not None:
+            sims = (1.0 - self._lsa.weight) * sims + self._lsa.weight * self._lsa.scores(queries, ids)
+        return sims
+
+    def _top_k(self, sims: np.ndarray, top_k: int, ids: np.ndarray | None = None) -> List[RetrievedRule]:
+        """
+        Top-k of `sims`; `ids` maps positions in `sims` to chunk indices when
+        only a candidate subset was scored.
+        """
+        n = sims.shape[0]
+        if top_k <= 0 or top_k >= n:
+            candidates = np.arange(n)
+        else:
+            candidates = np.argpartition(-sims, top_k - 1)[:top_k]
+
+        chunk_ids = candidates if ids is None else ids[candidates]
+        # Descending score; ties broken by corpus position for determinism.
+        order = np.lexsort((chunk_ids, -sims[candidates]))
         results: List[RetrievedRule] = []
-        for idx in top_indices:
-            score = float(sims[idx])
+        for pos in order:
+            score = float(sims[candidates[pos]])
             if score <= 0:
                 continue
-            results.append(RetrievedRule(chunk=self._chunks[int(idx)], score=score))
+            results.append(RetrievedRule(chunk=self._chunks[int(chunk_ids[pos])], score=score))
+        return results
+
+    def _rank(self, query_matrix: sparse.csr_matrix, top_k: int, exact: bool) -> List[List[RetrievedRule]]:
+        if self._ann is None or exact:
+            return [self._top_k(row, top_k) for row in self._score(query_matrix)]
+
+        assert self._matrix is not None
+        queries = normalize(query_matrix).tocsr()
+        results: List[List[RetrievedRule]] = []
+        for i, ids in enumerate(self._ann.candidates_batch(queries)):
+            row = queries[i]
+            if len(ids) == 0:
+                # Nothing hashed nearby: fall back to exact scoring for this query.
+                results.append(self._top_k(self._score(row)[0], top_k))
+                continue
+            sims = self._score(row, ids)[0]
+            results.append(self._top_k(sims, top_k, ids=ids))
         return results
 
+    def query(self, query_text: str, top_k: int = 8, exact: bool = False) -> List[RetrievedRule]:
+        self._check_fitted()
+        assert self._vectorizer is not None
+        return self._rank(self._vectorizer.transform([query_text]), top_k, exact)[0]
+
+    def query_batch(
+        self,
+        prefixes: Sequence[str],
+        shared_text: str = "",
+        top_k: int = 8,
+        exact: bool = False,
+    ) -> List[List[RetrievedRule]]:
+        """
+        Score many queries of the form `prefix + shared_text` at once.
+
+        `shared_text` (typically the code snippet) is transformed a single time
+        and the prefix vectors (typically facet headers) are cached, so a batch
+        costs one transform plus one sparse matrix product. Results match
+        calling `query(prefix + shared_text)` for each prefix, provided the
+        prefix ends on a token boundary (e.g. a newline). With an ANN index
+        attached, `exact=False` rescores only LSH candidates.
+        """
+        if not prefixes:
+            self._check_fitted()
+            return []
+        return self.rank(self.encode_batch(prefixes, shared_text), top_k, exact)
+
+    def encode_batch(self, prefixes: Sequence[str], shared_text: str = "") -> sparse.csr_matrix:
+        """
+        Unnormalized query matrix for `prefix + shared_text`, one row per
+        prefix (the input of `rank`). Rows from several calls can be stacked
+        and ranked together.
+        """
+        self._check_fitted()
+        assert self._vectorizer is not None
+        shared_vec = self._vectorizer.transform([shared_text])
+        prefix_matrix = sparse.vstack([self._prefix_vector(p) for p in prefixes], format="csr")
+        # Broadcasting a sparse row: add the shared vector to every prefix row.
+        ones = sparse.csr_matrix(np.ones((len(prefixes), 1)))
+        return (prefix_matrix + ones @ shared_vec).tocsr()
+
+    def rank(self, query_matrix: sparse.csr_matrix, top_k: int = 8, exact: bool = False) -> List[List[RetrievedRule]]:
+        """
+        Top-k rules for every row of a query matrix from `encode_batch`.
+        """
+        self._check_fitted()
+        return self._rank(query_matrix, top_k, exact)
+
+
+class LayeredVectorStore(StandardsVectorStore):
+    """
+    A few extra rules layered over a shared, fitted base store.
+
+    Queries and extra rules are encoded with the base vocabulary and IDF
+    weights, plus an extension vocabulary for terms that only the extra
+    rules use. Base rules have no weight on extension terms, so their
+    (unchanged) base scores only need rescaling to be exact cosines in the
+    combined space: the base matrix is reused as-is rather than copied. Base
+    rules whose rule_id is in `hidden` (e.g. overridden by an extra rule)
+    never match.
+    """
+
+    def __init__(
+        self,
+        base: StandardsVectorStore,
+        chunks: Sequence[StandardsChunk],
+        hidden: Collection[str] = (),
+    ) -> None:
+        base._check_fitted()
+        super().__init__(lsa_components=0, lsa_weight=base.lsa_weight)
+        assert base._vectorizer is not None
+        self._base = base
+        self._vectorizer = base._vectorizer
+        # Shared with the base: prefix vectors only cover the base vocabulary.
+        self._prefix_vectors = base._prefix_vectors
+        self._n_base_terms = len(base._vectorizer.vocabulary_)
+        self._extension: TfidfVectorizer | None = None
+
+        texts = [c.text for c in chunks]
+        if texts:
+            local = TfidfVectorizer(stop_words="english", norm=None).fit(texts)
+            extra = sorted(t for t in local.vocabulary_ if t not in base._vectorizer.vocabulary_)
+            if extra:
+                self._extension = TfidfVectorizer(
+                    stop_words="english", norm=None, vocabulary={t: i for i, t in enumerate(extra)}
+                )
+                self._extension.idf_ = local.idf_[[local.vocabulary_[t] for t in extra]]
+            self._matrix = normalize(self._encode(texts)).tocsr()
+        else:
+            self._matrix = sparse.csr_matrix((0, self._n_base_terms))
+        if base._lsa is not None:
+            lsa = base._lsa
+            self._lsa = LatentSemanticIndex(
+                lsa.components, lsa.project(self._matrix[:, : self._n_base_terms]), weight=lsa.weight
+            )
+        # Result positions run over the base rules first, then the layered ones.
+        self._chunks = list(base._chunks) + list(chunks)
+        self._hidden = np.array([i for i, c in enumerate(base._chunks) if c.rule_id in hidden], dtype=np.intp)
+
+    @property
+    def base(self) -> StandardsVectorStore:
+        return self._base
+
+    @property
+    def layered_count(self) -> int:
+        assert self._matrix is not None
+        return int(self._matrix.shape[0])
+
+    @property
+    def is_fitted(self) -> bool:
+        return self._base.is_fitted
+
+    def fit(self, chunks: Sequence[StandardsChunk]) -> None:
+        raise RuntimeError("A layered store is built over its base store and cannot be refitted.")
+
+    def add_chunks(self, chunks: Sequence[StandardsChunk]) -> None:
+        raise RuntimeError("A layered store cannot be extended; build a new one over the base store.")
+
+    def enable_ann(
+        self,
+        n_tables: int = 16,
+        n_bits: int = 12,
+        n_probes: int = 2,
+        seed: int = 0,
+        density: float = 1.0 / 3.0,
+    ) -> None:
+        raise RuntimeError("A layered store does not keep its own ANN index.")
+
+    def to_arrays(self) -> tuple[Dict[str, int], np.ndarray, sparse.csr_matrix]:
+        raise RuntimeError("A layered store is not persisted; export its base store instead.")
+
+    def nbytes(self) -> int:
+        """
+        Memory held by the layered rules (the base store is not counted).
+        """
+        assert self._matrix is not None
+        size = self._matrix.data.nbytes + self._matrix.indices.nbytes + self._matrix.indptr.nbytes
+        if self._lsa is not None:
+            size += self._lsa.embeddings.nbytes
+        if self._extension is not None:
+            size += sum(len(t) + 16 for t in self._extension.vocabulary_)
+        # One reference per base rule in the result lookup table.
+        return size + 8 * len(self._chunks)
+
+    def _encode(self, texts: Sequence[str]) -> sparse.csr_matrix:
+        rows = self._vectorizer.transform(texts)  # type: ignore[union-attr]
+        if self._extension is None:
+            return rows.tocsr()
+        return sparse.hstack([rows, self._extension.transform(texts)], format="csr")
+
+    def encode(self, text: str) -> sparse.csr_matrix:
+        return normalize(self._encode([text])).tocsr()
+
+    def rule_vectors(self, chunks: Sequence[StandardsChunk]) -> sparse.csr_matrix:
+        return normalize(self._encode([c.text for c in chunks])).tocsr()
+
+    def encode_batch(self, prefixes: Sequence[str], shared_text: str = "") -> sparse.csr_matrix:
+        base_rows = super().encode_batch(prefixes, shared_text)
+        if self._extension is None:
+            return base_rows
+        ones = sparse.csr_matrix(np.ones((len(prefixes), 1)))
+        extra = self._extension.transform(prefixes) + ones @ self._extension.transform([shared_text])
+        return sparse.hstack([base_rows, extra], format="csr")
+
+    def query(self, query_text: str, top_k: int = 8, exact: bool = False) -> List[RetrievedRule]:
+        self._check_fitted()
+        return self._rank(self._encode([query_text]), top_k, exact)[0]
+
+    def _score(self, query_matrix: sparse.csr_matrix, ids: np.ndarray | None = None) -> np.ndarray:
+        assert ids is None and self._matrix is not None
+        queries = normalize(query_matrix).tocsr()
+        base_part = queries[:, : self._n_base_terms]
+        # The base store renormalizes its queries; scale back to the combined norm.
+        scale = np.sqrt(np.asarray(base_part.multiply(base_part).sum(axis=1))).reshape(-1, 1)
+        base_sims = self._base._score(base_part) * scale
+        if len(self._hidden):
+            base_sims[:, self._hidden] = 0.0
+
+        own = (queries @ self._matrix.T).toarray()
+        if self._lsa is not None:
+            own = (1.0 - self._lsa.weight) * own + self._lsa.weight * scale * self._lsa.scores(base_part)
+        return np.hstack([base_sims, own])